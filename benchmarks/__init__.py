@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2020/9/3 下午5:05
+"""
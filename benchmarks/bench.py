@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午10:30
+
+session和缓存热点路径的基准测试, 在仓库根目录运行:
+
+    # 使用进程内的RESP服务端
+    python -m benchmarks.bench --output bench-results.json
+    # 使用本地启动的redis-server, 并和上一次的结果比较
+    python -m benchmarks.bench --port 6379 --baseline bench-results.json --output bench-new.json
+
+每个场景输出吞吐量、p50/p99耗时, 以及通过统计hook得到的每次操作的命令数、往返次数和字节数,
+和基准结果比较时往返次数或者命令数增加、吞吐量下降超过容忍度时返回非0的退出码
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence
+
+from fescache import HistogramCollector, Session, __version__
+from .resp_server import RespServer
+
+OPERATIONS: Sequence[str] = ("save_session", "get_session", "verify", "update_session", "get_hash_data",
+                             "save_list_data", "incrbynumber")
+
+
+def _build_session(index: int, payload_size: int) -> Session:
+    """
+    生成测试的session, 其他信息中包含payload_size大小的数据
+    Args:
+        index: 序号
+        payload_size: 数据大小
+    Returns:
+
+    """
+    return Session(f"bench-account-{index}", user_name=f"user{index}", full_name="基准测试", org_id="org-1",
+                   org_name="基准测试组织", org_level=3, gather_orgnos={"1": "a", "2": "b"}, project_id="bench",
+                   extra="x" * payload_size)
+
+
+def _percentile(latencies: List[float], percent: float) -> float:
+    index = min(max(math.ceil(len(latencies) * percent / 100) - 1, 0), len(latencies) - 1)
+    return latencies[index]
+
+
+class Scenario(object):
+    """
+    一个操作在某个数据大小下的测试数据和调用方法
+    """
+
+    def __init__(self, operation: str, payload_size: int, keys: int):
+        self.operation: str = operation
+        self.payload_size: int = payload_size
+        self.sessions: List[Session] = [_build_session(index, payload_size) for index in range(keys)]
+        self.value: str = "v" * payload_size
+        self.hash_data: Dict[str, Any] = {"data": "h" * payload_size, "count": 1, "items": [1, 2, 3]}
+        self.keys: int = keys
+
+    def call(self, client, index: int) -> Any:
+        """
+        调用一次操作, 异步客户端返回协程
+        Args:
+            client: RdbClient或者AIORdbClient
+            index: 调用的序号
+        Returns:
+
+        """
+        slot = index % self.keys
+        session = self.sessions[slot]
+        if self.operation == "update_session":
+            session.full_name = f"基准测试{index}"  # 常见的更新只修改一个字段
+            return client.update_session(session)
+        elif self.operation == "save_session":
+            return client.save_session(session)
+        elif self.operation in ("get_session", "verify"):
+            return getattr(client, self.operation)(session.session_id)
+        elif self.operation == "get_hash_data":
+            return client.get_hash_data(f"bench:hash:{self.payload_size}:{slot}")
+        elif self.operation == "save_list_data":
+            return client.save_list_data(f"bench:list:{self.payload_size}:{slot}", self.value)
+        return client.incrbynumber(f"bench:counter:{slot}")
+
+    def setup_calls(self, client) -> List[Any]:
+        """
+        准备数据的调用, 读取和更新之前需要先保存
+        Args:
+            client: RdbClient或者AIORdbClient
+        Returns:
+
+        """
+        calls = []
+        if self.operation in ("get_session", "verify", "update_session"):
+            calls.extend(client.save_session(session) for session in self.sessions)
+        elif self.operation == "get_hash_data":
+            calls.extend(client.save_hash_data(f"bench:hash:{self.payload_size}:{slot}", self.hash_data)
+                         for slot in range(self.keys))
+        elif self.operation == "save_list_data":
+            calls.extend(client.delete_keys([f"bench:list:{self.payload_size}:{slot}"]) for slot in range(self.keys))
+        return calls
+
+
+def _result(client_name: str, scenario: Scenario, concurrency: int, latencies: List[float], elapsed: float,
+            collector: HistogramCollector) -> Dict[str, Any]:
+    latencies.sort()
+    stats = collector.snapshot().get(scenario.operation, {})
+    return {"client": client_name, "operation": scenario.operation, "payload_size": scenario.payload_size,
+            "concurrency": concurrency, "ops": len(latencies), "throughput": len(latencies) / elapsed,
+            "p50": _percentile(latencies, 50), "p99": _percentile(latencies, 99), "max": latencies[-1],
+            "commands": stats.get("commands", 0), "round_trips": stats.get("round_trips", 0),
+            "bytes_out": stats.get("bytes_out", 0), "bytes_in": stats.get("bytes_in", 0),
+            "errors": stats.get("errors", 0)}
+
+
+def run_sync(client, scenario: Scenario, concurrency: int, iterations: int) -> Dict[str, Any]:
+    """
+    使用线程并发测试同步客户端
+    Args:
+        client: RdbClient
+        scenario: 测试场景
+        concurrency: 并发的线程数
+        iterations: 总的调用次数
+    Returns:
+
+    """
+    list(scenario.setup_calls(client))
+    for index in range(min(iterations // 10, 100)):  # 预热
+        scenario.call(client, index)
+
+    collector = HistogramCollector()
+    per_worker = max(iterations // concurrency, 1)
+
+    def worker(offset: int) -> List[float]:
+        latencies = []
+        for index in range(offset, offset + per_worker):
+            start = time.perf_counter()
+            scenario.call(client, index)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    client.add_hook(collector)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(worker, range(0, per_worker * concurrency, per_worker)))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.remove_hook(collector)
+    return _result("sync", scenario, concurrency, [val for latencies in results for val in latencies], elapsed,
+                   collector)
+
+
+async def run_async(client, scenario: Scenario, concurrency: int, iterations: int) -> Dict[str, Any]:
+    """
+    使用协程并发测试异步客户端
+    Args:
+        client: AIORdbClient
+        scenario: 测试场景
+        concurrency: 并发的协程数
+        iterations: 总的调用次数
+    Returns:
+
+    """
+    for call in scenario.setup_calls(client):
+        await call
+    for index in range(min(iterations // 10, 100)):  # 预热
+        await scenario.call(client, index)
+
+    collector = HistogramCollector()
+    per_worker = max(iterations // concurrency, 1)
+
+    async def worker(offset: int) -> List[float]:
+        latencies = []
+        for index in range(offset, offset + per_worker):
+            start = time.perf_counter()
+            await scenario.call(client, index)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    client.add_hook(collector)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(offset) for offset in range(0, per_worker * concurrency, per_worker)))
+        elapsed = time.perf_counter() - start
+    finally:
+        client.remove_hook(collector)
+    return _result("async", scenario, concurrency, [val for latencies in results for val in latencies], elapsed,
+                   collector)
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """
+    和基准结果比较, 往返次数或者命令数增加、吞吐量下降超过容忍度都认为是回退
+    Args:
+        results: 本次的结果
+        baseline: 基准结果
+        tolerance: 吞吐量下降的容忍度, 比如0.2表示下降20%以内不算回退
+    Returns:
+        回退的描述
+    """
+
+    def key(item: Dict[str, Any]) -> tuple:
+        return item["client"], item["operation"], item["payload_size"], item["concurrency"]
+
+    baseline_map = {key(item): item for item in baseline}
+    regressions = []
+    for item in results:
+        base = baseline_map.get(key(item))
+        if base is None:
+            continue
+        name = "{} {} payload={} concurrency={}".format(*key(item))
+        for field in ("round_trips", "commands"):
+            if item[field] > base[field] + 1e-9:
+                regressions.append(f"{name}: {field} {base[field]:.2f} -> {item[field]:.2f}")
+        if item["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput']:.0f} -> {item['throughput']:.0f} ops/s")
+    return regressions
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    print(f"{result['client']:<5} {result['operation']:<15} payload={result['payload_size']:<6} "
+          f"concurrency={result['concurrency']:<4} {result['throughput']:>9.0f} ops/s "
+          f"p50={result['p50'] * 1000:.3f}ms p99={result['p99'] * 1000:.3f}ms "
+          f"round_trips={result['round_trips']:.2f} commands={result['commands']:.2f}")
+
+
+def _parse_ints(value: str) -> List[int]:
+    return [int(val) for val in value.split(",") if val]
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="fescache benchmark")
+    parser.add_argument("--host", default="127.0.0.1", help="redis host")
+    parser.add_argument("--port", type=int, default=0, help="redis port, 为0时使用进程内的RESP服务端")
+    parser.add_argument("--clients", default="sync,async", help="测试的客户端, sync、async")
+    parser.add_argument("--operations", default=",".join(OPERATIONS), help="测试的操作")
+    parser.add_argument("--payload-sizes", type=_parse_ints, default=[64, 1024, 16384], help="数据大小")
+    parser.add_argument("--concurrency", type=_parse_ints, default=[1, 16, 64], help="并发数")
+    parser.add_argument("--iterations", type=int, default=2000, help="每个场景的调用次数")
+    parser.add_argument("--keys", type=int, default=100, help="每个场景使用的key数量")
+    parser.add_argument("--use-script", action="store_true", help="使用lua脚本, 进程内的RESP服务端不支持")
+    parser.add_argument("--auto-pipeline", action="store_true", help="异步客户端开启自动pipeline")
+    parser.add_argument("--output", default="bench-results.json", help="结果文件")
+    parser.add_argument("--baseline", default="", help="用于比较的基准结果文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="吞吐量下降的容忍度")
+    args = parser.parse_args(argv)
+
+    server = None
+    host, port = args.host, args.port
+    if not port:
+        server = RespServer()
+        host, port = server.start()
+    clients = [name for name in args.clients.split(",") if name]
+    operations = [name for name in args.operations.split(",") if name]
+    pool_size = max(args.concurrency) + 1
+    results = []
+    try:
+        if "sync" in clients:
+            from fescache.rdbclient import RdbClient
+            client = RdbClient()
+            client.init_engine(host=host, port=port, pool_size=pool_size, use_script=args.use_script)
+            for operation in operations:
+                for payload_size in args.payload_sizes:
+                    scenario = Scenario(operation, payload_size, args.keys)
+                    for concurrency in args.concurrency:
+                        results.append(run_sync(client, scenario, concurrency, args.iterations))
+                        _print_result(results[-1])
+            client.close_connection()
+        if "async" in clients:
+            from fescache.aio_rdbclient import AIORdbClient
+
+            async def run_all() -> None:
+                aio_client = AIORdbClient()
+                aio_client.init_engine(host=host, port=port, pool_size=pool_size, use_script=args.use_script,
+                                       auto_pipeline=args.auto_pipeline)
+                for aio_operation in operations:
+                    for aio_payload_size in args.payload_sizes:
+                        aio_scenario = Scenario(aio_operation, aio_payload_size, args.keys)
+                        for aio_concurrency in args.concurrency:
+                            results.append(await run_async(aio_client, aio_scenario, aio_concurrency,
+                                                           args.iterations))
+                            _print_result(results[-1])
+                aio_client.pool.disconnect()
+
+            asyncio.run(run_all())
+    finally:
+        if server is not None:
+            server.stop()
+
+    meta = {"fescache": __version__, "python": platform.python_version(), "platform": platform.platform(),
+            "server": "resp-standin" if server is not None else f"redis://{host}:{port}",
+            "iterations": args.iterations, "keys": args.keys, "use_script": args.use_script,
+            "auto_pipeline": args.auto_pipeline, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午10:00
+"""
+import asyncio
+import fnmatch
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+__all__ = ("RespServer",)
+
+
+class _Error(Exception):
+    """
+    返回给客户端的错误
+    """
+
+
+class RespServer(object):
+    """
+    进程内的RESP服务端, 只实现fescache用到的命令, 用于没有redis-server时运行基准测试
+
+    在后台线程的事件循环中运行, 数据保存在内存中, 过期时间在访问时惰性检查, 不支持lua脚本
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, redis_version: str = "7.0.0"):
+        """
+        进程内的RESP服务端
+        Args:
+            host: 监听的地址
+            port: 监听的端口, 为0时随机选择
+            redis_version: INFO返回的版本号, 决定客户端是否使用GETEX
+        """
+        self.host: str = host
+        self.port: int = port
+        self.redis_version: str = redis_version
+        self._data: Dict[bytes, Any] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._tasks: Set[asyncio.Task] = set()  # 正在处理的连接
+        self._commands: Dict[bytes, Callable[..., Any]] = {
+            name[4:].upper().encode(): getattr(self, name) for name in dir(self) if name.startswith("cmd_")}
+
+    def start(self, ) -> Tuple[str, int]:
+        """
+        在后台线程中启动服务端
+        Args:
+
+        Returns:
+            监听的地址和端口
+        """
+        started = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="resp-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.host, self.port
+
+    def stop(self, ) -> None:
+        """
+        停止服务端
+        Args:
+
+        Returns:
+
+        """
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+
+    async def _shutdown(self, ) -> None:
+        self._server.close()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        """
+        读取一个命令
+        Args:
+            reader: 连接的reader
+        Returns:
+
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):  # inline命令
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            header = await reader.readline()
+            data = await reader.readexactly(int(header[1:-2]) + 2)
+            args.append(data[:-2])
+        return args
+
+    def _encode(self, value: Any) -> bytes:
+        """
+        把返回值编码为RESP
+        Args:
+            value: 返回值
+        Returns:
+
+        """
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):  # 简单字符串
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        if isinstance(value, _Error):
+            return b"-%s\r\n" % str(value).encode()
+        return b"*%d\r\n%s" % (len(value), b"".join(self._encode(item) for item in value))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if not args:
+                    break
+                handler = self._commands.get(args[0].upper())
+                try:
+                    if handler is None:
+                        raise _Error(f"ERR unknown command '{args[0].decode()}'")
+                    reply = handler(*args[1:])
+                except _Error as e:
+                    reply = e
+                except (TypeError, ValueError, IndexError):
+                    reply = _Error(f"ERR wrong number of arguments or syntax error for '{args[0].decode()}'")
+                writer.write(self._encode(reply))
+                # pipeline中的命令都读取后再发送
+                if not reader._buffer:  # noqa
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._tasks.discard(task)
+            writer.close()
+
+    def _get(self, key: bytes, kind: Optional[type] = None) -> Any:
+        """
+        获取key的值, 已经过期的key惰性删除
+        Args:
+            key: key
+            kind: 值的类型, 类型不对时返回WRONGTYPE错误
+        Returns:
+
+        """
+        expire_at = self._expires.get(key)
+        if expire_at is not None and expire_at <= time.monotonic():
+            self._delete(key)
+        value = self._data.get(key)
+        if value is not None and kind is not None and not isinstance(value, kind):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _delete(self, key: bytes) -> int:
+        self._expires.pop(key, None)
+        return int(self._data.pop(key, None) is not None)
+
+    def _set_expire(self, key: bytes, seconds: float) -> None:
+        self._expires[key] = time.monotonic() + seconds
+
+    # 连接命令
+    def cmd_ping(self, *args) -> Any:
+        return args[0] if args else "PONG"
+
+    def cmd_select(self, *args) -> Any:
+        return "OK"
+
+    def cmd_auth(self, *args) -> Any:
+        return "OK"
+
+    def cmd_client(self, *args) -> Any:
+        return "OK"
+
+    def cmd_info(self, *args) -> Any:
+        return f"# Server\r\nredis_version:{self.redis_version}\r\n".encode()
+
+    def cmd_evalsha(self, *args) -> Any:
+        raise _Error("NOSCRIPT No matching script. Please use EVAL.")
+
+    def cmd_eval(self, *args) -> Any:
+        raise _Error("ERR scripting is not supported by the RESP stand-in")
+
+    # key命令
+    def cmd_expire(self, key: bytes, seconds: bytes) -> int:
+        if self._get(key) is None:
+            return 0
+        self._set_expire(key, int(seconds))
+        return 1
+
+    def cmd_pexpire(self, key: bytes, milliseconds: bytes) -> int:
+        if self._get(key) is None:
+            return 0
+        self._set_expire(key, int(milliseconds) / 1000)
+        return 1
+
+    def cmd_ttl(self, key: bytes) -> int:
+        if self._get(key) is None:
+            return -2
+        expire_at = self._expires.get(key)
+        return -1 if expire_at is None else int(expire_at - time.monotonic())
+
+    def cmd_del(self, *keys: bytes) -> int:
+        return sum(self._delete(key) for key in keys if self._get(key) is not None)
+
+    cmd_unlink = cmd_del
+
+    def cmd_exists(self, *keys: bytes) -> int:
+        return sum(self._get(key) is not None for key in keys)
+
+    def cmd_keys(self, pattern: bytes) -> List[bytes]:
+        return [key for key in list(self._data) if fnmatch.fnmatchcase(key, pattern) and self._get(key) is not None]
+
+    def cmd_scan(self, cursor: bytes, *args: bytes) -> List[Any]:
+        options = {args[index].upper(): args[index + 1] for index in range(0, len(args), 2)}
+        keys = self.cmd_keys(options.get(b"MATCH", b"*"))
+        return [b"0", keys]
+
+    # 字符串命令
+    def cmd_get(self, key: bytes) -> Any:
+        return self._get(key, bytes)
+
+    def cmd_mget(self, *keys: bytes) -> List[Any]:
+        return [value if isinstance(value, bytes) else None for value in (self._get(key) for key in keys)]
+
+    def cmd_getex(self, key: bytes, *args: bytes) -> Any:
+        value = self._get(key, bytes)
+        if value is not None and args:
+            option = args[0].upper()
+            if option == b"EX":
+                self._set_expire(key, int(args[1]))
+            elif option == b"PX":
+                self._set_expire(key, int(args[1]) / 1000)
+            elif option == b"PERSIST":
+                self._expires.pop(key, None)
+        return value
+
+    def cmd_set(self, key: bytes, value: bytes, *args: bytes) -> Any:
+        options = [arg.upper() for arg in args]
+        exists = self._get(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self._delete(key)
+        self._data[key] = value
+        for option, seconds in ((b"EX", 1), (b"PX", 0.001)):
+            if option in options:
+                self._set_expire(key, int(args[options.index(option) + 1]) * seconds)
+        return "OK"
+
+    def cmd_incrby(self, key: bytes, amount: bytes = b"1") -> int:
+        value = int(self._get(key, bytes) or 0) + int(amount)
+        self._data[key] = str(value).encode()
+        return value
+
+    cmd_incr = cmd_incrby
+
+    def cmd_incrbyfloat(self, key: bytes, amount: bytes) -> bytes:
+        value = float(self._get(key, bytes) or 0) + float(amount)
+        self._data[key] = repr(value).encode()
+        return self._data[key]
+
+    # hash命令
+    def cmd_hset(self, key: bytes, *pairs: bytes) -> int:
+        if not pairs or len(pairs) % 2:
+            raise ValueError
+        hash_data = self._get(key, dict)
+        if hash_data is None:
+            hash_data = self._data[key] = {}
+        added = 0
+        for index in range(0, len(pairs), 2):
+            added += pairs[index] not in hash_data
+            hash_data[pairs[index]] = pairs[index + 1]
+        return added
+
+    def cmd_hmset(self, key: bytes, *pairs: bytes) -> str:
+        self.cmd_hset(key, *pairs)
+        return "OK"
+
+    def cmd_hget(self, key: bytes, field: bytes) -> Any:
+        return (self._get(key, dict) or {}).get(field)
+
+    def cmd_hmget(self, key: bytes, *fields: bytes) -> List[Any]:
+        hash_data = self._get(key, dict) or {}
+        return [hash_data.get(field) for field in fields]
+
+    def cmd_hgetall(self, key: bytes) -> List[bytes]:
+        return [item for pair in (self._get(key, dict) or {}).items() for item in pair]
+
+    def cmd_hdel(self, key: bytes, *fields: bytes) -> int:
+        hash_data = self._get(key, dict) or {}
+        return sum(hash_data.pop(field, None) is not None for field in fields)
+
+    # list命令
+    def cmd_lpush(self, key: bytes, *values: bytes) -> int:
+        list_data = self._get(key, list)
+        if list_data is None:
+            list_data = self._data[key] = []
+        list_data[:0] = reversed(values)
+        return len(list_data)
+
+    def cmd_rpush(self, key: bytes, *values: bytes) -> int:
+        list_data = self._get(key, list)
+        if list_data is None:
+            list_data = self._data[key] = []
+        list_data.extend(values)
+        return len(list_data)
+
+    def cmd_lrange(self, key: bytes, start: bytes, end: bytes) -> List[bytes]:
+        list_data = self._get(key, list) or []
+        start, end = int(start), int(end)
+        end = len(list_data) + end if end < 0 else end
+        return list_data[max(start if start >= 0 else len(list_data) + start, 0):end + 1]
@@ -9,12 +9,22 @@
 
 from .utils import *
 from ._base import *
+from .localcache import *
+from .codec import *
+from .schema import *
+from .decorators import *
+from .metrics import *
 
 __all__ = (
     "ignore_error", "ordumps", "orloads",
 
     "Session", "LONG_EXPIRED", "SHORT_EXPIRED", "EXPIRED", "SESSION_EXPIRED", "DAY3_EXPIRED", "DAY7_EXPIRED",
-    "DAY15_EXPIRED", "DAY30_EXPIRED",
+    "DAY15_EXPIRED", "DAY30_EXPIRED", "KEY_LAYOUTS", "READ_FROM", "SESSION_FORMATS", "key_slot",
+
+    "LocalCache", "Codec", "JsonCodec", "OrjsonCodec", "MsgpackCodec", "RawCodec", "CompressedCodec",
+    "FieldSchema", "FIELD_TYPES", "LazyHashData",
+    "get_codec", "cached", "OperationRecord", "HistogramCollector", "instrument", "prometheus_text",
+    "record_send", "record_reply", "current_record",
 
     "__version__",
 )
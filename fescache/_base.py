@@ -6,14 +6,27 @@
 @software: PyCharm
 @time: 2020/9/3 下午5:52
 """
+import hashlib
+import math
+import random
 import secrets
+import threading
+import time
 import uuid
-from typing import Any, Dict, Optional, Union
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, FrozenSet, Generator, List, Optional, Sequence, Tuple, Union
 
-from .utils import ordumps, orloads
+import orjson
+
+from .codec import Codec, CompressedCodec, JsonCodec, get_codec
+from .err import FuncArgsError
+from .localcache import LocalCache
+from .metrics import OperationRecord
+from .schema import FieldSchema, LazyHashData
 
 __all__ = ("Session", "LONG_EXPIRED", "EXPIRED", "SESSION_EXPIRED", "DAY3_EXPIRED", "DAY7_EXPIRED",
-           "DAY15_EXPIRED", "DAY30_EXPIRED", "SHORT_EXPIRED", "BaseStrictRedis")
+           "DAY15_EXPIRED", "DAY30_EXPIRED", "SHORT_EXPIRED", "BaseStrictRedis", "KEY_LAYOUTS", "READ_FROM",
+           "SESSION_FORMATS", "key_slot")
 
 SESSION_EXPIRED: int = 30 * 60  # session过期时间
 SHORT_EXPIRED: int = 60 * 60  # 短session过期时间
@@ -24,6 +37,192 @@ DAY7_EXPIRED: int = 7 * LONG_EXPIRED
 DAY15_EXPIRED: int = 15 * LONG_EXPIRED
 DAY30_EXPIRED: int = 30 * LONG_EXPIRED
 
+_json_codec: Codec = JsonCodec()
+
+# session相关key的布局, default为各自独立的随机名称, hashtag为同一个账户的key使用{account_id}哈希标签分到同一个槽
+KEY_LAYOUTS: Tuple[str, ...] = ("default", "hashtag")
+# 读取命令发送到的节点, primary为主节点, replica为副本节点(副本的数据可能有复制延迟)
+READ_FROM: Tuple[str, ...] = ("primary", "replica")
+# session的保存格式, hash为每个字段分别序列化保存在hash中, blob为整个session序列化为一个字符串
+SESSION_FORMATS: Tuple[str, ...] = ("hash", "blob")
+# redis集群的槽数量
+CLUSTER_SLOTS: int = 16384
+# get_or_set读取时表示缓存不存在, 和缓存的值为None区分
+CACHE_MISS: Any = object()
+
+
+def _crc16_table() -> List[int]:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+_CRC16_TABLE: List[int] = _crc16_table()
+
+
+def key_slot(key: Union[str, bytes]) -> int:
+    """
+    计算key在redis集群中的槽, 和服务端一样使用CRC16, key中有非空的{...}时只计算第一个花括号中的内容
+    Args:
+        key: redis key
+    Returns:
+
+    """
+    key = key.encode() if isinstance(key, str) else key
+    start = key.find(b"{")
+    if start > -1:
+        end = key.find(b"}", start + 1)
+        if end > start + 1:
+            key = key[start + 1:end]
+    crc = 0
+    for byte in key:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC16_TABLE[(crc >> 8) ^ byte]
+    return crc % CLUSTER_SLOTS
+
+
+class KeyLocks(object):
+    """
+    按照key分配的线程锁, 只有同一个key的调用互相等待, 不同的key不会因为共用分段锁而排队
+
+    字典只在短暂的临界区内修改, 没有调用方使用的锁随即删除
+    """
+
+    def __init__(self, ):
+        self._lock: threading.Lock = threading.Lock()
+        self._locks: Dict[str, List[Any]] = {}  # key对应的[锁, 使用的调用方数量]
+
+    @contextmanager
+    def hold(self, key: str) -> Generator[None, None, None]:
+        """
+        持有key对应的锁
+        Args:
+            key: key
+        Returns:
+
+        """
+        with self._lock:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+class LuaScript(object):
+    """
+    redis lua脚本, 预先计算sha用于EVALSHA调用
+    """
+    __slots__ = ("script", "sha")
+
+    def __init__(self, script: str):
+        self.script: str = script
+        self.sha: str = hashlib.sha1(script.encode()).hexdigest()
+
+
+# 获取session并刷新session和账户令牌的过期时间, KEYS[1]: session_id, ARGV[1]: 过期时间
+# hash格式返回HGETALL的结果, blob格式返回字符串, 两种格式保存的session都可以读取
+GET_SESSION_SCRIPT: LuaScript = LuaScript("""
+local kind = redis.call('TYPE', KEYS[1]).ok
+local data, account_id
+if kind == 'hash' then
+    data = redis.call('HGETALL', KEYS[1])
+    account_id = redis.call('HGET', KEYS[1], 'account_id')
+elseif kind == 'string' then
+    data = redis.call('GET', KEYS[1])
+    account_id = cjson.decode(data).account_id
+else
+    return false
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+if account_id then
+    redis.call('EXPIRE', account_id, ARGV[1])
+end
+return data
+""")
+
+# 保存session, 清除老的令牌和老session相关的key, 保存新的session并更新令牌
+# KEYS[1]: session_id, KEYS[2]: account_id, ARGV[1]: 过期时间, ARGV[2]: 保存格式(hash或者blob),
+# ARGV[3:]: hash格式为session的field/value, blob格式为整个session序列化后的字符串, 返回删除的key
+SAVE_SESSION_SCRIPT: LuaScript = LuaScript("""
+local del_keys = {}
+local old_session_id = redis.call('GET', KEYS[2])
+if old_session_id and old_session_id ~= KEYS[1] then
+    local old_keys = {}
+    local kind = redis.call('TYPE', old_session_id).ok
+    if kind == 'hash' then
+        old_keys = redis.call('HMGET', old_session_id, 'account_id', 'role_id', 'menu_id', 'data_id',
+                              'static_route_id', 'dynamic_route_id')
+    elseif kind == 'string' then
+        local old = cjson.decode(redis.call('GET', old_session_id))
+        old_keys = {old.account_id, old.role_id, old.menu_id, old.data_id, old.static_route_id,
+                    old.dynamic_route_id}
+    end
+    if old_keys[1] then
+        table.insert(del_keys, old_session_id)
+        for _, key in ipairs(old_keys) do
+            if key then
+                table.insert(del_keys, key)
+            end
+        end
+        redis.call('DEL', unpack(del_keys))
+    end
+end
+if ARGV[2] == 'blob' then
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[1])
+else
+    if redis.call('TYPE', KEYS[1]).ok == 'string' then
+        redis.call('DEL', KEYS[1])
+    end
+    redis.call('HMSET', KEYS[1], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+redis.call('SET', KEYS[2], KEYS[1], 'EX', ARGV[1])
+return del_keys
+""")
+
+# 更新session并刷新令牌, KEYS[1]: session_id, KEYS[2]: account_id, ARGV[1]: 过期时间, ARGV[2]: 保存格式(hash或者blob),
+# ARGV[3:]: hash格式为session的field/value, 可以只传入修改过的field/value, blob格式为整个session序列化后的字符串
+# 返回更新之前session是否存在, hash格式时blob格式保存的session按照不存在处理
+UPDATE_SESSION_SCRIPT: LuaScript = LuaScript("""
+local kind = redis.call('TYPE', KEYS[1]).ok
+if ARGV[2] == 'blob' then
+    redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[1])
+    redis.call('SET', KEYS[2], KEYS[1], 'EX', ARGV[1])
+    return kind == 'none' and 0 or 1
+end
+if kind == 'string' then
+    redis.call('DEL', KEYS[1])
+end
+local exists = redis.call('EXPIRE', KEYS[1], ARGV[1])
+if #ARGV > 2 then
+    redis.call('HMSET', KEYS[1], unpack(ARGV, 3))
+end
+if exists == 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+redis.call('SET', KEYS[2], KEYS[1], 'EX', ARGV[1])
+return exists
+""")
+
+# 释放锁, 只有锁的值和加锁时的token一致时才删除, KEYS[1]: 锁的名称, ARGV[1]: token
+RELEASE_LOCK_SCRIPT: LuaScript = LuaScript("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
 
 class Session(object):
     """
@@ -31,42 +230,117 @@ class Session(object):
     Args:
 
     """
+    # 字符串类型的字段
+    _str_fields: Tuple[str, ...] = (
+        "account_id", "user_name", "account_type", "user_id", "full_name",
+        "org_id", "org_name", "org_type", "regiona_no", "department_no", "department_name", "department_type",
+        "session_id", "role_id", "menu_id", "data_id", "static_route_id", "dynamic_route_id", "project_id")
+    # int类型的字段
+    _int_fields: Tuple[str, ...] = ("org_level", "department_level")
+    # 所有固定的字段
+    fields: Tuple[str, ...] = _str_fields + _int_fields + ("gather_orgnos",)
+    # 和账户相关的redis key, hashtag布局时使用账户的哈希标签
+    key_fields: Tuple[str, ...] = ("session_id", "role_id", "menu_id", "data_id", "static_route_id",
+                                   "dynamic_route_id")
+    # 赋值时记录为已修改的属性
+    _tracked_fields: FrozenSet[str] = frozenset(fields + ("kwargs",))
+    # hash格式中固定字段和kwargs的类型, 读取时按照类型直接解析, 平铺保存的其他信息使用默认的json codec
+    schema: FieldSchema = FieldSchema({**dict.fromkeys(_str_fields, "str"), **dict.fromkeys(_int_fields, "int"),
+                                       "gather_orgnos": "json", "kwargs": "json"})
+
+    # _dirty: 从redis加载或者保存之后赋值过的属性, 为None时不记录(新建的session)
+    # _snapshot: 加载或者保存时gather_orgnos和kwargs的浅拷贝, 用于发现原地修改
+    __slots__ = fields + ("kwargs", "_dirty", "_snapshot")
 
     def __init__(self, account_id: str, *, user_name: str = "", account_type: str = "", user_id: str = "",
                  full_name: str = "", org_id: str = "", org_name: str = "", org_type: str = "",
                  org_level: Optional[int] = None, regiona_no: str = "", gather_orgnos: Optional[Dict[str, str]] = None,
                  department_no: str = "", department_name: str = "", department_type: str = "",
                  department_level: Optional[int] = None, project_id: str = "", **kwargs):
+        set_slot = object.__setattr__  # 新建的session不需要记录修改, 跳过__setattr__
+        set_slot(self, "_dirty", None)
+        set_slot(self, "_snapshot", None)
         # 用户信息
-        self.account_id: str = str(account_id)  # 账户ID
-        self.user_name: str = str(user_name)
-        self.account_type: str = str(account_type)
-        self.user_id: str = str(user_id)
-        self.full_name: str = str(full_name)
+        set_slot(self, "account_id", str(account_id))  # 账户ID
+        set_slot(self, "user_name", str(user_name))
+        set_slot(self, "account_type", str(account_type))
+        set_slot(self, "user_id", str(user_id))
+        set_slot(self, "full_name", str(full_name))
         # 组织信息
-        self.org_id: str = str(org_id)
-        self.org_name: str = str(org_name)
-        self.org_type: str = str(org_type)
-        self.org_level: Optional[int] = self.set_intype(org_level)
-        self.regiona_no: str = str(regiona_no)
-        self.department_no: str = str(department_no)
-        self.department_name: str = str(department_name)
-        self.department_type: str = str(department_type)
-        self.department_level: Optional[int] = self.set_intype(department_level)
-        # session信息
-        self.session_id: str = secrets.token_urlsafe()  # session ID
-        self.role_id: str = uuid.uuid4().hex  # 账户的角色在redis中的ID
-        self.menu_id: str = uuid.uuid4().hex  # 账户的页面菜单权限在redis中的ID
-        self.data_id: str = uuid.uuid4().hex  # 账户的数据权限在redis中的ID
-        self.static_route_id: str = uuid.uuid4().hex  # 账户的静态权限在redis中的ID
-        self.dynamic_route_id: str = uuid.uuid4().hex  # 账户的动态权限在redis中的ID
+        set_slot(self, "org_id", str(org_id))
+        set_slot(self, "org_name", str(org_name))
+        set_slot(self, "org_type", str(org_type))
+        set_slot(self, "org_level", self.set_intype(org_level))
+        set_slot(self, "regiona_no", str(regiona_no))
+        set_slot(self, "department_no", str(department_no))
+        set_slot(self, "department_name", str(department_name))
+        set_slot(self, "department_type", str(department_type))
+        set_slot(self, "department_level", self.set_intype(department_level))
+        # session信息, 传入时使用传入的值
+        set_slot(self, "session_id", str(kwargs.pop("session_id", None) or secrets.token_urlsafe()))  # session ID
+        set_slot(self, "role_id", str(kwargs.pop("role_id", None) or uuid.uuid4().hex))  # 账户的角色在redis中的ID
+        set_slot(self, "menu_id", str(kwargs.pop("menu_id", None) or uuid.uuid4().hex))  # 账户的页面菜单权限在redis中的ID
+        set_slot(self, "data_id", str(kwargs.pop("data_id", None) or uuid.uuid4().hex))  # 账户的数据权限在redis中的ID
+        # 账户的静态权限在redis中的ID
+        set_slot(self, "static_route_id", str(kwargs.pop("static_route_id", None) or uuid.uuid4().hex))
+        # 账户的动态权限在redis中的ID
+        set_slot(self, "dynamic_route_id", str(kwargs.pop("dynamic_route_id", None) or uuid.uuid4().hex))
         # 项目信息
-        self.gather_orgnos: Dict[str, str] = {str(key): str(val) for key, val in (gather_orgnos or {}).items()}
-        self.project_id: str = str(project_id)
+        set_slot(self, "gather_orgnos", {str(key): str(val) for key, val in (gather_orgnos or {}).items()})
+        set_slot(self, "project_id", str(project_id))
         # 其他信息
-        self.kwargs: Dict[str, Any] = {**kwargs}
-        for k, v in self.kwargs.items():
-            setattr(self, k, v)
+        set_slot(self, "kwargs", self._pop_kwargs(kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        其他信息通过属性访问
+        Args:
+
+        Returns:
+
+        """
+        if name != "kwargs":
+            try:
+                return self.kwargs[name]
+            except KeyError:
+                pass
+        raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """
+        从redis加载的session记录赋值过的属性
+        Args:
+
+        Returns:
+
+        """
+        object.__setattr__(self, name, value)
+        if name in self._tracked_fields:
+            dirty = getattr(self, "_dirty", None)
+            if dirty is not None:
+                dirty.add(name)
+
+    @classmethod
+    def from_dict(cls, session_data: Dict[str, Any]) -> "Session":
+        """
+        从redis中的数据重建session, 不再生成各个ID
+        Args:
+            session_data: 反序列化之后的session数据
+        Returns:
+
+        """
+        session = cls.__new__(cls)
+        set_slot = object.__setattr__  # 重建时不需要记录修改
+        session_data = dict(session_data)
+        for field in cls._str_fields:
+            set_slot(session, field, str(session_data.pop(field, "")))
+        for field in cls._int_fields:
+            set_slot(session, field, cls.set_intype(session_data.pop(field, None)))
+        set_slot(session, "gather_orgnos", {str(key): str(val) for key, val in (
+            session_data.pop("gather_orgnos", None) or {}).items()})
+        set_slot(session, "kwargs", cls._pop_kwargs(session_data))
+        session.mark_clean()
+        return session
 
     def to_dict(self, ) -> Dict:
         """
@@ -76,7 +350,89 @@ class Session(object):
         Returns:
 
         """
-        return dict(vars(self))
+        session_data = {field: getattr(self, field) for field in self.fields}
+        # 其他信息和之前的存储格式保持一致, 既保存kwargs也平铺保存
+        session_data["kwargs"] = dict(self.kwargs)
+        session_data.update(self.kwargs)
+        return session_data
+
+    def to_dirty_dict(self, ) -> Optional[Dict[str, Any]]:
+        """
+        从redis加载或者上次保存之后修改过的字段, 格式和to_dict一致, 新建的session返回None表示需要保存全部字段
+
+        gather_orgnos和kwargs的原地修改通过和加载时的浅拷贝比较发现, 嵌套的可变值原地修改后需要调用mark_dirty
+        Args:
+
+        Returns:
+
+        """
+        if self._dirty is None:
+            return None
+        session_data = {field: getattr(self, field) for field in self._dirty if field != "kwargs"}
+        gather_orgnos, kwargs = self._snapshot
+        if "gather_orgnos" not in session_data and self.gather_orgnos != gather_orgnos:
+            session_data["gather_orgnos"] = self.gather_orgnos
+        if "kwargs" in self._dirty:
+            session_data["kwargs"] = dict(self.kwargs)
+            session_data.update(self.kwargs)
+        elif self.kwargs != kwargs:
+            # 平铺保存的其他信息只写入新增和修改过的
+            session_data["kwargs"] = dict(self.kwargs)
+            session_data.update({key: val for key, val in self.kwargs.items()
+                                 if key not in kwargs or kwargs[key] != val})
+        return session_data
+
+    def mark_dirty(self, *names: str) -> None:
+        """
+        把属性标记为已修改, 用于原地修改了嵌套的可变值, 新建的session不需要调用
+        Args:
+            names: 属性名称, 其他信息的名称按照kwargs处理, 写入全部的其他信息
+        Returns:
+
+        """
+        if self._dirty is not None:
+            self._dirty.update(name if name in self._tracked_fields else "kwargs" for name in names)
+
+    def mark_clean(self, ) -> None:
+        """
+        保存之后清除修改记录, 之后的update_session只写入再次修改过的字段
+        Args:
+
+        Returns:
+
+        """
+        self._dirty = set()
+        self._snapshot = (dict(self.gather_orgnos), dict(self.kwargs))
+
+    def use_hash_tag(self, ) -> "Session":
+        """
+        session_id、role_id等key加上{account_id}哈希标签, 和账户的令牌key(account_id)分到redis集群的同一个槽,
+        已经有标签的key保持不变, account_id中不能有花括号
+        Args:
+
+        Returns:
+            session本身
+        """
+        hash_tag = f"{{{self.account_id}}}:"
+        for field in self.key_fields:
+            value = getattr(self, field)
+            if not value.startswith(hash_tag):
+                setattr(self, field, hash_tag + value)
+        return self
+
+    @staticmethod
+    def _pop_kwargs(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        整理其他信息, 兼容之前存储格式中保存的kwargs字段
+        Args:
+            kwargs: 其他信息
+        Returns:
+
+        """
+        stored_kwargs = kwargs.pop("kwargs", None)
+        if isinstance(stored_kwargs, dict):
+            return {**stored_kwargs, **kwargs}
+        return kwargs
 
     @staticmethod
     def set_intype(value: Optional[int]) -> Optional[int]:
@@ -101,7 +457,12 @@ class BaseStrictRedis(object):
     """
 
     def __init__(self, app=None, *, host: str = "127.0.0.1", port: int = 6379, dbname: int = 0, passwd: str = "",
-                 pool_size: int = 25):
+                 pool_size: int = 25, use_script: bool = False, local_cache_size: int = 0,
+                 local_cache_ttl: float = 5, codec: Union[str, Codec] = "json", pool_blocking: bool = False,
+                 pool_timeout: float = 5, cluster: bool = False, key_layout: str = "default",
+                 read_from: str = "primary", replicas: Union[str, Sequence[str]] = (),
+                 sentinels: Union[str, Sequence[str]] = (), sentinel_service: str = "mymaster",
+                 session_format: str = "hash"):
         """
         redis 基类
         Args:
@@ -111,6 +472,19 @@ class BaseStrictRedis(object):
             dbname: database name
             passwd: redis password
             pool_size: redis pool size
+            use_script: 是否使用lua脚本一次往返完成session的获取、保存和更新
+            local_cache_size: 进程内本地缓存的最大条目数, 为0时不开启本地缓存
+            local_cache_ttl: 本地缓存条目的过期时间, 单位秒, 应该比redis中的过期时间短
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            pool_blocking: 是否使用阻塞连接池, 连接用完时等待其他连接释放而不是直接报错
+            pool_timeout: 阻塞连接池等待连接的超时时间, 单位秒
+            cluster: 是否使用redis集群模式, host和port为集群的任意一个节点
+            key_layout: session相关key的布局, default或者hashtag, hashtag时同一个账户的key分到集群的同一个槽
+            read_from: 只读方法默认读取的节点, primary或者replica, 每次调用可以通过read_from参数指定
+            replicas: 副本节点的地址, host:port列表或者逗号分隔的字符串, 多个副本轮流读取
+            sentinels: sentinel节点的地址, host:port列表或者逗号分隔的字符串, 指定时通过sentinel发现主节点和副本节点
+            sentinel_service: sentinel中监控的服务名称
+            session_format: session的保存格式, hash或者blob, blob时整个session保存为一个字符串, 两种格式都可以读取
         """
         self.app = app
         self.host: str = host
@@ -118,6 +492,26 @@ class BaseStrictRedis(object):
         self.dbname: int = dbname
         self.passwd: str = passwd
         self.pool_size: int = pool_size
+        self.use_script: bool = use_script
+        self.local_cache_size: int = local_cache_size
+        self.local_cache_ttl: float = local_cache_ttl
+        self.local_cache: Optional[LocalCache] = None
+        self._init_local_cache()
+        self.codec: Codec = get_codec(codec)
+        self.pool_blocking: bool = pool_blocking
+        self.pool_timeout: float = pool_timeout
+        self.cluster: bool = cluster
+        self.key_layout: str = key_layout
+        self.read_from: str = read_from
+        self.replicas: List[Tuple[str, int]] = self._parse_addresses(replicas)
+        self.sentinels: List[Tuple[str, int]] = self._parse_addresses(sentinels)
+        self.sentinel_service: str = sentinel_service
+        self.session_format: str = session_format
+        # 高层操作完成后调用的hook, 参数为OperationRecord
+        self.hooks: List[Callable[[OperationRecord], None]] = []
+        # redis服务端的版本, 连接后检测, 用于判断是否支持GETEX等命令
+        self.server_version: Optional[Tuple[int, ...]] = None
+        self._check_options()
 
         if app is not None:
             self.init_app(app)
@@ -139,9 +533,34 @@ class BaseStrictRedis(object):
         self.dbname = int(config.get("FESCACHE_REDIS_DBNAME", self.dbname)) or self.dbname
         self.passwd = str(config.get("FESCACHE_REDIS_PASSWD", self.passwd)) or self.passwd
         self.pool_size = int(config.get("FESCACHE_REDIS_POOL_SIZE", self.pool_size)) or self.pool_size
+        self.use_script = bool(config.get("FESCACHE_REDIS_USE_SCRIPT", self.use_script))
+        self.local_cache_size = int(config.get("FESCACHE_LOCAL_CACHE_SIZE", self.local_cache_size))
+        self.local_cache_ttl = float(config.get("FESCACHE_LOCAL_CACHE_TTL", self.local_cache_ttl))
+        self._init_local_cache()
+        self.codec = get_codec(config.get("FESCACHE_REDIS_CODEC", self.codec))
+        compress_threshold = int(config.get("FESCACHE_REDIS_COMPRESS_THRESHOLD", 0))
+        if compress_threshold > 0:  # 超过阈值的值压缩保存
+            self.codec = CompressedCodec(self.codec, compress_threshold,
+                                         str(config.get("FESCACHE_REDIS_COMPRESSOR", "zlib")))
+        self.pool_blocking = bool(config.get("FESCACHE_REDIS_POOL_BLOCKING", self.pool_blocking))
+        self.pool_timeout = float(config.get("FESCACHE_REDIS_POOL_TIMEOUT", self.pool_timeout))
+        self.cluster = bool(config.get("FESCACHE_REDIS_CLUSTER", self.cluster))
+        self.key_layout = str(config.get("FESCACHE_REDIS_KEY_LAYOUT", self.key_layout)) or self.key_layout
+        self.read_from = str(config.get("FESCACHE_REDIS_READ_FROM", self.read_from)) or self.read_from
+        self.replicas = self._parse_addresses(config.get("FESCACHE_REDIS_REPLICAS", self.replicas))
+        self.sentinels = self._parse_addresses(config.get("FESCACHE_REDIS_SENTINELS", self.sentinels))
+        self.sentinel_service = str(config.get("FESCACHE_REDIS_SENTINEL_SERVICE", self.sentinel_service)
+                                    ) or self.sentinel_service
+        self.session_format = str(config.get("FESCACHE_REDIS_SESSION_FORMAT", self.session_format)
+                                  ) or self.session_format
+        self._check_options()
 
     def init_engine(self, *, host: str = "127.0.0.1", port: int = 6379, dbname: int = 0, passwd: str = "",
-                    pool_size: int = 25):
+                    pool_size: int = 25, use_script: bool = False, local_cache_size: int = 0,
+                    local_cache_ttl: float = 5, codec: Optional[Union[str, Codec]] = None, pool_blocking: bool = False,
+                    pool_timeout: float = 5, cluster: bool = False, key_layout: str = "", read_from: str = "",
+                    replicas: Union[str, Sequence[str]] = (), sentinels: Union[str, Sequence[str]] = (),
+                    sentinel_service: str = "", session_format: str = ""):
         """
         redis 非阻塞工具类
         Args:
@@ -150,6 +569,19 @@ class BaseStrictRedis(object):
             dbname: database name
             passwd: redis password
             pool_size: redis pool size
+            use_script: 是否使用lua脚本一次往返完成session的获取、保存和更新
+            local_cache_size: 进程内本地缓存的最大条目数, 为0时不开启本地缓存
+            local_cache_ttl: 本地缓存条目的过期时间, 单位秒, 应该比redis中的过期时间短
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            pool_blocking: 是否使用阻塞连接池, 连接用完时等待其他连接释放而不是直接报错
+            pool_timeout: 阻塞连接池等待连接的超时时间, 单位秒
+            cluster: 是否使用redis集群模式, host和port为集群的任意一个节点
+            key_layout: session相关key的布局, default或者hashtag, hashtag时同一个账户的key分到集群的同一个槽
+            read_from: 只读方法默认读取的节点, primary或者replica, 每次调用可以通过read_from参数指定
+            replicas: 副本节点的地址, host:port列表或者逗号分隔的字符串, 多个副本轮流读取
+            sentinels: sentinel节点的地址, host:port列表或者逗号分隔的字符串, 指定时通过sentinel发现主节点和副本节点
+            sentinel_service: sentinel中监控的服务名称
+            session_format: session的保存格式, hash或者blob, blob时整个session保存为一个字符串, 两种格式都可以读取
         Returns:
 
         """
@@ -158,29 +590,410 @@ class BaseStrictRedis(object):
         self.dbname = dbname or self.dbname
         self.passwd = passwd or self.passwd
         self.pool_size = pool_size or self.pool_size
+        self.use_script = use_script or self.use_script
+        self.local_cache_size = local_cache_size or self.local_cache_size
+        self.local_cache_ttl = local_cache_ttl or self.local_cache_ttl
+        self._init_local_cache()
+        self.codec = get_codec(codec) if codec else self.codec
+        self.pool_blocking = pool_blocking or self.pool_blocking
+        self.pool_timeout = pool_timeout or self.pool_timeout
+        self.cluster = cluster or self.cluster
+        self.key_layout = key_layout or self.key_layout
+        self.read_from = read_from or self.read_from
+        self.replicas = self._parse_addresses(replicas) or self.replicas
+        self.sentinels = self._parse_addresses(sentinels) or self.sentinels
+        self.sentinel_service = sentinel_service or self.sentinel_service
+        self.session_format = session_format or self.session_format
+        self._check_options()
+
+    def add_hook(self, hook: Callable[[OperationRecord], None]) -> None:
+        """
+        添加统计hook, get_session、save_hash_data等高层操作完成后调用, 可以使用HistogramCollector
+        Args:
+            hook: 参数为OperationRecord的函数, 包括耗时、命令数、往返次数和字节数
+        Returns:
+
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[OperationRecord], None]) -> None:
+        """
+        删除统计hook
+        Args:
+            hook: 添加过的hook
+        Returns:
+
+        """
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def _check_options(self, ) -> None:
+        """
+        校验key的布局、读取节点和session格式, 集群模式下lua脚本访问的key必须在同一个槽, 需要hashtag布局
+        Args:
+
+        Returns:
+
+        """
+        if self.key_layout not in KEY_LAYOUTS:
+            raise FuncArgsError(f"key_layout value error, must be one of {KEY_LAYOUTS}.")
+        if self.cluster and self.use_script and self.key_layout != "hashtag":
+            raise FuncArgsError("use_script in cluster mode requires key_layout='hashtag'.")
+        if self.read_from not in READ_FROM:
+            raise FuncArgsError(f"read_from value error, must be one of {READ_FROM}.")
+        if self.cluster and (self.replicas or self.sentinels):
+            raise FuncArgsError("cluster mode does not support replicas or sentinels.")
+        if self.session_format not in SESSION_FORMATS:
+            raise FuncArgsError(f"session_format value error, must be one of {SESSION_FORMATS}.")
 
     @staticmethod
-    def rs_dumps(hash_data: Dict[str, Any]) -> Dict[str, str]:
+    def _parse_addresses(addresses: Union[str, Sequence[Any]]) -> List[Tuple[str, int]]:
+        """
+        解析节点地址
+        Args:
+            addresses: host:port列表、(host, port)列表或者逗号分隔的字符串
+        Returns:
+
+        """
+        if isinstance(addresses, str):
+            addresses = addresses.split(",")
+        result = []
+        for address in addresses or ():
+            if isinstance(address, str):
+                if not address.strip():
+                    continue
+                host, _, port = address.strip().rpartition(":")
+                address = (host, port)
+            result.append((str(address[0]), int(address[1])))
+        return result
+
+    def _read_from_replica(self, read_from: Optional[str] = None) -> bool:
+        """
+        本次读取是否发送到副本节点, 没有配置副本或者sentinel时都读取主节点
+        Args:
+            read_from: 本次调用读取的节点, 默认使用客户端的read_from
+        Returns:
+
+        """
+        read_from = read_from or self.read_from
+        if read_from not in READ_FROM:
+            raise FuncArgsError(f"read_from value error, must be one of {READ_FROM}.")
+        return read_from == "replica" and bool(self.replicas or self.sentinels)
+
+    def _apply_key_layout(self, session: Session) -> Session:
+        """
+        按照key的布局处理新保存的session
+        Args:
+            session: Session实例
+        Returns:
+
+        """
+        return session.use_hash_tag() if self.key_layout == "hashtag" else session
+
+    def _group_by_slot(self, names: Sequence[str]) -> List[List[str]]:
+        """
+        集群模式下把key按槽分组, 每组可以在一个多key命令中执行, 非集群模式只有一组
+        Args:
+            names: redis key的名称
+        Returns:
+
+        """
+        if not self.cluster:
+            return [list(names)] if names else []
+        groups: Dict[int, List[str]] = {}
+        for name in names:
+            groups.setdefault(key_slot(name), []).append(name)
+        return list(groups.values())
+
+    def _init_local_cache(self, ) -> None:
+        """
+        根据配置初始化进程内本地缓存
+        Args:
+
+        Returns:
+
+        """
+        if self.local_cache_size > 0:
+            self.local_cache = LocalCache(self.local_cache_size, self.local_cache_ttl)
+        else:
+            self.local_cache = None
+
+    def _get_codec(self, codec: Optional[Union[str, Codec]] = None) -> Codec:
+        """
+        获取本次调用使用的codec, 没有指定时使用客户端默认的codec
+        Args:
+            codec: codec名称或者Codec实例
+        Returns:
+
+        """
+        return self.codec if codec is None else get_codec(codec)
+
+    def _cache_get(self, name: str, field_name: str = "", binary: bool = False) -> Any:
+        """
+        从本地缓存中获取redis的原始返回值, 未开启本地缓存或者未命中返回None
+        Args:
+            name: redis key的名称
+            field_name: hash对象中属性的名称
+            binary: 原始返回值是否为bytes
+        Returns:
+
+        """
+        if self.local_cache is None:
+            return None
+        # bytes和str的返回值分开缓存
+        return self.local_cache.get(name, field_name + "\0b" if binary else field_name)
+
+    def _cache_set(self, name: str, value: Any, field_name: str = "", ex: Optional[int] = None,
+                   binary: bool = False) -> None:
+        """
+        把redis的原始返回值保存到本地缓存
+        Args:
+            name: redis key的名称
+            value: redis的原始返回值
+            field_name: hash对象中属性的名称
+            ex: redis中的过期时间，单位秒, 本地缓存的过期时间不会超过它
+            binary: 原始返回值是否为bytes
+        Returns:
+
+        """
+        if self.local_cache is not None and value:
+            self.local_cache.set(name, value, field_name + "\0b" if binary else field_name, ttl=ex)
+
+    def _cache_invalidate(self, *names: str) -> None:
+        """
+        使本地缓存中redis key相关的条目失效
+        Args:
+            names: redis key的名称
+        Returns:
+
+        """
+        if self.local_cache is not None:
+            self.local_cache.invalidate(*names)
+
+    @staticmethod
+    def rs_dumps(hash_data: Dict[str, Any], codec: Codec = _json_codec) -> Dict[str, Union[str, bytes]]:
         """
         结果dump
         Args:
             hash_data: hash data
+            codec: 序列化使用的codec
         Returns:
 
         """
-        return {hash_key: ordumps(hash_val) if not isinstance(hash_val, str) else hash_val
-                for hash_key, hash_val in hash_data.items()}
+        return {hash_key: codec.dumps(hash_val) for hash_key, hash_val in hash_data.items()}
 
     @staticmethod
-    def rs_loads(hash_data: Dict[str, str]) -> Dict[str, Any]:
+    def rs_loads(hash_data: Dict[Union[str, bytes], Union[str, bytes]], codec: Codec = _json_codec
+                 ) -> Dict[str, Any]:
         """
         结果load
         Args:
             hash_data: hash data
+            codec: 反序列化使用的codec, 二进制codec时hash的field为bytes
+        Returns:
+
+        """
+        if codec.binary:
+            return {hash_key.decode() if isinstance(hash_key, bytes) else hash_key: codec.loads(hash_val)
+                    for hash_key, hash_val in hash_data.items()}
+        return {hash_key: codec.loads(hash_val) for hash_key, hash_val in hash_data.items()}
+
+    @staticmethod
+    def _load_hash(hash_data: Dict[Union[str, bytes], Union[str, bytes]], codec: Codec, lazy: bool = False
+                   ) -> Union[Dict[str, Any], LazyHashData]:
+        """
+        反序列化HGETALL的返回值
+        Args:
+            hash_data: HGETALL的原始返回值
+            codec: 反序列化使用的codec
+            lazy: 是否返回LazyHashData, 访问字段时才反序列化
+        Returns:
+
+        """
+        return LazyHashData(hash_data, codec) if lazy else BaseStrictRedis.rs_loads(hash_data, codec)
+
+    @staticmethod
+    def _load_hash_fields(field_names: Sequence[str], values: Sequence[Optional[Union[str, bytes]]], codec: Codec
+                          ) -> Dict[str, Any]:
+        """
+        按照字段名称反序列化HMGET的返回值
+        Args:
+            field_names: 获取的字段名称
+            values: HMGET的原始返回值
+            codec: 反序列化使用的codec
+        Returns:
+            字段名称和值的映射, 不存在的字段为None
+        """
+        return {field_name: None if value is None else codec.loads(value)
+                for field_name, value in zip(field_names, values)}
+
+    @staticmethod
+    def _pairs_to_dict(pairs_data: List[str]) -> Dict[str, str]:
+        """
+        lua脚本返回的HGETALL结果是扁平的列表, 转换为字典
+        Args:
+            pairs_data: [field1, value1, field2, value2, ...]
+        Returns:
+
+        """
+        return dict(zip(pairs_data[::2], pairs_data[1::2]))
+
+    @staticmethod
+    def _dict_to_pairs(hash_data: Dict[str, str]) -> List[str]:
+        """
+        把字典转换为lua脚本ARGV中使用的扁平列表
+        Args:
+            hash_data: hash data
+        Returns:
+            [field1, value1, field2, value2, ...]
+        """
+        return [item for pair in hash_data.items() for item in pair]
+
+    def _dump_session(self, session: Session) -> Union[Dict[str, str], str]:
+        """
+        按照session_format序列化session
+        Args:
+            session: Session实例
+        Returns:
+            hash格式为每个字段分别序列化的字典, blob格式为整个session序列化后的字符串
+        """
+        if self.session_format == "blob":
+            # 没有旧格式的兼容问题, 其他信息只保存在kwargs中; 和hash格式一样, 不能序列化的值抛出TypeError
+            session_data = {field: getattr(session, field) for field in session.fields}
+            session_data["kwargs"] = session.kwargs
+            return orjson.dumps(session_data).decode()
+        return Session.schema.dumps(session.to_dict())
+
+    def _decode_session(self, session_data: Optional[Union[Dict[str, str], str]]) -> Optional[Dict[str, Any]]:
+        """
+        反序列化redis中的session数据, 按照返回值的类型区分格式, 不依赖当前的session_format
+        Args:
+            session_data: hash格式为HGETALL的原始返回值, blob格式为GET的原始返回值
+        Returns:
+
+        """
+        if not session_data:
+            return None
+        if isinstance(session_data, str):
+            return orjson.loads(session_data)
+        kwargs_data = session_data.get("kwargs")
+        # orjson序列化的kwargs为{}或者以{"开头, 之前的版本不能序列化时保存的是str(kwargs), 比如{'a': Decimal('1')}
+        if kwargs_data is not None and (kwargs_data == "{}" or kwargs_data.startswith('{"')):
+            # kwargs中保存了全部的其他信息, 平铺保存的副本不需要再解析
+            return Session.schema.loads(session_data, skip_extra=True)
+        # 没有kwargs或者kwargs不是json时按照平铺保存的其他信息读取
+        return Session.schema.loads({field: value for field, value in session_data.items() if field != "kwargs"})
+
+    def _load_session(self, session_data: Optional[Union[Dict[str, str], str]]) -> Optional[Session]:
+        """
+        把redis中的session数据转换为Session实例
+        Args:
+            session_data: hash格式为HGETALL的原始返回值, blob格式为GET的原始返回值
+        Returns:
+
+        """
+        session_data = self._decode_session(session_data)
+        return Session.from_dict(session_data) if session_data else None
+
+    def _script_session(self, script_data: Optional[Union[List[str], str]]) -> Optional[Union[Dict[str, str], str]]:
+        """
+        把GET_SESSION_SCRIPT的返回值转换为和HGETALL、GET一致的原始返回值
+        Args:
+            script_data: hash格式为扁平的列表, blob格式为字符串
+        Returns:
+
+        """
+        if isinstance(script_data, list):
+            return self._pairs_to_dict(script_data)
+        return script_data
+
+    @staticmethod
+    def _is_wrong_type(result: Any) -> bool:
+        """
+        pipeline不抛出错误时的返回值是否为WRONGTYPE错误, 表示session以另一种格式保存, 其他错误直接抛出
+        Args:
+            result: pipeline中一个命令的返回值
+        Returns:
+
+        """
+        if isinstance(result, Exception):
+            if str(result).startswith("WRONGTYPE"):
+                return True
+            raise result
+        return False
+
+    @staticmethod
+    def _parse_version(version: str) -> Tuple[int, ...]:
+        """
+        解析redis的版本号
+        Args:
+            version: INFO server中的redis_version, 比如6.2.6
+        Returns:
+
+        """
+        return tuple(int(val) for val in version.split(".") if val.isdigit())
+
+    def _parse_server_info(self, info: Dict[str, Any]) -> Tuple[int, ...]:
+        """
+        从INFO server的返回值中解析服务端的版本, 集群模式下返回各个节点的结果, 取最低的版本
+        Args:
+            info: INFO server的返回值
+        Returns:
+
+        """
+        if "redis_version" in info:
+            return self._parse_version(str(info["redis_version"]))
+        return min(self._parse_version(str(node_info["redis_version"])) for node_info in info.values())
+
+    @staticmethod
+    def _cached_names(name: str) -> List[str]:
+        """
+        get_or_set保存的全部key, 包括值、early_beta的元数据和stale_ex的旧值
+        Args:
+            name: redis key的名称
+        Returns:
+
+        """
+        return [name, f"{name}:meta", f"{name}:stale"]
+
+    @staticmethod
+    def _loads_cached(codec: Codec, data: Any) -> Any:
+        """
+        反序列化get_or_set读取的值, key不存在时返回CACHE_MISS, 保存的None反序列化后仍然是None
+        Args:
+            codec: 使用的codec
+            data: redis返回的原始值
+        Returns:
+
+        """
+        if data is None:
+            return CACHE_MISS
+        return codec.loads(data) if data else data
+
+    @staticmethod
+    def _dumps_meta(delta: float, ex: int) -> str:
+        """
+        提前重新计算(XFetch)使用的元数据, 保存计算耗时和逻辑过期时间
+        Args:
+            delta: 计算耗时, 单位秒
+            ex: 过期时间，单位秒
+        Returns:
+
+        """
+        return f"{delta:.6f}:{time.time() + ex:.6f}"
+
+    @staticmethod
+    def _should_refresh(meta: Union[str, bytes], beta: float) -> bool:
+        """
+        XFetch算法判断是否需要提前重新计算, 越临近过期、计算耗时越长概率越大, 逻辑过期后一定重新计算
+        Args:
+            meta: _dumps_meta保存的元数据
+            beta: 提前计算的系数, 越大越提前
         Returns:
 
         """
-        return {hash_key: orloads(hash_val) for hash_key, hash_val in hash_data.items()}
+        delta, expire_at = (float(val) for val in (meta.decode() if isinstance(meta, bytes) else meta).split(":"))
+        return time.time() - delta * beta * math.log(1.0 - random.random()) >= expire_at
 
     @staticmethod
     def _get_session_keys(session_data: Session):
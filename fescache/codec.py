@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午2:00
+"""
+import zlib
+from typing import Any, Callable, Dict, Tuple, Union
+
+import orjson
+
+from .utils import ordumps, orloads
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+__all__ = ("Codec", "JsonCodec", "OrjsonCodec", "MsgpackCodec", "RawCodec", "CompressedCodec", "get_codec")
+
+
+class Codec(object):
+    """
+    redis值的序列化和反序列化基类
+    """
+    name: str = ""
+    # 是否需要从不解码返回值的连接读取bytes
+    binary: bool = False
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        """
+        序列化
+        Args:
+            value: 需要保存的值
+        Returns:
+
+        """
+        raise NotImplementedError
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        """
+        反序列化
+        Args:
+            value: redis的返回值
+        Returns:
+
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """
+    默认的codec, 字符串原样保存, 其他值orjson序列化为字符串, 读取时解析失败返回字符串
+    """
+    name: str = "json"
+
+    def dumps(self, value: Any) -> str:
+        return value if isinstance(value, str) else ordumps(value)
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        return orloads(value)
+
+
+class OrjsonCodec(Codec):
+    """
+    orjson bytes codec, 读取时redis返回的bytes直接交给orjson.loads, 不经过str的转换
+    """
+    name: str = "orjson"
+    binary: bool = True
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        return value if isinstance(value, (str, bytes)) else orjson.dumps(value)
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:  # 兼容原样保存的字符串
+            return value.decode() if isinstance(value, bytes) else value
+
+
+class MsgpackCodec(Codec):
+    """
+    msgpack codec, 需要安装msgpack
+    """
+    name: str = "msgpack"
+    binary: bool = True
+
+    def __init__(self, ):
+        if msgpack is None:
+            raise ImportError("msgpack codec requires msgpack, please install it: pip install fescache[msgpack]")
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        return msgpack.unpackb(value, raw=False)
+
+
+class RawCodec(Codec):
+    """
+    原始bytes codec, 不做任何序列化, 保存的值必须是str或者bytes
+    """
+    name: str = "raw"
+    binary: bool = True
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        if not isinstance(value, (str, bytes)):
+            raise ValueError("raw codec value error, must be str or bytes.")
+        return value
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        return value
+
+
+class CompressedCodec(Codec):
+    """
+    压缩codec, 包装其他codec, 序列化后超过阈值的值压缩后保存, 并在开头增加标记压缩算法的头部
+
+    读取时没有头部的值交给被包装的codec, 之前未压缩保存的值也可以正常读取
+    """
+    name: str = "compressed"
+    binary: bool = True
+    # 压缩值的头部, 后面跟一个字节的压缩算法标记, json和msgpack的值都不会以这个头部开头
+    header: bytes = b"\x00FC"
+
+    def __init__(self, codec: Union[str, Codec] = "json", threshold: int = 1024, compressor: str = "zlib",
+                 level: int = -1):
+        """
+        压缩codec
+        Args:
+            codec: 被包装的codec名称或者Codec实例
+            threshold: 序列化后的长度超过阈值时压缩
+            compressor: 压缩算法, zlib、lz4、zstd, lz4和zstd需要安装对应的库
+            level: 压缩级别, -1时使用压缩算法的默认级别
+        """
+        self.codec: Codec = get_codec(codec)
+        self.threshold: int = threshold
+        self.compressor: str = compressor
+        self._compress, self._flag = self._get_compressor(compressor, level)
+
+    @staticmethod
+    def _get_compressor(compressor: str, level: int) -> Tuple[Callable[[bytes], bytes], bytes]:
+        """
+        获取压缩函数和压缩算法标记
+        Args:
+            compressor: 压缩算法
+            level: 压缩级别
+        Returns:
+
+        """
+        if compressor == "zlib":
+            return lambda data: zlib.compress(data, level), b"z"
+        elif compressor == "lz4":
+            if lz4_frame is None:
+                raise ImportError("lz4 compressor requires lz4, please install it: pip install fescache[lz4]")
+            return lambda data: lz4_frame.compress(data, compression_level=max(level, 0)), b"4"
+        elif compressor == "zstd":
+            if zstandard is None:
+                raise ImportError("zstd compressor requires zstandard, please install it: pip install fescache[zstd]")
+            zstd_compressor = zstandard.ZstdCompressor(level=level if level > 0 else 3)
+            return zstd_compressor.compress, b"s"
+        raise ValueError("compressor value error, must be one of ('zlib', 'lz4', 'zstd').")
+
+    @staticmethod
+    def _decompress(flag: bytes, data: bytes) -> bytes:
+        """
+        根据压缩算法标记解压
+        Args:
+            flag: 压缩算法标记
+            data: 压缩后的数据
+        Returns:
+
+        """
+        if flag == b"z":
+            return zlib.decompress(data)
+        elif flag == b"4":
+            if lz4_frame is None:
+                raise ImportError("lz4 compressed value requires lz4, please install it: pip install fescache[lz4]")
+            return lz4_frame.decompress(data)
+        elif flag == b"s":
+            if zstandard is None:
+                raise ImportError("zstd compressed value requires zstandard, please install it: "
+                                  "pip install fescache[zstd]")
+            return zstandard.ZstdDecompressor().decompress(data)
+        raise ValueError(f"unknown compressed flag {flag!r}.")
+
+    def dumps(self, value: Any) -> Union[str, bytes]:
+        data = self.codec.dumps(value)
+        if len(data) < self.threshold:
+            return data
+        if isinstance(data, str):
+            data = data.encode()
+        return self.header + self._flag + self._compress(data)
+
+    def loads(self, value: Union[str, bytes]) -> Any:
+        if isinstance(value, bytes):
+            if value.startswith(self.header):
+                value = self._decompress(value[3:4], value[4:])
+            # 被包装的codec不是二进制codec时按照字符串读取
+            if not self.codec.binary:
+                value = value.decode()
+        return self.codec.loads(value)
+
+
+_codecs: Dict[str, Any] = {codec_cls.name: codec_cls
+                           for codec_cls in (JsonCodec, OrjsonCodec, MsgpackCodec, RawCodec)}
+_codec_instances: Dict[str, Codec] = {}
+
+
+def get_codec(codec: Union[str, Codec]) -> Codec:
+    """
+    根据名称获取codec实例, 传入codec实例时原样返回
+    Args:
+        codec: codec名称(json, orjson, msgpack, raw)或者codec实例
+    Returns:
+
+    """
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in _codecs:
+        raise ValueError(f"codec value error, must be one of {tuple(_codecs)} or Codec instance.")
+    if codec not in _codec_instances:
+        _codec_instances[codec] = _codecs[codec]()
+    return _codec_instances[codec]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午4:00
+"""
+import hashlib
+import inspect
+from functools import wraps
+from typing import Any, Callable, Optional, Union
+
+from ._base import EXPIRED
+from .codec import Codec
+from .err import FuncArgsError
+from .utils import ordumps
+
+__all__ = ("cached",)
+
+
+def _default_key_builder(prefix: str, args: tuple, kwargs: dict) -> str:
+    """
+    默认的key生成方法, 使用函数名称和参数序列化后的摘要
+    Args:
+        prefix: key的前缀
+        args: 函数的位置参数
+        kwargs: 函数的关键字参数
+    Returns:
+
+    """
+    args_value = ordumps([args, sorted(kwargs.items())])
+    return f"{prefix}:{hashlib.md5(args_value.encode()).hexdigest()}"
+
+
+def cached(client, ex: int = EXPIRED, *, prefix: str = "", key_builder: Optional[Callable[..., str]] = None,
+           codec: Optional[Union[str, Codec]] = None, lock_timeout: float = 10, wait_timeout: float = 5,
+           stale_ex: int = 0, early_beta: float = 0) -> Callable[[Callable], Callable]:
+    """
+    把函数的返回值缓存到redis中, 同步函数使用RdbClient, 协程函数使用AIORdbClient
+
+    缓存不存在时通过get_or_set计算, 并发调用只会有一个执行函数, 被装饰的函数增加以下属性:
+        cache_key(*args, **kwargs): 获取参数对应的缓存key
+        invalidate(*args, **kwargs): 删除参数对应的缓存
+        refresh(*args, **kwargs): 重新执行函数并更新参数对应的缓存
+    Args:
+        client: RdbClient或者AIORdbClient实例
+        ex: 过期时间，单位秒
+        prefix: key的前缀, 默认为函数的模块和名称
+        key_builder: 根据函数参数生成key的函数, 参数和被装饰的函数一致, 默认使用参数序列化后的摘要,
+            参数中有无法序列化的对象(比如方法的self)时应该指定
+        codec: 使用的codec, 默认使用客户端的codec
+        lock_timeout: 计算时redis锁的过期时间, 单位秒
+        wait_timeout: 等待其他进程计算结果的时间, 单位秒
+        stale_ex: 旧值的过期时间, 单位秒, 参见get_or_set
+        early_beta: 提前重新计算(XFetch)的系数, 大于0时开启, 参见get_or_set
+    Returns:
+
+    """
+
+    def decorator(func: Callable) -> Callable:
+        key_prefix = prefix or f"{func.__module__}.{func.__qualname__}"
+        is_coroutine = inspect.iscoroutinefunction(func)
+        if is_coroutine != inspect.iscoroutinefunction(client.get_usual_data):
+            raise FuncArgsError("cached client error, coroutine function must use AIORdbClient, "
+                                "function must use RdbClient.")
+
+        def cache_key(*args, **kwargs) -> str:
+            if key_builder is not None:
+                return key_builder(*args, **kwargs)
+            return _default_key_builder(key_prefix, args, kwargs)
+
+        # noinspection PyProtectedMember
+        def invalidate(*args, **kwargs) -> Any:
+            # 同时删除get_or_set保存的元数据和旧值, 否则开启stale_ex时删除后还会返回旧值
+            return client.delete_keys(client._cached_names(cache_key(*args, **kwargs)))
+
+        if is_coroutine:
+            @wraps(func)
+            async def wrapper(*args, **kwargs) -> Any:
+                return await client.get_or_set(cache_key(*args, **kwargs), lambda: func(*args, **kwargs), ex=ex,
+                                               lock_timeout=lock_timeout, wait_timeout=wait_timeout,
+                                               stale_ex=stale_ex, early_beta=early_beta, codec=codec)
+
+            # noinspection PyProtectedMember
+            async def refresh(*args, **kwargs) -> Any:
+                # 和get_or_set一样保存值以及元数据、旧值
+                return await client._load_and_save(cache_key(*args, **kwargs), lambda: func(*args, **kwargs), ex,
+                                                   stale_ex, early_beta, codec)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs) -> Any:
+                return client.get_or_set(cache_key(*args, **kwargs), lambda: func(*args, **kwargs), ex=ex,
+                                         lock_timeout=lock_timeout, wait_timeout=wait_timeout, stale_ex=stale_ex,
+                                         early_beta=early_beta, codec=codec)
+
+            # noinspection PyProtectedMember
+            def refresh(*args, **kwargs) -> Any:
+                # 和get_or_set一样保存值以及元数据、旧值
+                return client._load_and_save(cache_key(*args, **kwargs), lambda: func(*args, **kwargs), ex, stale_ex,
+                                             early_beta, codec)
+
+        wrapper.cache_key = cache_key
+        wrapper.invalidate = invalidate
+        wrapper.refresh = refresh
+        return wrapper
+
+    return decorator
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 上午10:00
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+__all__ = ("LocalCache",)
+
+
+class LocalCache(object):
+    """
+    进程内的本地缓存(L1), 位于redis之前, 按LRU淘汰并且每个条目都有过期时间
+
+    缓存的key为(redis key, hash field), 同一个redis key下的所有条目可以一次性失效
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5):
+        """
+        进程内的本地缓存
+        Args:
+            maxsize: 最大缓存条目数, 超过后淘汰最近最少使用的条目
+            ttl: 条目的默认过期时间, 单位秒, 应该比redis中的过期时间短
+        """
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._names: Dict[str, Set[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self, ) -> int:
+        return len(self._data)
+
+    def get(self, name: str, field_name: str = "") -> Any:
+        """
+        获取缓存的值, 不存在或者已过期返回None
+        Args:
+            name: redis key的名称
+            field_name: hash对象中属性的名称
+        Returns:
+
+        """
+        key = (name, field_name)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+            self.misses += 1
+        return None
+
+    def set(self, name: str, value: Any, field_name: str = "", ttl: Optional[float] = None) -> None:
+        """
+        设置缓存的值
+        Args:
+            name: redis key的名称
+            value: 缓存的值
+            field_name: hash对象中属性的名称
+            ttl: 过期时间, 单位秒, 默认使用实例的ttl
+        Returns:
+
+        """
+        key = (name, field_name)
+        expire_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._data[key] = (expire_at, value)
+            self._data.move_to_end(key)
+            self._names.setdefault(name, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def invalidate(self, *names: str) -> None:
+        """
+        使redis key下的所有缓存条目失效
+        Args:
+            names: redis key的名称
+        Returns:
+
+        """
+        with self._lock:
+            for name in names:
+                for key in self._names.pop(name, ()):
+                    self._data.pop(key, None)
+
+    def clear(self, ) -> None:
+        """
+        清空所有缓存
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            self._data.clear()
+            self._names.clear()
+
+    def stats(self, ) -> Dict[str, Any]:
+        """
+        缓存的命中统计, 用于确定缓存的大小
+        Args:
+
+        Returns:
+
+        """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        """
+        删除条目, 调用方需要持有锁
+        Args:
+            key: (redis key, hash field)
+        Returns:
+
+        """
+        self._data.pop(key, None)
+        keys = self._names.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._names[key[0]]
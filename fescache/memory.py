@@ -0,0 +1,878 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:00
+"""
+import asyncio
+import fnmatch
+import heapq
+import inspect
+import threading
+import time
+from functools import wraps
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ._base import BaseStrictRedis, CACHE_MISS, EXPIRED, KeyLocks, SESSION_EXPIRED, Session
+from .codec import Codec
+from .err import FuncArgsError, RedisClientError
+from .metrics import instrument
+from .utils import ignore_error
+
+__all__ = ("MemoryStore", "MemoryRdbClient", "AIOMemoryRdbClient")
+
+
+class MemoryStore(object):
+    """
+    进程内的key空间, 保存字符串、hash和列表, 语义和redis一致
+
+    过期时间保存在最小堆中, 读取时惰性检查单个key, 写入时从堆顶清理少量已经过期的key,
+    刷新过期时间不删除堆中的旧条目, 旧条目过多时重建堆, 大量key时每次操作的开销仍然是O(log n)
+    """
+    # 每次写入最多清理的过期key数量
+    evict_batch: int = 32
+
+    def __init__(self, ):
+        self._data: Dict[str, Any] = {}
+        self._expires: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.RLock()
+
+    def __len__(self, ) -> int:
+        return len(self._data)
+
+    def _alive(self, key: str, kind: Optional[type] = None) -> Any:
+        """
+        获取未过期的值, 已经过期的key直接删除, 调用方需要持有锁
+        Args:
+            key: key
+            kind: 值的类型, 类型不对时报错
+        Returns:
+
+        """
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._remove(key)
+            return None
+        value = self._data.get(key)
+        if value is not None and kind is not None and not isinstance(value, kind):
+            raise RedisClientError("WRONGTYPE Operation against a key holding the wrong kind of value.")
+        return value
+
+    def _remove(self, key: str) -> bool:
+        self._expires.pop(key, None)
+        return self._data.pop(key, None) is not None
+
+    def _set_expire(self, key: str, ex: Optional[float]) -> None:
+        """
+        设置过期时间, ex为None时取消过期时间, 调用方需要持有锁
+        Args:
+            key: key
+            ex: 过期时间, 单位秒
+        Returns:
+
+        """
+        if ex is None:
+            self._expires.pop(key, None)
+            return
+        deadline = time.monotonic() + ex
+        self._expires[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        # 刷新过期时间留下的旧条目超过一半时重建堆
+        if len(self._heap) > 2 * len(self._expires) + 1024:
+            self._heap = [(deadline, key) for key, deadline in self._expires.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self, limit: int) -> int:
+        """
+        从堆顶清理已经过期的key, 调用方需要持有锁
+        Args:
+            limit: 最多清理的数量
+        Returns:
+            清理的数量
+        """
+        now, evicted = time.monotonic(), 0
+        while self._heap and self._heap[0][0] <= now and evicted < limit:
+            deadline, key = heapq.heappop(self._heap)
+            if self._expires.get(key) == deadline:  # 过期时间刷新过的是旧条目
+                self._remove(key)
+                evicted += 1
+        return evicted
+
+    def purge_expired(self, ) -> int:
+        """
+        清理所有已经过期的key
+        Args:
+
+        Returns:
+            清理的数量
+        """
+        with self._lock:
+            return self._evict(len(self._heap))
+
+    def clear(self, ) -> None:
+        """
+        清空所有key
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            self._heap.clear()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            return self._alive(key, (str, bytes))
+
+    def set(self, key: str, value: Union[str, bytes], ex: Optional[float] = None, nx: bool = False) -> bool:
+        with self._lock:
+            self._evict(self.evict_batch)
+            if nx and self._alive(key) is not None:
+                return False
+            self._data[key] = value
+            self._set_expire(key, ex)
+            return True
+
+    def getex(self, key: str, ex: float) -> Any:
+        with self._lock:
+            value = self._alive(key, (str, bytes))
+            if value is not None:
+                self._set_expire(key, ex)
+            return value
+
+    def getex_any(self, key: str, ex: float) -> Any:
+        """
+        获取任意类型的值并刷新过期时间, 用于读取hash或者blob格式保存的session
+        Args:
+            key: key
+            ex: 过期时间, 单位秒
+        Returns:
+            hash返回拷贝, key不存在时返回None
+        """
+        with self._lock:
+            value = self._alive(key)
+            if value is None:
+                return None
+            self._set_expire(key, ex)
+            return dict(value) if isinstance(value, dict) else value
+
+    def kind(self, key: str) -> str:
+        """
+        值的类型, 和redis的TYPE命令一致
+        Args:
+            key: key
+        Returns:
+            string、hash、list或者none
+        """
+        with self._lock:
+            value = self._alive(key)
+        if value is None:
+            return "none"
+        return "hash" if isinstance(value, dict) else "list" if isinstance(value, list) else "string"
+
+    def expire(self, key: str, ex: float) -> bool:
+        with self._lock:
+            if self._alive(key) is None:
+                return False
+            self._set_expire(key, ex)
+            return True
+
+    def ttl(self, key: str) -> float:
+        """
+        剩余的过期时间, 单位秒, key不存在时返回-2, 没有过期时间时返回-1
+        Args:
+            key: key
+        Returns:
+
+        """
+        with self._lock:
+            if self._alive(key) is None:
+                return -2
+            deadline = self._expires.get(key)
+            return -1 if deadline is None else deadline - time.monotonic()
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return self._alive(key) is not None
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._remove(key) for key in keys if self._alive(key) is not None)
+
+    def keys(self, pattern: str = "*") -> List[str]:
+        with self._lock:
+            return [key for key in list(self._data) if fnmatch.fnmatchcase(key, pattern) and
+                    self._alive(key) is not None]
+
+    def hset(self, key: str, mapping: Dict[str, Union[str, bytes]]) -> None:
+        with self._lock:
+            self._evict(self.evict_batch)
+            hash_data = self._alive(key, dict)
+            if hash_data is None:
+                hash_data = self._data[key] = {}
+            hash_data.update(mapping)
+
+    def hget(self, key: str, field: str) -> Any:
+        with self._lock:
+            return (self._alive(key, dict) or {}).get(field)
+
+    def hgetall(self, key: str) -> Dict[str, Union[str, bytes]]:
+        with self._lock:
+            return dict(self._alive(key, dict) or {})
+
+    def hmget(self, key: str, fields: Sequence[str]) -> List[Any]:
+        with self._lock:
+            hash_data = self._alive(key, dict) or {}
+            return [hash_data.get(field) for field in fields]
+
+    def push(self, key: str, values: Sequence[Any], left: bool = True) -> int:
+        with self._lock:
+            self._evict(self.evict_batch)
+            list_data = self._alive(key, list)
+            if list_data is None:
+                list_data = self._data[key] = []
+            values = [value if isinstance(value, (str, bytes)) else str(value) for value in values]
+            if left:
+                list_data[:0] = reversed(values)
+            else:
+                list_data.extend(values)
+            return len(list_data)
+
+    def lrange(self, key: str, start: int, end: int) -> List[Union[str, bytes]]:
+        with self._lock:
+            list_data = self._alive(key, list) or []
+            start = max(len(list_data) + start if start < 0 else start, 0)
+            end = len(list_data) + end if end < 0 else end
+            return list_data[start:end + 1]
+
+    def incr(self, key: str, amount: Union[int, float]) -> Union[int, float]:
+        with self._lock:
+            self._evict(self.evict_batch)
+            value = self._alive(key, (str, bytes))
+            try:
+                number = (int if isinstance(amount, int) else float)(value or 0) + amount
+            except ValueError:
+                raise RedisClientError("value is not an integer or a float.")
+            self._data[key] = str(number)
+            return number
+
+
+class MemoryRdbClient(BaseStrictRedis):
+    """
+    纯python的内存后端, 和RdbClient的高层方法一致, 不需要redis, 用于单元测试、本地开发和单机部署
+
+    值按照codec序列化后保存, 读取和过期时间的语义和RdbClient一致
+    """
+
+    def __init__(self, app=None, *, codec: Union[str, Codec] = "json", key_layout: str = "default",
+                 session_format: str = "hash", **kwargs) -> None:
+        """
+        纯python的内存后端
+        Args:
+            app: app应用
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            key_layout: session相关key的布局, default或者hashtag, 和redis客户端保持一致的key名称
+            session_format: session的保存格式, hash或者blob, 两种格式都可以读取
+            kwargs: 和RdbClient兼容的其他参数, 内存后端不使用
+        """
+        self.store: MemoryStore = MemoryStore()
+        # get_or_set进程内合并调用使用的按照key分配的锁
+        self._flight_locks: KeyLocks = KeyLocks()
+        super().__init__(app, codec=codec, key_layout=key_layout, session_format=session_format)
+
+    # noinspection PyUnusedLocal
+    def init_engine(self, *, codec: Optional[Union[str, Codec]] = None, key_layout: str = "",
+                    session_format: str = "", **kwargs) -> None:
+        """
+        内存后端不需要连接
+        Args:
+            codec: 普通数据和hash数据默认的codec
+            key_layout: session相关key的布局, default或者hashtag
+            session_format: session的保存格式, hash或者blob
+            kwargs: 和RdbClient兼容的其他参数, 内存后端不使用
+        Returns:
+
+        """
+        super().init_engine(codec=codec, key_layout=key_layout, session_format=session_format)
+
+    def pool_stats(self, ) -> Dict[str, Any]:
+        return {}
+
+    def _get_session(self, session_id: str, ex: int) -> Optional[Session]:
+        # hash和blob格式保存的session都可以读取
+        session = self._load_session(self.store.getex_any(session_id, ex))
+        if session is not None:
+            self.store.expire(session.account_id, ex)
+        return session
+
+    def _delete_session(self, session_id: str) -> None:
+        session_data = self._get_session(session_id, SESSION_EXPIRED)
+        if session_data:
+            self.store.delete(*self._get_session_keys(session_data))
+
+    def _get_usual_data(self, name: str, ex: int, codec: Optional[Union[str, Codec]]) -> Any:
+        data = self.store.getex(name, ex)
+        return self._get_codec(codec).loads(data) if data else data
+
+    def _get_cached(self, name: str, ex: int, codec: Optional[Union[str, Codec]]) -> Any:
+        return self._loads_cached(self._get_codec(codec), self.store.getex(name, ex))
+
+    @instrument
+    def save_session(self, session: Session, ex: int = SESSION_EXPIRED) -> str:
+        """
+        利用hash map保存session
+        Args:
+            session: Session 实例
+            ex: 过期时间，单位秒
+        Returns:
+
+        """
+        if not isinstance(session, Session):
+            raise FuncArgsError(f"session value error, must be Session Type.")
+        session = self._apply_key_layout(session)
+        session_data = self._dump_session(session)
+        if self.session_format == "blob":
+            self.store.set(session.session_id, session_data, ex)
+        else:
+            if self.store.kind(session.session_id) == "string":  # 切换格式之前以blob格式保存的session
+                self.store.delete(session.session_id)
+            self.store.hset(session.session_id, session_data)
+            self.store.expire(session.session_id, ex)
+        # 清除老的令牌, 令牌原样保存, 不经过codec
+        old_session_id = self.store.get(session.account_id)
+        if old_session_id and old_session_id != session.session_id:
+            with ignore_error():
+                self._delete_session(old_session_id)
+        # 更新新的令牌
+        self.store.set(session.account_id, session.session_id, ex)
+        session.mark_clean()
+        return session.session_id
+
+    @instrument
+    def delete_session(self, session_id: str) -> None:
+        """
+        利用hash map删除session
+        Args:
+            session_id: session id
+        Returns:
+
+        """
+        self._delete_session(session_id)
+
+    @instrument
+    def update_session(self, session: Session, ex: int = SESSION_EXPIRED) -> None:
+        """
+        利用hash map更新session, 从内存获取的session只写入修改过的字段, session已经过期时写入全部字段
+        Args:
+            session: Session实例
+            ex: 过期时间，单位秒
+        Returns:
+
+        """
+        if self.session_format == "blob":
+            self.store.set(session.session_id, self._dump_session(session), ex)
+        else:
+            session_data = session.to_dirty_dict()
+            kind = self.store.kind(session.session_id)
+            if kind == "string":  # 切换格式之前以blob格式保存的session
+                self.store.delete(session.session_id)
+            if session_data is None or kind != "hash":
+                session_data = session.to_dict()
+            self.store.hset(session.session_id, Session.schema.dumps(session_data))
+            self.store.expire(session.session_id, ex)
+        # 更新令牌, 令牌原样保存, 不经过codec
+        self.store.set(session.account_id, session.session_id, ex)
+        session.mark_clean()
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_session(self, session_id: str, ex: int = SESSION_EXPIRED, read_from: Optional[str] = None
+                    ) -> Optional[Session]:
+        """
+        获取session
+        Args:
+            session_id: session id
+            ex: 过期时间，单位秒
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+
+        """
+        return self._get_session(session_id, ex)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_sessions(self, session_ids: Sequence[str], ex: int = SESSION_EXPIRED, chunk_size: int = 500,
+                     read_from: Optional[str] = None) -> Dict[str, Optional[Session]]:
+        """
+        批量获取session
+        Args:
+            session_ids: session id列表
+            ex: 过期时间，单位秒
+            chunk_size: 和RdbClient兼容, 内存后端不使用
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+            session id和Session的映射, session不存在时为None
+        """
+        return {session_id: self._get_session(session_id, ex) for session_id in dict.fromkeys(session_ids)}
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def verify(self, session_id: str, read_from: Optional[str] = None) -> Session:
+        """
+        校验session，主要用于登录校验
+        Args:
+            session_id
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+
+        """
+        session = self._get_session(session_id, SESSION_EXPIRED)
+        if not session:
+            raise RedisClientError("invalid session_id, session_id={}".format(session_id))
+        return session
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def verify_many(self, session_ids: Sequence[str], read_from: Optional[str] = None) -> Dict[str, Session]:
+        """
+        批量校验session, 任意一个session无效都会报错
+        Args:
+            session_ids: session id列表
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+
+        """
+        sessions = {session_id: self._get_session(session_id, SESSION_EXPIRED)
+                    for session_id in dict.fromkeys(session_ids)}
+        invalid_ids = [session_id for session_id, session in sessions.items() if session is None]
+        if invalid_ids:
+            raise RedisClientError("invalid session_id, session_id={}".format(invalid_ids))
+        return sessions
+
+    @instrument
+    def save_hash_data(self, name: str, hash_data: Any, field_name: str = "", ex: int = EXPIRED,
+                       codec: Optional[Union[str, Codec]] = None) -> None:
+        """
+        保存hash对象
+        Args:
+            name: redis hash key的名称
+            field_name: 保存的hash mapping 中的某个字段
+            hash_data: 获取的hash对象中属性的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+
+        """
+        codec = self._get_codec(codec)
+        if field_name:
+            self.store.hset(name, {field_name: codec.dumps(hash_data)})
+        else:
+            if not isinstance(hash_data, Dict):
+                raise ValueError("hash data error, must be MutableMapping.")
+            self.store.hset(name, self.rs_dumps(hash_data, codec))
+        self.store.expire(name, ex)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_hash_data(self, name: str, field_name: str = "", ex: int = EXPIRED,
+                      codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None,
+                      lazy: bool = False) -> Any:
+        """
+        获取hash对象field_name对应的值
+        Args:
+            name: redis hash key的名称
+            field_name: 获取的hash对象中属性的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+            lazy: 没有指定field_name时是否返回LazyHashData, 字段在第一次访问时才反序列化
+        Returns:
+            反序列化对象
+        """
+        codec = self._get_codec(codec)
+        hash_data = self.store.hget(name, field_name) if field_name else self.store.hgetall(name)
+        self.store.expire(name, ex)
+        if hash_data:
+            hash_data = codec.loads(hash_data) if field_name else self._load_hash(hash_data, codec, lazy)
+        return hash_data
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_hash_fields(self, name: str, field_names: Sequence[str], ex: int = EXPIRED,
+                        codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取hash对象中指定的多个字段
+        Args:
+            name: redis hash key的名称
+            field_names: 获取的hash对象中属性的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+            字段名称和反序列化对象的映射, 不存在的字段为None
+        """
+        if not field_names:
+            return {}
+        codec = self._get_codec(codec)
+        values = self.store.hmget(name, field_names)
+        self.store.expire(name, ex)
+        return self._load_hash_fields(field_names, values, codec)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_list_data(self, name: str, start: int = 0, end: int = -1, ex: int = EXPIRED,
+                      read_from: Optional[str] = None) -> Optional[List[Union[str, int, float]]]:
+        """
+        获取列表中的数据
+        Args:
+            name: redis key的名称
+            start: 获取数据的起始位置,默认列表的第一个值
+            end: 获取数据的结束位置，默认列表的最后一个值
+            ex: 过期时间，单位秒
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+
+        """
+        data = self.store.lrange(name, start, end)
+        self.store.expire(name, ex)
+        return data
+
+    @instrument
+    def save_list_data(self, name: str, list_data: Union[List[Union[str, int, float]], Union[str, int, float]],
+                       save_to_left: bool = True, ex: int = EXPIRED) -> None:
+        """
+        保存数据到列表中
+        Args:
+            name: redis key的名称
+            list_data: 保存的值,可以是单个值也可以是元祖
+            save_to_left: 是否保存到列表的左边，默认保存到左边
+            ex: 过期时间，单位秒
+        Returns:
+
+        """
+        list_data = [list_data] if isinstance(list_data, str) else list_data
+        self.store.push(name, list_data, save_to_left)
+        self.store.expire(name, ex)
+
+    @instrument
+    def save_usual_data(self, name: str, value: Any, ex: int = EXPIRED, codec: Optional[Union[str, Codec]] = None
+                        ) -> None:
+        """
+        保存列表、映射对象为普通的字符串
+        Args:
+            name: redis key的名称
+            value: 保存的值，可以是可序列化的任何职
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+
+        """
+        self.store.set(name, self._get_codec(codec).dumps(value), ex)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_usual_data(self, name: str, ex: int = EXPIRED, codec: Optional[Union[str, Codec]] = None,
+                       read_from: Optional[str] = None) -> Any:
+        """
+        获取name对应的值
+        Args:
+            name: redis key的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+            反序列化对象
+        """
+        return self._get_usual_data(name, ex, codec)
+
+    @instrument
+    def save_usual_data_many(self, mapping: Dict[str, Any], ex: int = EXPIRED,
+                             codec: Optional[Union[str, Codec]] = None) -> None:
+        """
+        批量保存普通的字符串
+        Args:
+            mapping: redis key的名称和保存的值的映射
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+
+        """
+        codec = self._get_codec(codec)
+        for name, value in mapping.items():
+            self.store.set(name, codec.dumps(value), ex)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_usual_data_many(self, names: Sequence[str], ex: int = EXPIRED,
+                            codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None
+                            ) -> Dict[str, Any]:
+        """
+        批量获取name对应的值
+        Args:
+            names: redis key的名称列表
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+            redis key的名称和反序列化对象的映射, key不存在时为None
+        """
+        return {name: self._get_usual_data(name, ex, codec) for name in dict.fromkeys(names)}
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_or_set(self, name: str, loader: Callable[[], Any], ex: int = EXPIRED, lock_timeout: float = 10,
+                   wait_timeout: float = 5, stale_ex: int = 0, early_beta: float = 0,
+                   codec: Optional[Union[str, Codec]] = None) -> Any:
+        """
+        获取name对应的值, 不存在时调用loader计算并保存, 同一个key的并发调用只会有一个调用loader
+
+        内存后端只有一个进程, lock_timeout、wait_timeout、stale_ex、early_beta只为和RdbClient的参数保持一致
+        Args:
+            name: key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+            反序列化对象
+        """
+        value = self._get_cached(name, ex, codec)
+        if value is not CACHE_MISS:
+            return value
+        with self._flight_locks.hold(name):
+            value = self._get_cached(name, ex, codec)
+            if value is CACHE_MISS:
+                value = self._load_and_save(name, loader, ex, stale_ex, early_beta, codec)
+        return value
+
+    # noinspection PyUnusedLocal
+    def _load_and_save(self, name: str, loader: Callable[[], Any], ex: int, stale_ex: int, early_beta: float,
+                       codec: Optional[Union[str, Codec]]) -> Any:
+        """
+        调用loader计算并保存, 内存后端不保存元数据和旧值
+        Args:
+            name: key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            stale_ex: 和RdbClient兼容, 内存后端不使用
+            early_beta: 和RdbClient兼容, 内存后端不使用
+            codec: 本次调用使用的codec
+        Returns:
+
+        """
+        value = loader()
+        self.store.set(name, self._get_codec(codec).dumps(value), ex)
+        return value
+
+    @instrument
+    def incrbynumber(self, name: str, amount: int = 1, ex: int = EXPIRED) -> None:
+        """
+        通过给定的值对已有的值进行递增
+        Args:
+
+        Returns:
+
+        """
+        self.store.incr(name, amount)
+        self.store.expire(name, ex)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def is_exists(self, name: str, read_from: Optional[str] = None) -> bool:
+        """
+        判断key是否存在
+        Args:
+            name: key的名称
+            read_from: 和RdbClient兼容, 内存后端只有一份数据, 不使用
+        Returns:
+
+        """
+        return self.store.exists(name)
+
+    @instrument
+    def delete_keys(self, names: Sequence[str]) -> None:
+        """
+        删除一个或多个key
+        Args:
+            names: key的名称
+        Returns:
+
+        """
+        names = (names,) if isinstance(names, str) else names
+        self.store.delete(*names)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def delete_pattern(self, pattern_name: str, batch: int = 500, dry_run: bool = False, rate_limit: int = 0
+                       ) -> int:
+        """
+        根据正则表达式删除keys
+        Args:
+            pattern_name: 正则表达式的名称
+            batch: 和RdbClient兼容, 内存后端不使用
+            dry_run: 只统计匹配的key数量不删除
+            rate_limit: 和RdbClient兼容, 内存后端不使用
+        Returns:
+            删除的key数量, dry_run时为匹配的key数量
+        """
+        keys = self.store.keys(pattern_name)
+        return len(keys) if dry_run else self.store.delete(*keys)
+
+    # noinspection PyUnusedLocal
+    def iter_keys(self, pattern_name: str, count: int = 1000) -> Iterator[str]:
+        """
+        迭代匹配的keys
+        Args:
+            pattern_name: 正则表达式的名称
+            count: 和RdbClient兼容, 内存后端不使用
+        Returns:
+
+        """
+        yield from self.store.keys(pattern_name)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    def get_keys(self, pattern_name: str, use_scan: bool = False, count: int = 1000) -> List[str]:
+        """
+        根据正则表达式获取keys
+        Args:
+            pattern_name:正则表达式的名称
+            use_scan: 和RdbClient兼容, 内存后端不使用
+            count: 和RdbClient兼容, 内存后端不使用
+        Returns:
+
+        """
+        return self.store.keys(pattern_name)
+
+
+def _to_async(func: Callable) -> Callable:
+    """
+    把内存后端的同步方法包装为协程方法, 内存操作不会阻塞事件循环
+    Args:
+        func: MemoryRdbClient的方法
+    Returns:
+
+    """
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs) -> Any:
+        return func(self, *args, **kwargs)
+
+    return wrapper
+
+
+class AIOMemoryRdbClient(MemoryRdbClient):
+    """
+    纯python的内存后端, 和AIORdbClient的高层方法一致, 所有方法都是协程
+    """
+
+    def __init__(self, app=None, *, codec: Union[str, Codec] = "json", key_layout: str = "default",
+                 session_format: str = "hash", **kwargs) -> None:
+        """
+        纯python的内存后端
+        Args:
+            app: app应用
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            key_layout: session相关key的布局, default或者hashtag, 和redis客户端保持一致的key名称
+            session_format: session的保存格式, hash或者blob, 两种格式都可以读取
+            kwargs: 和AIORdbClient兼容的其他参数, 内存后端不使用
+        """
+        self._flights: Dict[str, asyncio.Future] = {}  # get_or_set正在计算的key
+        super().__init__(app, codec=codec, key_layout=key_layout, session_format=session_format, **kwargs)
+
+    save_session = _to_async(MemoryRdbClient.save_session)
+    delete_session = _to_async(MemoryRdbClient.delete_session)
+    update_session = _to_async(MemoryRdbClient.update_session)
+    get_session = _to_async(MemoryRdbClient.get_session)
+    get_sessions = _to_async(MemoryRdbClient.get_sessions)
+    verify = _to_async(MemoryRdbClient.verify)
+    verify_many = _to_async(MemoryRdbClient.verify_many)
+    save_hash_data = _to_async(MemoryRdbClient.save_hash_data)
+    get_hash_data = _to_async(MemoryRdbClient.get_hash_data)
+    get_hash_fields = _to_async(MemoryRdbClient.get_hash_fields)
+    get_list_data = _to_async(MemoryRdbClient.get_list_data)
+    save_list_data = _to_async(MemoryRdbClient.save_list_data)
+    save_usual_data = _to_async(MemoryRdbClient.save_usual_data)
+    get_usual_data = _to_async(MemoryRdbClient.get_usual_data)
+    save_usual_data_many = _to_async(MemoryRdbClient.save_usual_data_many)
+    get_usual_data_many = _to_async(MemoryRdbClient.get_usual_data_many)
+    incrbynumber = _to_async(MemoryRdbClient.incrbynumber)
+    is_exists = _to_async(MemoryRdbClient.is_exists)
+    delete_keys = _to_async(MemoryRdbClient.delete_keys)
+    delete_pattern = _to_async(MemoryRdbClient.delete_pattern)
+    get_keys = _to_async(MemoryRdbClient.get_keys)
+
+    # noinspection PyUnusedLocal
+    @instrument
+    async def get_or_set(self, name: str, loader: Callable[[], Any], ex: int = EXPIRED, lock_timeout: float = 10,
+                         wait_timeout: float = 5, stale_ex: int = 0, early_beta: float = 0,
+                         codec: Optional[Union[str, Codec]] = None) -> Any:
+        """
+        获取name对应的值, 不存在时调用loader计算并保存, 同一个key的并发调用共享一个loader的结果
+
+        内存后端只有一个进程, lock_timeout、wait_timeout、stale_ex、early_beta只为和AIORdbClient的参数保持一致
+        Args:
+            name: key的名称
+            loader: 计算值的函数, 可以是普通函数或者协程函数
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+            反序列化对象
+        """
+        value = self._get_cached(name, ex, codec)
+        if value is not CACHE_MISS:
+            return value
+        flight = self._flights.get(name)
+        if flight is not None:
+            return await asyncio.shield(flight)
+
+        flight = self._flights[name] = asyncio.get_event_loop().create_future()
+        try:
+            value = await self._load_and_save(name, loader, ex, stale_ex, early_beta, codec)
+        except BaseException as e:
+            flight.set_exception(e)
+            flight.exception()  # 没有其他等待者时不提示未获取的异常
+            raise
+        else:
+            flight.set_result(value)
+        finally:
+            self._flights.pop(name, None)
+        return value
+
+    # noinspection PyUnusedLocal
+    async def _load_and_save(self, name: str, loader: Callable[[], Any], ex: int, stale_ex: int, early_beta: float,
+                             codec: Optional[Union[str, Codec]]) -> Any:
+        """
+        调用loader计算并保存, 内存后端不保存元数据和旧值
+        Args:
+            name: key的名称
+            loader: 计算值的函数, 可以是普通函数或者协程函数
+            ex: 过期时间，单位秒
+            stale_ex: 和AIORdbClient兼容, 内存后端不使用
+            early_beta: 和AIORdbClient兼容, 内存后端不使用
+            codec: 本次调用使用的codec
+        Returns:
+
+        """
+        value = loader()
+        if inspect.isawaitable(value):
+            value = await value
+        self.store.set(name, self._get_codec(codec).dumps(value), ex)
+        return value
+
+    # noinspection PyUnusedLocal
+    async def iter_keys(self, pattern_name: str, count: int = 1000) -> AsyncIterator[str]:
+        """
+        迭代匹配的keys
+        Args:
+            pattern_name: 正则表达式的名称
+            count: 和AIORdbClient兼容, 内存后端不使用
+        Returns:
+
+        """
+        for key in self.store.keys(pattern_name):
+            yield key
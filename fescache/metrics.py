@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午9:00
+"""
+import bisect
+import inspect
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+__all__ = ("OperationRecord", "HistogramCollector", "instrument", "prometheus_text", "record_send", "record_reply",
+           "current_record")
+
+# 默认的耗时分桶, 单位秒
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                                      0.5, 1.0, 2.5, 5.0, 10.0)
+
+# hook的错误使用标准库的logging记录, aelog 1.0.9在python3.8+上调用exception会抛出TypeError,
+# 并且aelog会替换调用模块同名logger的findCaller, 所以使用包名的logger
+_logger = logging.getLogger("fescache")
+
+# 当前正在执行的高层操作, 连接发送和读取时把命令数和字节数记录到这里
+_current_record: ContextVar[Optional["OperationRecord"]] = ContextVar("fescache_operation_record", default=None)
+
+
+class OperationRecord(object):
+    """
+    一次高层操作(get_session、save_hash_data等)的统计, 执行完成后交给客户端的hooks
+
+    嵌套的操作(parent不为None)只累加到外层操作, 不会单独交给hooks, 避免重复统计
+
+    commands为读取的返回值个数, round_trips为写入连接的次数, pipeline的所有命令只算一次往返,
+    bytes_out为发送的协议字节数, bytes_in为返回值的数据长度(字符串按长度估算)
+    """
+    __slots__ = ("name", "elapsed", "commands", "round_trips", "bytes_out", "bytes_in", "error", "parent")
+
+    def __init__(self, name: str, parent: Optional["OperationRecord"] = None):
+        self.name: str = name
+        self.elapsed: float = 0.0
+        self.commands: int = 0
+        self.round_trips: int = 0
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+        self.error: bool = False
+        self.parent: Optional[OperationRecord] = parent
+
+    def __repr__(self, ) -> str:
+        return (f"<OperationRecord {self.name} elapsed={self.elapsed:.6f} commands={self.commands} "
+                f"round_trips={self.round_trips} bytes_out={self.bytes_out} bytes_in={self.bytes_in}>")
+
+
+def _payload_size(value: Any) -> int:
+    """
+    估算返回值的数据长度
+    Args:
+        value: redis的返回值
+    Returns:
+
+    """
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_payload_size(key) + _payload_size(item) for key, item in value.items())
+    if isinstance(value, (int, float)):
+        return len(str(value))
+    return 0
+
+
+def current_record() -> Optional[OperationRecord]:
+    """
+    当前正在执行的高层操作, 没有统计时为None
+    Args:
+
+    Returns:
+
+    """
+    return _current_record.get()
+
+
+def record_send(command: Any, record: Optional[OperationRecord] = None) -> None:
+    """
+    连接写入命令时调用, 记录一次往返和发送的字节数
+    Args:
+        command: 打包后的命令, bytes或者bytes列表
+        record: 记录到的操作, 默认为当前的操作, 多个调用方的命令合并发送时分别指定
+    Returns:
+
+    """
+    record = _current_record.get() if record is None else record
+    if record is not None:
+        record.round_trips += 1
+        record.bytes_out += len(command) if isinstance(command, (bytes, str)) else sum(len(item) for item in command)
+
+
+def record_reply(response: Any, record: Optional[OperationRecord] = None) -> None:
+    """
+    连接读取返回值时调用, 记录一个命令和返回的数据长度
+    Args:
+        response: redis的返回值
+        record: 记录到的操作, 默认为当前的操作, 多个调用方的命令合并发送时分别指定
+    Returns:
+
+    """
+    record = _current_record.get() if record is None else record
+    if record is not None:
+        record.commands += 1
+        record.bytes_in += _payload_size(response)
+
+
+def _start_record(name: str) -> Tuple[OperationRecord, Any, float]:
+    record = OperationRecord(name, _current_record.get())
+    return record, _current_record.set(record), time.perf_counter()
+
+
+def _finish_record(client, record: OperationRecord, token: Any, start: float) -> None:
+    """
+    结束统计, 嵌套的操作(比如verify调用get_session)只把统计累加到外层操作, 最外层的操作才交给客户端的hooks
+    Args:
+        client: 客户端
+        record: 操作的统计
+        token: ContextVar的token
+        start: 开始的时间
+    Returns:
+
+    """
+    record.elapsed = time.perf_counter() - start
+    _current_record.reset(token)
+    parent = record.parent
+    if parent is not None:
+        parent.commands += record.commands
+        parent.round_trips += record.round_trips
+        parent.bytes_out += record.bytes_out
+        parent.bytes_in += record.bytes_in
+        return
+    for hook in client.hooks:
+        try:
+            hook(record)
+        except Exception:  # hook的错误不能影响缓存操作
+            _logger.exception("fescache hook %r failed for %s", hook, record.name)
+
+
+def instrument(func: Callable) -> Callable:
+    """
+    统计客户端高层方法的耗时、命令数、往返次数和字节数, 客户端没有hooks时不做任何统计
+
+    在其他被统计的方法内部调用时只累加到外层操作, hooks只会收到最外层的操作
+    Args:
+        func: 客户端的同步方法或者协程方法
+    Returns:
+
+    """
+    name = func.__name__
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs) -> Any:
+            if not self.hooks:
+                return await func(self, *args, **kwargs)
+            record, token, start = _start_record(name)
+            try:
+                return await func(self, *args, **kwargs)
+            except BaseException:
+                record.error = True
+                raise
+            finally:
+                _finish_record(self, record, token, start)
+    else:
+        @wraps(func)
+        def wrapper(self, *args, **kwargs) -> Any:
+            if not self.hooks:
+                return func(self, *args, **kwargs)
+            record, token, start = _start_record(name)
+            try:
+                return func(self, *args, **kwargs)
+            except BaseException:
+                record.error = True
+                raise
+            finally:
+                _finish_record(self, record, token, start)
+    return wrapper
+
+
+class _OperationStats(object):
+    """
+    单个操作的累计统计
+    """
+    __slots__ = ("buckets", "count", "errors", "total", "max", "commands", "round_trips", "bytes_out", "bytes_in")
+
+    def __init__(self, bucket_size: int):
+        self.buckets: List[int] = [0] * (bucket_size + 1)  # 最后一个是超过最大分桶的数量
+        self.count: int = 0
+        self.errors: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.commands: int = 0
+        self.round_trips: int = 0
+        self.bytes_out: int = 0
+        self.bytes_in: int = 0
+
+
+class HistogramCollector(object):
+    """
+    内存中的耗时直方图收集器, 作为hook添加到客户端, 按操作名称分别统计, 提供分位数快照
+
+    client.add_hook(HistogramCollector())
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        内存中的耗时直方图收集器
+        Args:
+            buckets: 耗时分桶的上限, 单位秒, 从小到大
+        """
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._stats: Dict[str, _OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: OperationRecord) -> None:
+        index = bisect.bisect_left(self.buckets, record.elapsed)
+        with self._lock:
+            stats = self._stats.get(record.name)
+            if stats is None:
+                stats = self._stats[record.name] = _OperationStats(len(self.buckets))
+            stats.buckets[index] += 1
+            stats.count += 1
+            stats.errors += record.error
+            stats.total += record.elapsed
+            stats.max = max(stats.max, record.elapsed)
+            stats.commands += record.commands
+            stats.round_trips += record.round_trips
+            stats.bytes_out += record.bytes_out
+            stats.bytes_in += record.bytes_in
+
+    def _percentile(self, stats: _OperationStats, percent: float) -> float:
+        """
+        根据分桶估算分位数, 在分桶内线性插值
+        Args:
+            stats: 操作的统计
+            percent: 百分位, 比如99
+        Returns:
+
+        """
+        rank = max(math.ceil(stats.count * percent / 100), 1)
+        cumulative = 0
+        for index, bucket_count in enumerate(stats.buckets):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else stats.max
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, stats.max)
+            cumulative += bucket_count
+        return stats.max
+
+    def snapshot(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, Dict[str, Any]]:
+        """
+        每个操作的统计快照, 包括次数、错误数、平均耗时、分位数耗时以及平均命令数、往返次数和字节数
+        Args:
+            percentiles: 需要计算的百分位
+        Returns:
+
+        """
+        result = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                item = {"count": stats.count, "errors": stats.errors, "avg": stats.total / stats.count,
+                        "max": stats.max, "commands": stats.commands / stats.count,
+                        "round_trips": stats.round_trips / stats.count, "bytes_out": stats.bytes_out / stats.count,
+                        "bytes_in": stats.bytes_in / stats.count}
+                for percent in percentiles:
+                    item[f"p{percent:g}"] = self._percentile(stats, percent)
+                result[name] = item
+        return result
+
+    def reset(self, ) -> None:
+        """
+        清空统计
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def collect(self, ) -> List[Tuple[str, _OperationStats]]:
+        """
+        复制当前的统计, 用于导出
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            result = []
+            for name, stats in sorted(self._stats.items()):
+                copied = _OperationStats(len(self.buckets))
+                for slot in _OperationStats.__slots__:
+                    value = getattr(stats, slot)
+                    setattr(copied, slot, list(value) if slot == "buckets" else value)
+                result.append((name, copied))
+            return result
+
+
+def prometheus_text(collector: HistogramCollector, namespace: str = "fescache") -> str:
+    """
+    把收集器的统计导出为Prometheus的文本格式
+    Args:
+        collector: 耗时直方图收集器
+        namespace: 指标名称的前缀
+    Returns:
+
+    """
+    collected = collector.collect()
+    duration = f"{namespace}_operation_duration_seconds"
+    lines = [f"# HELP {duration} fescache operation latency in seconds.", f"# TYPE {duration} histogram"]
+    for name, stats in collected:
+        cumulative = 0
+        for index, upper in enumerate(collector.buckets):
+            cumulative += stats.buckets[index]
+            lines.append(f'{duration}_bucket{{operation="{name}",le="{upper:g}"}} {cumulative}')
+        lines.append(f'{duration}_bucket{{operation="{name}",le="+Inf"}} {stats.count}')
+        lines.append(f'{duration}_sum{{operation="{name}"}} {stats.total}')
+        lines.append(f'{duration}_count{{operation="{name}"}} {stats.count}')
+
+    counters = (("errors", "errors", "fescache operation errors."),
+                ("commands", "commands", "Redis commands issued by fescache operations."),
+                ("round_trips", "round_trips", "Redis round trips made by fescache operations."),
+                ("bytes_sent", "bytes_out", "Bytes sent to Redis by fescache operations."),
+                ("bytes_received", "bytes_in", "Payload bytes received from Redis by fescache operations."))
+    for metric, attr, help_text in counters:
+        metric_name = f"{namespace}_operation_{metric}_total"
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} counter")
+        for name, stats in collected:
+            lines.append(f'{metric_name}{{operation="{name}"}} {getattr(stats, attr)}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午8:00
+"""
+import threading
+from typing import Any, Dict
+
+__all__ = ("PoolStats",)
+
+
+class PoolStats(object):
+    """
+    阻塞连接池获取连接的统计, 等待数量、获取耗时以及超时次数, 用于根据数据确定连接池的大小
+    """
+
+    def __init__(self, ):
+        self.acquires: int = 0
+        self.timeouts: int = 0
+        self.waiters: int = 0
+        self.max_waiters: int = 0
+        self.wait_total: float = 0.0
+        self.wait_max: float = 0.0
+        self._lock = threading.Lock()
+
+    def wait_started(self, ) -> None:
+        """
+        开始等待连接
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            self.waiters += 1
+            self.max_waiters = max(self.max_waiters, self.waiters)
+
+    def wait_finished(self, elapsed: float, acquired: bool) -> None:
+        """
+        等待连接结束
+        Args:
+            elapsed: 等待的时间, 单位秒
+            acquired: 是否获取到了连接, False表示等待超时
+        Returns:
+
+        """
+        with self._lock:
+            self.waiters -= 1
+            if acquired:
+                self.acquires += 1
+                self.wait_total += elapsed
+                self.wait_max = max(self.wait_max, elapsed)
+            else:
+                self.timeouts += 1
+
+    def acquired(self, ) -> None:
+        """
+        没有等待直接获取到了连接
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            self.acquires += 1
+
+    def snapshot(self, ) -> Dict[str, Any]:
+        """
+        统计的快照
+        Args:
+
+        Returns:
+
+        """
+        with self._lock:
+            return {"waiters": self.waiters, "max_waiters": self.max_waiters, "acquires": self.acquires,
+                    "timeouts": self.timeouts, "acquire_max": self.wait_max,
+                    "acquire_avg": self.wait_total / self.acquires if self.acquires else 0.0}
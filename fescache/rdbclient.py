@@ -7,19 +7,95 @@
 @time: 18-12-25 下午5:15
 """
 import atexit
+import itertools
+import logging
+import secrets
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any, Dict, Generator, List, Optional, Sequence, Union
+from typing import Any, Callable, Dict, Generator, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 import aelog
 # noinspection Mypy
 import redis
 from redis import ConnectionError, ConnectionPool, Redis, RedisError, TimeoutError
-
-from ._base import BaseStrictRedis, EXPIRED, SESSION_EXPIRED, Session
+from redis.exceptions import NoScriptError
+from redis.sentinel import Sentinel, SentinelConnectionPool, SentinelManagedConnection
+
+try:
+    from redis.cluster import RedisCluster
+    from redis.exceptions import RedisClusterException
+except ImportError:  # pragma: no cover
+    RedisCluster = None
+    RedisClusterException = RedisError
+
+from ._base import (BaseStrictRedis, CACHE_MISS, EXPIRED, GET_SESSION_SCRIPT, KeyLocks, LuaScript,
+                    RELEASE_LOCK_SCRIPT, SAVE_SESSION_SCRIPT, SESSION_EXPIRED, Session, UPDATE_SESSION_SCRIPT)
+from .codec import Codec
 from .err import FuncArgsError, RedisClientError, RedisConnectError, RedisTimeoutError
-from .utils import ignore_error, ordumps, orloads
+from .metrics import instrument, record_reply, record_send
+from .pool import PoolStats
+from .utils import ignore_error
+
+__all__ = ("RdbClient", "BlockingConnectionPool", "InstrumentedConnection", "InstrumentedSentinelConnection")
+
+# 后台刷新的错误使用标准库的logging记录, aelog 1.0.9在python3.8+上调用exception会抛出TypeError,
+# 并且aelog会替换调用模块同名logger的findCaller, 所以使用包名的logger
+_logger = logging.getLogger("fescache")
+
+
+class InstrumentedConnection(redis.Connection):
+    """
+    统计发送和读取的连接, 把往返次数、命令数和字节数记录到当前的高层操作
+    """
+
+    def send_packed_command(self, command, *args, **kwargs):
+        record_send(command)
+        return super().send_packed_command(command, *args, **kwargs)
 
-__all__ = ("RdbClient",)
+    def read_response(self, *args, **kwargs):
+        response = super().read_response(*args, **kwargs)
+        record_reply(response)
+        return response
+
+
+class InstrumentedSentinelConnection(InstrumentedConnection, SentinelManagedConnection):
+    """
+    通过sentinel发现节点并统计发送和读取的连接
+    """
+
+
+class BlockingConnectionPool(redis.BlockingConnectionPool):
+    """
+    阻塞连接池, 连接用完时最多等待timeout秒而不是直接报错, 并统计获取连接的等待情况
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.acquire_stats: PoolStats = PoolStats()
+        super().__init__(*args, **kwargs)
+
+    def get_connection(self, command_name, *keys, **options):
+        start = time.monotonic()
+        self.acquire_stats.wait_started()
+        try:
+            connection = super().get_connection(command_name, *keys, **options)
+        except ConnectionError:
+            self.acquire_stats.wait_finished(time.monotonic() - start, False)
+            raise
+        self.acquire_stats.wait_finished(time.monotonic() - start, True)
+        return connection
+
+    def stats(self, ) -> Dict[str, Any]:
+        """
+        连接池的使用情况
+        Args:
+
+        Returns:
+
+        """
+        idle = sum(1 for connection in list(self.pool.queue) if connection is not None)
+        return {"max_connections": self.max_connections, "created": len(self._connections),
+                "in_use": len(self._connections) - idle, "idle": idle, **self.acquire_stats.snapshot()}
 
 
 class RdbClient(BaseStrictRedis, Redis):
@@ -28,7 +104,12 @@ class RdbClient(BaseStrictRedis, Redis):
     """
 
     def __init__(self, app=None, *, host: str = "127.0.0.1", port: int = 6379, dbname: int = 0, passwd: str = "",
-                 pool_size: int = 25, connect_timeout: int = 10, **kwargs) -> None:
+                 pool_size: int = 25, connect_timeout: int = 10, use_script: bool = False, local_cache_size: int = 0,
+                 local_cache_ttl: float = 5, codec: Union[str, Codec] = "json", pool_blocking: bool = False,
+                 pool_timeout: float = 5, cluster: bool = False, key_layout: str = "default",
+                 read_from: str = "primary", replicas: Union[str, Sequence[str]] = (),
+                 sentinels: Union[str, Sequence[str]] = (), sentinel_service: str = "mymaster",
+                 session_format: str = "hash", **kwargs) -> None:
         """
         redis 工具类
         Args:
@@ -39,14 +120,43 @@ class RdbClient(BaseStrictRedis, Redis):
             passwd: redis password
             pool_size: redis pool size
             connect_timeout: 连接超时时间
+            use_script: 是否使用lua脚本一次往返完成session的获取、保存和更新
+            local_cache_size: 进程内本地缓存的最大条目数, 为0时不开启本地缓存
+            local_cache_ttl: 本地缓存条目的过期时间, 单位秒, 应该比redis中的过期时间短
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            pool_blocking: 是否使用阻塞连接池, 连接用完时等待其他连接释放而不是直接报错
+            pool_timeout: 阻塞连接池等待连接的超时时间, 单位秒
+            cluster: 是否使用redis集群模式, host和port为集群的任意一个节点, 需要redis>=4.1.0
+            key_layout: session相关key的布局, default或者hashtag, hashtag时同一个账户的key分到集群的同一个槽
+            read_from: 只读方法默认读取的节点, primary或者replica, 每次调用可以通过read_from参数指定
+            replicas: 副本节点的地址, host:port列表或者逗号分隔的字符串, 多个副本轮流读取
+            sentinels: sentinel节点的地址, host:port列表或者逗号分隔的字符串, 指定时通过sentinel发现主节点和副本节点
+            sentinel_service: sentinel中监控的服务名称
+            session_format: session的保存格式, hash或者blob, blob时整个session保存为一个字符串, 两种格式都可以读取
             kwargs: other kwargs
         """
         self.pool: Optional[ConnectionPool] = None
+        self.binary_pool: Optional[ConnectionPool] = None
+        self._binary_client: Optional[Redis] = None
+        self.cluster_client: Optional[RedisCluster] = None  # 集群模式下实际执行命令的客户端
+        self.sentinel: Optional[Sentinel] = None
+        # 副本节点的客户端, 按照是否解码返回值分别创建, 多个副本轮流使用
+        self._replica_clients: Dict[bool, List[Redis]] = {}
+        self._replica_pools: List[ConnectionPool] = []
+        self._replica_counter: Iterator[int] = itertools.count()
+        # get_or_set进程内合并调用使用的按照key分配的锁
+        self._flight_locks: KeyLocks = KeyLocks()
+        self._refreshing: Set[str] = set()  # get_or_set正在后台重新计算的key
+        self._refreshing_lock: threading.Lock = threading.Lock()
 
         kwargs.setdefault("socket_connect_timeout", connect_timeout)
         self.kwargs: Dict[str, Any] = kwargs
 
-        super().__init__(app, host=host, port=port, dbname=dbname, passwd=passwd, pool_size=pool_size)
+        super().__init__(app, host=host, port=port, dbname=dbname, passwd=passwd, pool_size=pool_size,
+                         use_script=use_script, local_cache_size=local_cache_size, local_cache_ttl=local_cache_ttl,
+                         codec=codec, pool_blocking=pool_blocking, pool_timeout=pool_timeout, cluster=cluster,
+                         key_layout=key_layout, read_from=read_from, replicas=replicas, sentinels=sentinels,
+                         sentinel_service=sentinel_service, session_format=session_format)
 
     def init_app(self, app) -> None:
         """
@@ -68,7 +178,12 @@ class RdbClient(BaseStrictRedis, Redis):
 
     # noinspection DuplicatedCode
     def init_engine(self, *, host: str = "127.0.0.1", port: int = 6379, dbname: int = 0, passwd: str = "",
-                    pool_size: int = 25, connect_timeout: int = 10, **kwargs) -> None:
+                    pool_size: int = 25, connect_timeout: int = 10, use_script: bool = False,
+                    local_cache_size: int = 0, local_cache_ttl: float = 5, codec: Optional[Union[str, Codec]] = None,
+                    pool_blocking: bool = False, pool_timeout: float = 5, cluster: bool = False, key_layout: str = "",
+                    read_from: str = "", replicas: Union[str, Sequence[str]] = (),
+                    sentinels: Union[str, Sequence[str]] = (), sentinel_service: str = "", session_format: str = "",
+                    **kwargs) -> None:
         """
         redis 工具类
         Args:
@@ -78,13 +193,31 @@ class RdbClient(BaseStrictRedis, Redis):
             passwd: redis password
             pool_size: redis pool size
             connect_timeout: 连接超时时间
+            use_script: 是否使用lua脚本一次往返完成session的获取、保存和更新
+            local_cache_size: 进程内本地缓存的最大条目数, 为0时不开启本地缓存
+            local_cache_ttl: 本地缓存条目的过期时间, 单位秒, 应该比redis中的过期时间短
+            codec: 普通数据和hash数据默认的codec, json、orjson、msgpack、raw或者Codec实例(如CompressedCodec)
+            pool_blocking: 是否使用阻塞连接池, 连接用完时等待其他连接释放而不是直接报错
+            pool_timeout: 阻塞连接池等待连接的超时时间, 单位秒
+            cluster: 是否使用redis集群模式, host和port为集群的任意一个节点, 需要redis>=4.1.0
+            key_layout: session相关key的布局, default或者hashtag, hashtag时同一个账户的key分到集群的同一个槽
+            read_from: 只读方法默认读取的节点, primary或者replica, 每次调用可以通过read_from参数指定
+            replicas: 副本节点的地址, host:port列表或者逗号分隔的字符串, 多个副本轮流读取
+            sentinels: sentinel节点的地址, host:port列表或者逗号分隔的字符串, 指定时通过sentinel发现主节点和副本节点
+            sentinel_service: sentinel中监控的服务名称
+            session_format: session的保存格式, hash或者blob, blob时整个session保存为一个字符串, 两种格式都可以读取
             kwargs: other kwargs
         Returns:
 
         """
         kwargs.setdefault("socket_connect_timeout", connect_timeout)
         self.kwargs.update(kwargs)
-        super().init_engine(host=host, port=port, dbname=dbname, passwd=passwd, pool_size=pool_size)
+        super().init_engine(host=host, port=port, dbname=dbname, passwd=passwd, pool_size=pool_size,
+                            use_script=use_script, local_cache_size=local_cache_size,
+                            local_cache_ttl=local_cache_ttl, codec=codec, pool_blocking=pool_blocking,
+                            pool_timeout=pool_timeout, cluster=cluster, key_layout=key_layout, read_from=read_from,
+                            replicas=replicas, sentinels=sentinels, sentinel_service=sentinel_service,
+                            session_format=session_format)
 
         # 初始化连接
         self.open_connection()
@@ -100,9 +233,71 @@ class RdbClient(BaseStrictRedis, Redis):
 
         """
         # 返回值都做了解码，应用层不需要再decode
-        self.pool = redis.ConnectionPool(host=self.host, port=self.port, db=self.dbname, password=self.passwd,
-                                         decode_responses=True, max_connections=self.pool_size, **self.kwargs)
-        super(BaseStrictRedis, self).__init__(connection_pool=self.pool, decode_responses=True)
+        if self.cluster:
+            # 命令和pipeline都交给集群客户端, 按照key的槽发送到对应的节点
+            self.cluster_client = self._create_cluster(decode_responses=True)
+            super(BaseStrictRedis, self).__init__(decode_responses=True)
+        else:
+            if self.sentinels:  # 通过sentinel发现主节点和副本节点
+                self.sentinel = Sentinel(self.sentinels, **self.kwargs)
+            self.pool = self._create_pool(decode_responses=True)
+            super(BaseStrictRedis, self).__init__(connection_pool=self.pool, decode_responses=True)
+        self.server_version = None  # 第一次使用时检测服务端版本
+
+    def _create_pool(self, address: Optional[Tuple[str, int]] = None, is_master: bool = True, **kwargs
+                     ) -> ConnectionPool:
+        """
+        创建连接池, 开启pool_blocking时使用阻塞连接池, 配置sentinel时使用sentinel连接池(不支持阻塞)
+        Args:
+            address: 节点的地址, 默认为host和port
+            is_master: 使用sentinel时连接主节点还是副本节点
+            kwargs: 连接池的其他参数
+        Returns:
+
+        """
+        kwargs.update(self.kwargs)
+        if self.sentinel is not None and address is None:
+            kwargs.setdefault("connection_class", InstrumentedSentinelConnection)
+            return SentinelConnectionPool(self.sentinel_service, self.sentinel, is_master=is_master, db=self.dbname,
+                                          password=self.passwd, max_connections=self.pool_size, **kwargs)
+        host, port = address or (self.host, self.port)
+        kwargs.setdefault("connection_class", InstrumentedConnection)
+        if self.pool_blocking:
+            return BlockingConnectionPool(host=host, port=port, db=self.dbname, password=self.passwd,
+                                          max_connections=self.pool_size, timeout=self.pool_timeout, **kwargs)
+        return redis.ConnectionPool(host=host, port=port, db=self.dbname, password=self.passwd,
+                                    max_connections=self.pool_size, **kwargs)
+
+    def _create_cluster(self, **kwargs) -> RedisCluster:
+        """
+        创建集群客户端, 每个节点的连接池最多pool_size个连接, 集群模式不支持选择数据库和阻塞连接池,
+        节点的连接不能指定连接类, 统计hook只有耗时没有命令数、往返次数和字节数
+        Args:
+            kwargs: 集群客户端的其他参数
+        Returns:
+
+        """
+        if RedisCluster is None:
+            raise ImportError("redis cluster mode requires redis>=4.1.0, please install it: "
+                              "pip install fescache[cluster]")
+        kwargs.update(self.kwargs)
+        return RedisCluster(host=self.host, port=self.port, password=self.passwd or None,
+                            max_connections=self.pool_size, **kwargs)
+
+    def pool_stats(self, ) -> Dict[str, Any]:
+        """
+        连接池的使用情况, 正在使用和空闲的连接数, 阻塞连接池还包括等待数量、获取连接的耗时和超时次数
+        Args:
+
+        Returns:
+
+        """
+        if self.pool is None:
+            return {}
+        if isinstance(self.pool, BlockingConnectionPool):
+            return self.pool.stats()
+        return {"max_connections": self.pool.max_connections, "created": self.pool._created_connections,
+                "in_use": len(self.pool._in_use_connections), "idle": len(self.pool._available_connections)}
 
     def close_connection(self, ):
         """
@@ -114,8 +309,78 @@ class RdbClient(BaseStrictRedis, Redis):
         """
         if self.pool:
             self.pool.disconnect()
+        if self.binary_pool:
+            self.binary_pool.disconnect()
+        if self.cluster_client is not None:
+            self.cluster_client.close()
+        if self.cluster and self._binary_client is not None:
+            self._binary_client.close()
+        for pool in self._replica_pools:
+            pool.disconnect()
         aelog.debug("清理redis连接池完毕！")
 
+    @property
+    def binary_client(self, ) -> Redis:
+        """
+        不解码返回值的客户端, 二进制codec读取时redis返回的bytes直接交给codec, 第一次使用时创建
+        Args:
+
+        Returns:
+
+        """
+        if self._binary_client is None:
+            if self.cluster:
+                self._binary_client = self._create_cluster()
+            else:
+                self.binary_pool = self._create_pool()
+                self._binary_client = Redis(connection_pool=self.binary_pool)
+        return self._binary_client
+
+    def replica_client(self, binary: bool = False) -> Redis:
+        """
+        副本节点的客户端, 第一次使用时创建, 配置多个副本时轮流返回, 使用sentinel时由sentinel连接池轮流连接副本
+        Args:
+            binary: 是否不解码返回值
+        Returns:
+
+        """
+        clients = self._replica_clients.get(binary)
+        if clients is None:
+            kwargs = {} if binary else {"decode_responses": True}
+            if self.sentinel is not None:
+                pools = [self._create_pool(is_master=False, **kwargs)]
+            else:
+                pools = [self._create_pool(address, **kwargs) for address in self.replicas]
+            self._replica_pools.extend(pools)
+            clients = self._replica_clients[binary] = [Redis(connection_pool=pool) for pool in pools]
+        return clients[next(self._replica_counter) % len(clients)]
+
+    def _read_client(self, read_from: Optional[str] = None, binary: bool = False) -> Optional[Redis]:
+        """
+        本次读取使用的副本客户端, 读取主节点时返回None
+        Args:
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from
+            binary: 是否不解码返回值
+        Returns:
+
+        """
+        return self.replica_client(binary) if self._read_from_replica(read_from) else None
+
+    def _refresh_expire(self, ex: int, *names: str) -> None:
+        """
+        在主节点刷新过期时间, 从副本读取之后调用, 所有的EXPIRE在一个pipeline中完成
+        Args:
+            ex: 过期时间，单位秒
+            names: redis key的名称
+        Returns:
+
+        """
+        if names:
+            with self.pipeline(transaction=False) as pipe:
+                for name in names:
+                    pipe.expire(name, ex)
+                pipe.execute()
+
     @contextmanager
     def catch_error(self, ) -> Generator[None, None, None]:
         """
@@ -133,10 +398,67 @@ class RdbClient(BaseStrictRedis, Redis):
         except TimeoutError as e:
             aelog.exception(e)
             raise RedisTimeoutError("Redis超时错误,请检查连接参数是否正确.")
-        except RedisError as e:
+        except (RedisError, RedisClusterException) as e:
             aelog.exception(e)
             raise RedisClientError("Redis其他错误,请检查.")
 
+    def execute_command(self, *args, **options) -> Any:
+        """
+        执行redis命令, 集群模式下交给集群客户端执行
+        Args:
+            args: 命令及参数
+            options: 解析返回值的选项
+        Returns:
+
+        """
+        if self.cluster_client is not None:
+            return self.cluster_client.execute_command(*args, **options)
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        """
+        创建pipeline, 集群模式下使用集群的pipeline, 按照节点分组发送, 不支持事务
+        Args:
+            transaction: 是否使用事务
+            shard_hint: shard hint
+        Returns:
+
+        """
+        if self.cluster_client is not None:
+            return self.cluster_client.pipeline()
+        return super().pipeline(transaction, shard_hint)
+
+    def eval_script(self, lua_script: LuaScript, keys: Sequence[str], args: Sequence[Any]) -> Any:
+        """
+        执行lua脚本, 优先使用EVALSHA, 服务端没有缓存脚本时回退到EVAL并缓存脚本
+        Args:
+            lua_script: lua脚本
+            keys: 脚本中的KEYS
+            args: 脚本中的ARGV
+        Returns:
+
+        """
+        try:
+            return self.evalsha(lua_script.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return self.eval(lua_script.script, len(keys), *keys, *args)
+
+    def supports_getex(self, ) -> bool:
+        """
+        redis服务端是否支持GETEX(6.2+), 第一次调用时通过INFO检测服务端版本, 检测失败时按照低版本处理
+        Args:
+
+        Returns:
+
+        """
+        if self.server_version is None:
+            # INFO不可用(命令被重命名、ACL没有权限、代理不支持)时记录为空版本, 之后不再检测, 重新连接时再次检测
+            self.server_version = ()
+            with ignore_error():
+                self.server_version = self._parse_server_info(self.info("server"))
+        return (self.server_version or ()) >= (6, 2)
+
+    @instrument
     def save_session(self, session: Session, ex: int = SESSION_EXPIRED) -> str:
         """
         利用hash map保存session
@@ -148,20 +470,43 @@ class RdbClient(BaseStrictRedis, Redis):
         """
         if not isinstance(session, Session):
             raise FuncArgsError(f"session value error, must be Session Type.")
+        session = self._apply_key_layout(session)
+
+        session_data = self._dump_session(session)
+        blob = self.session_format == "blob"
 
+        if self.use_script:
+            # 清除老的令牌、保存新的session和更新令牌在一次往返中原子完成
+            with self.catch_error():
+                deleted_keys = self.eval_script(
+                    SAVE_SESSION_SCRIPT, [session.session_id, session.account_id],
+                    [ex, self.session_format, *([session_data] if blob else self._dict_to_pairs(session_data))])
+            self._cache_invalidate(session.session_id, session.account_id, *(deleted_keys or ()))
+            session.mark_clean()
+            return session.session_id
+
+        with self.catch_error():
+            if blob:
+                self.set(session.session_id, session_data, ex)
+            else:
+                self.hset(session.session_id, mapping=session_data)
+                self.expire(session.session_id, ex)
+        self._cache_invalidate(session.session_id)
+        # 清除老的令牌, 令牌在主节点原样读取和保存, 不经过codec和本地缓存, 和lua脚本保存的格式一致
         with self.catch_error():
-            self.hset(session.session_id, mapping=self.rs_dumps(session.to_dict()))
-            self.expire(session.session_id, ex)
-        # 清除老的令牌
-        old_session_id = self.get_usual_data(session.account_id)
-        if old_session_id:
+            old_session_id = self.get(session.account_id)
+        if old_session_id and old_session_id != session.session_id:  # 重复保存同一个session时不能删除自己
             with ignore_error():
-                self.delete_session(str(old_session_id))
+                self.delete_session(old_session_id)
         # 更新新的令牌
-        self.save_usual_data(session.account_id, session.session_id, ex=ex)
+        with self.catch_error():
+            self.set(session.account_id, session.session_id, ex)
+        self._cache_invalidate(session.account_id)
+        session.mark_clean()
 
         return session.session_id
 
+    @instrument
     def delete_session(self, session_id: str) -> None:
         """
         利用hash map删除session
@@ -177,56 +522,223 @@ class RdbClient(BaseStrictRedis, Redis):
             with ignore_error():  # 删除已经存在的和账户相关的缓存key
                 self.delete_keys(self._get_session_keys(session_data))
 
+    @instrument
     def update_session(self, session: Session, ex: int = SESSION_EXPIRED) -> None:
         """
-        利用hash map更新session
+        利用hash map更新session, 从redis获取的session只写入修改过的字段, session已经过期时写入全部字段
         Args:
             session: Session实例
             ex: 过期时间，单位秒
         Returns:
 
         """
-        with self.catch_error():
-            self.hset(session.session_id, mapping=self.rs_dumps(session.to_dict()))
-            self.expire(session.session_id, ex)
-            self.expire(session.account_id, ex)
-        # 更新令牌
-        self.save_hash_data(session.account_id, session.session_id, ex=ex)
-
-    def get_session(self, session_id: str, ex: int = SESSION_EXPIRED) -> Optional[Session]:
+        if self.session_format == "blob":
+            # 整个session保存为一个字符串, 覆盖写入并更新令牌在一次往返中完成, 令牌原样保存, 不经过codec
+            with self.catch_error():
+                if self.use_script:
+                    self.eval_script(UPDATE_SESSION_SCRIPT, [session.session_id, session.account_id],
+                                     [ex, "blob", self._dump_session(session)])
+                else:
+                    with self.pipeline(transaction=False) as pipe:
+                        pipe.set(session.session_id, self._dump_session(session), ex)
+                        pipe.set(session.account_id, session.session_id, ex)
+                        pipe.execute()
+            self._cache_invalidate(session.session_id, session.account_id)
+            session.mark_clean()
+            return
+
+        session_data = session.to_dirty_dict()
+        mapping = Session.schema.dumps(session.to_dict() if session_data is None else session_data)
+        if self.use_script:
+            with self.catch_error():
+                exists = self.eval_script(UPDATE_SESSION_SCRIPT, [session.session_id, session.account_id],
+                                          [ex, "hash", *self._dict_to_pairs(mapping)])
+                if session_data is not None and not exists:
+                    self.eval_script(UPDATE_SESSION_SCRIPT, [session.session_id, session.account_id],
+                                     [ex, "hash", *self._dict_to_pairs(Session.schema.dumps(session.to_dict()))])
+        else:
+            with self.catch_error():
+                # 写入字段、刷新过期时间和更新令牌在一次往返中完成
+                with self.pipeline(transaction=False) as pipe:
+                    if session_data is None:
+                        pipe.hset(session.session_id, mapping=mapping)
+                        pipe.expire(session.session_id, ex)
+                    else:
+                        pipe.expire(session.session_id, ex)
+                        if mapping:
+                            pipe.hset(session.session_id, mapping=mapping)
+                    pipe.set(session.account_id, session.session_id, ex)
+                    results = pipe.execute(raise_on_error=False)
+                # 只写入修改过的字段时第一个命令为EXPIRE, blob格式保存的session写入hash时返回WRONGTYPE
+                wrong_type = any([self._is_wrong_type(result) for result in results])
+                if wrong_type or (session_data is not None and not results[0]):
+                    # session已经过期或者以blob格式保存, 只写入修改过的字段会保存不完整的session
+                    with self.pipeline(transaction=False) as pipe:
+                        pipe.delete(session.session_id)
+                        pipe.hset(session.session_id, mapping=Session.schema.dumps(session.to_dict()))
+                        pipe.expire(session.session_id, ex)
+                        pipe.execute()
+        self._cache_invalidate(session.session_id, session.account_id)
+        session.mark_clean()
+
+    def _fetch_sessions(self, session_ids: Sequence[str], ex: int = 0, client: Optional[Redis] = None
+                        ) -> List[Union[Dict[str, str], str, None]]:
+        """
+        在一个pipeline中按照session_format读取session的原始数据, 切换格式之前以另一种格式保存的session返回WRONGTYPE,
+        再使用对应的命令读取, 两种格式的session都可以读取
+        Args:
+            session_ids: session id列表
+            ex: 大于0时同时刷新session的过期时间, redis 6.2+的blob格式使用GETEX, 账户令牌的过期时间需要解析之后刷新
+            client: 读取使用的客户端, 默认为主节点
+        Returns:
+            hash格式为HGETALL的返回值, blob格式为字符串, 不存在时为空
+        """
+        client = client or self
+        blob = self.session_format == "blob"
+        getex = blob and ex > 0 and self.supports_getex()
+        with client.pipeline(transaction=False) as pipe:
+            for session_id in session_ids:
+                if getex:
+                    pipe.execute_command("GETEX", session_id, "EX", ex)
+                    continue
+                if blob:
+                    pipe.get(session_id)
+                else:
+                    pipe.hgetall(session_id)
+                if ex > 0:
+                    pipe.expire(session_id, ex)
+            results = (pipe.execute(raise_on_error=False))[::1 if getex or ex <= 0 else 2]
+        wrong_indexes = [index for index, result in enumerate(results) if self._is_wrong_type(result)]
+        if wrong_indexes:
+            with client.pipeline(transaction=False) as pipe:
+                for index in wrong_indexes:
+                    if blob:
+                        pipe.hgetall(session_ids[index])
+                    else:
+                        pipe.get(session_ids[index])
+                    if ex > 0:
+                        pipe.expire(session_ids[index], ex)
+                for index, result in zip(wrong_indexes, (pipe.execute())[::2 if ex > 0 else 1]):
+                    results[index] = result
+        return results
+
+    @instrument
+    def get_session(self, session_id: str, ex: int = SESSION_EXPIRED, read_from: Optional[str] = None
+                    ) -> Optional[Session]:
         """
         获取session
         Args:
             session_id: session id
             ex: 过期时间，单位秒
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from
         Returns:
 
         """
-        session_value = None
+        session_data = self._cache_get(session_id)
+        if session_data is not None:
+            return self._load_session(session_data)
+
+        reader = self._read_client(read_from)
         with self.catch_error():
-            session_data = self.hgetall(session_id)
-            if session_data:
-                self.expire(session_id, ex)
-                session_data = self.rs_loads(session_data)
-                self.expire(session_data["account_id"], ex)
-                session_value = Session(session_data.pop('account_id'), **session_data)
-        return session_value
+            if reader is None and self.use_script:
+                # 读取和刷新过期时间在一次往返中完成
+                session_data = self._script_session(self.eval_script(GET_SESSION_SCRIPT, [session_id], [ex]))
+                session_dict = self._decode_session(session_data)
+            elif reader is not None:
+                # 从副本读取, 过期时间在主节点刷新
+                session_data = self._fetch_sessions([session_id], client=reader)[0]
+                session_dict = self._decode_session(session_data)
+                if session_dict:
+                    self._refresh_expire(ex, session_id, session_dict["account_id"])
+            else:
+                # 读取和刷新session的过期时间在一次往返中完成
+                session_data = self._fetch_sessions([session_id], ex)[0]
+                session_dict = self._decode_session(session_data)
+                if session_dict:
+                    self.expire(session_dict["account_id"], ex)
+        if reader is not None and not session_dict:
+            # 副本中没有时可能是刚保存的session还没有复制过去, 回退到主节点读取
+            return self.get_session(session_id, ex, read_from="primary")
+        self._cache_set(session_id, session_data, ex=ex)
+        return Session.from_dict(session_dict) if session_dict else None
+
+    @instrument
+    def get_sessions(self, session_ids: Sequence[str], ex: int = SESSION_EXPIRED, chunk_size: int = 500,
+                     read_from: Optional[str] = None) -> Dict[str, Optional[Session]]:
+        """
+        批量获取session, 每批的HGETALL和刷新过期时间分别在一个pipeline中完成
+        Args:
+            session_ids: session id列表
+            ex: 过期时间，单位秒
+            chunk_size: 每个pipeline中最多的session数量, 用于限制pipeline占用的内存
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
+        Returns:
+            session id和Session的映射, session不存在时为None
+        """
+        sessions: Dict[str, Optional[Session]] = {}
+        miss_ids: List[str] = []
+        for session_id in dict.fromkeys(session_ids):
+            session_data = self._cache_get(session_id)
+            if session_data is None:
+                miss_ids.append(session_id)
+            else:
+                sessions[session_id] = self._load_session(session_data)
 
-    def verify(self, session_id: str) -> Session:
+        reader = self._read_client(read_from)
+        lagged_ids: List[str] = []  # 副本中没有的session
+        with self.catch_error():
+            for index in range(0, len(miss_ids), chunk_size):
+                chunk_ids = miss_ids[index:index + chunk_size]
+                chunk_data = self._fetch_sessions(chunk_ids, client=reader)
+                chunk_dicts = [self._decode_session(session_data) for session_data in chunk_data]
+                self._refresh_expire(ex, *(name for session_id, session_dict in zip(chunk_ids, chunk_dicts)
+                                           if session_dict for name in (session_id, session_dict["account_id"])))
+                for session_id, session_data, session_dict in zip(chunk_ids, chunk_data, chunk_dicts):
+                    if reader is not None and not session_dict:
+                        lagged_ids.append(session_id)
+                        continue
+                    self._cache_set(session_id, session_data, ex=ex)
+                    sessions[session_id] = Session.from_dict(session_dict) if session_dict else None
+        if lagged_ids:
+            # 可能是刚保存的session还没有复制过去, 回退到主节点读取
+            sessions.update(self.get_sessions(lagged_ids, ex, chunk_size, read_from="primary"))
+        return sessions
+
+    @instrument
+    def verify(self, session_id: str, read_from: Optional[str] = None) -> Session:
         """
         校验session，主要用于登录校验
         Args:
             session_id
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from
         Returns:
 
         """
-        session = self.get_session(session_id)
+        session = self.get_session(session_id, read_from=read_from)
         if not session:
             raise RedisClientError("invalid session_id, session_id={}".format(session_id))
         return session
 
+    @instrument
+    def verify_many(self, session_ids: Sequence[str], read_from: Optional[str] = None) -> Dict[str, Session]:
+        """
+        批量校验session, 任意一个session无效都会报错
+        Args:
+            session_ids: session id列表
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from
+        Returns:
+
+        """
+        sessions = self.get_sessions(session_ids, read_from=read_from)
+        invalid_ids = [session_id for session_id, session in sessions.items() if session is None]
+        if invalid_ids:
+            raise RedisClientError("invalid session_id, session_id={}".format(invalid_ids))
+        return sessions
+
     # noinspection DuplicatedCode
-    def save_hash_data(self, name: str, hash_data: Any, field_name: str = "", ex: int = EXPIRED) -> None:
+    @instrument
+    def save_hash_data(self, name: str, hash_data: Any, field_name: str = "", ex: int = EXPIRED,
+                       codec: Optional[Union[str, Codec]] = None) -> None:
         """
         获取hash对象field_name对应的值
         Args:
@@ -234,46 +746,99 @@ class RdbClient(BaseStrictRedis, Redis):
             field_name: 保存的hash mapping 中的某个字段
             hash_data: 获取的hash对象中属性的名称
             ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
         Returns:
             反序列化对象
         """
+        codec = self._get_codec(codec)
         with self.catch_error():
             if field_name:
-                self.hset(name, field_name, hash_data if isinstance(hash_data, str) else ordumps(hash_data))
+                self.hset(name, field_name, codec.dumps(hash_data))
             else:
                 if not isinstance(hash_data, Dict):
                     raise ValueError("hash data error, must be MutableMapping.")
                 # 是否对每个键值进行dump
-                self.hset(name, mapping=self.rs_dumps(hash_data))
+                self.hset(name, mapping=self.rs_dumps(hash_data, codec))
             # 设置过期时间
             self.expire(name, ex)
+        self._cache_invalidate(name)
 
-    def get_hash_data(self, name: str, field_name: str = "", ex: int = EXPIRED) -> Any:
+    @instrument
+    def get_hash_data(self, name: str, field_name: str = "", ex: int = EXPIRED,
+                      codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None,
+                      lazy: bool = False) -> Any:
         """
         获取hash对象field_name对应的值
         Args:
             name: redis hash key的名称
             field_name: 获取的hash对象中属性的名称
             ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
+            lazy: 没有指定field_name时是否返回LazyHashData, 字段在第一次访问时才反序列化, 适合只使用少数字段的大hash
         Returns:
             反序列化对象
         """
-        with self.catch_error():
-            if field_name:
-                hash_data = self.hget(name, field_name)
-                if hash_data:
-                    hash_data = orloads(hash_data)
-            else:
-                hash_data = self.hgetall(name)
-                if hash_data:
-                    hash_data = self.rs_loads(hash_data)
-            # 设置过期时间
-            self.expire(name, ex)
+        codec = self._get_codec(codec)
+        hash_data = self._cache_get(name, field_name, codec.binary)
+        if hash_data is None:
+            reader = self._read_client(read_from, codec.binary)
+            client = self.binary_client if codec.binary else self
+            with self.catch_error():
+                if reader is not None:
+                    hash_data = reader.hget(name, field_name) if field_name else reader.hgetall(name)
+                    if hash_data:
+                        self._refresh_expire(ex, name)
+                else:
+                    # 读取和设置过期时间在一次往返中完成
+                    with client.pipeline(transaction=False) as pipe:
+                        if field_name:
+                            pipe.hget(name, field_name)
+                        else:
+                            pipe.hgetall(name)
+                        pipe.expire(name, ex)
+                        hash_data = (pipe.execute())[0]
+            self._cache_set(name, hash_data, field_name, ex=ex, binary=codec.binary)
+        if hash_data:
+            hash_data = codec.loads(hash_data) if field_name else self._load_hash(hash_data, codec, lazy)
 
         return hash_data
 
-    def get_list_data(self, name: str, start: int = 0, end: int = -1, ex: int = EXPIRED
-                      ) -> Optional[List[Union[str, int, float]]]:
+    @instrument
+    def get_hash_fields(self, name: str, field_names: Sequence[str], ex: int = EXPIRED,
+                        codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None) -> Dict[str, Any]:
+        """
+        使用HMGET获取hash对象中指定的多个字段, 只有需要的字段通过网络返回
+        Args:
+            name: redis hash key的名称
+            field_names: 获取的hash对象中属性的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
+        Returns:
+            字段名称和反序列化对象的映射, 不存在的字段为None
+        """
+        if not field_names:
+            return {}
+        codec = self._get_codec(codec)
+        reader = self._read_client(read_from, codec.binary)
+        client = self.binary_client if codec.binary else self
+        with self.catch_error():
+            if reader is not None:
+                values = reader.hmget(name, field_names)
+                if any(value is not None for value in values):
+                    self._refresh_expire(ex, name)
+            else:
+                # 读取和设置过期时间在一次往返中完成
+                with client.pipeline(transaction=False) as pipe:
+                    pipe.hmget(name, field_names)
+                    pipe.expire(name, ex)
+                    values = (pipe.execute())[0]
+        return self._load_hash_fields(field_names, values, codec)
+
+    @instrument
+    def get_list_data(self, name: str, start: int = 0, end: int = -1, ex: int = EXPIRED,
+                      read_from: Optional[str] = None) -> Optional[List[Union[str, int, float]]]:
         """
         获取redis的列表中的数据
         Args:
@@ -281,16 +846,26 @@ class RdbClient(BaseStrictRedis, Redis):
             start: 获取数据的起始位置,默认列表的第一个值
             end: 获取数据的结束位置，默认列表的最后一个值
             ex: 过期时间，单位秒
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
         Returns:
 
         """
+        reader = self._read_client(read_from)
         with self.catch_error():
-            data = self.lrange(name, start=start, end=end)
-            if data:
-                self.expire(name, ex)
+            if reader is not None:
+                data = reader.lrange(name, start, end)
+                if data:
+                    self._refresh_expire(ex, name)
+                return data
+            # 读取和设置过期时间在一次往返中完成, key不存在时EXPIRE不会生效
+            with self.pipeline(transaction=False) as pipe:
+                pipe.lrange(name, start, end)
+                pipe.expire(name, ex)
+                data = (pipe.execute())[0]
 
         return data
 
+    @instrument
     def save_list_data(self, name: str, list_data: Union[List[Union[str, int, float]], Union[str, int, float]],
                        save_to_left: bool = True, ex: int = EXPIRED) -> None:
         """
@@ -311,37 +886,346 @@ class RdbClient(BaseStrictRedis, Redis):
                 self.rpush(name, *list_data)
             # 设置过期时间
             self.expire(name, ex)
+        self._cache_invalidate(name)
 
-    def save_usual_data(self, name: str, value: Any, ex: int = EXPIRED) -> None:
+    @instrument
+    def save_usual_data(self, name: str, value: Any, ex: int = EXPIRED, codec: Optional[Union[str, Codec]] = None
+                        ) -> None:
         """
         保存列表、映射对象为普通的字符串
         Args:
             name: redis key的名称
             value: 保存的值，可以是可序列化的任何职
             ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
         Returns:
 
         """
+        codec = self._get_codec(codec)
         with self.catch_error():
-            self.set(name, ordumps(value) if not isinstance(value, str) else value, ex)
+            self.set(name, codec.dumps(value), ex)
+        self._cache_invalidate(name)
 
-    def get_usual_data(self, name: str, ex: int = EXPIRED) -> Any:
+    @instrument
+    def get_usual_data(self, name: str, ex: int = EXPIRED, codec: Optional[Union[str, Codec]] = None,
+                       read_from: Optional[str] = None) -> Any:
         """
         获取name对应的值
         Args:
             name: redis key的名称
             ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
         Returns:
             反序列化对象
         """
-        with self.catch_error():
-            data = self.get(name)
-            if data:  # 保证key存在时设置过期时间
-                self.expire(name, ex)
-                data = orloads(data)
+        codec = self._get_codec(codec)
+        data = self._get_usual_raw(name, ex, codec, read_from)
+        if data:
+            data = codec.loads(data)
 
         return data
 
+    def _get_usual_raw(self, name: str, ex: int, codec: Codec, read_from: Optional[str] = None) -> Any:
+        """
+        读取name对应的原始值并刷新过期时间, key不存在时返回None
+        Args:
+            name: redis key的名称
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec
+            read_from: 本次调用读取的节点, primary或者replica
+        Returns:
+
+        """
+        data = self._cache_get(name, binary=codec.binary)
+        if data is None:
+            reader = self._read_client(read_from, codec.binary)
+            client = self.binary_client if codec.binary else self
+            with self.catch_error():
+                if reader is not None:
+                    data = reader.get(name)
+                    if data is not None:
+                        self._refresh_expire(ex, name)
+                # 读取和设置过期时间在一次往返中完成, key不存在时不会设置过期时间
+                elif self.supports_getex():
+                    data = client.execute_command("GETEX", name, "EX", ex)
+                else:
+                    with client.pipeline(transaction=False) as pipe:
+                        pipe.get(name)
+                        pipe.expire(name, ex)
+                        data = (pipe.execute())[0]
+            self._cache_set(name, data, ex=ex, binary=codec.binary)
+        return data
+
+    @instrument
+    def save_usual_data_many(self, mapping: Dict[str, Any], ex: int = EXPIRED,
+                             codec: Optional[Union[str, Codec]] = None) -> None:
+        """
+        批量保存普通的字符串, 所有的SET EX在一个pipeline中完成
+        Args:
+            mapping: redis key的名称和保存的值的映射
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+
+        """
+        if not mapping:
+            return
+        codec = self._get_codec(codec)
+        with self.catch_error():
+            with self.pipeline(transaction=False) as pipe:
+                for name, value in mapping.items():
+                    pipe.set(name, codec.dumps(value), ex)
+                pipe.execute()
+        self._cache_invalidate(*mapping)
+
+    @instrument
+    def get_usual_data_many(self, names: Sequence[str], ex: int = EXPIRED,
+                            codec: Optional[Union[str, Codec]] = None, read_from: Optional[str] = None
+                            ) -> Dict[str, Any]:
+        """
+        批量获取name对应的值, 使用MGET读取, 读取主节点时刷新过期时间的EXPIRE和MGET在同一个pipeline中发送
+        Args:
+            names: redis key的名称列表
+            ex: 过期时间，单位秒
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from, 过期时间总是在主节点刷新
+        Returns:
+            redis key的名称和反序列化对象的映射, key不存在时为None
+        """
+        codec = self._get_codec(codec)
+        raw_data: Dict[str, Any] = {}
+        miss_names: List[str] = []
+        for name in dict.fromkeys(names):
+            data = self._cache_get(name, binary=codec.binary)
+            if data is None:
+                miss_names.append(name)
+            else:
+                raw_data[name] = data
+
+        if miss_names:
+            reader = self._read_client(read_from, codec.binary)
+            client = reader or (self.binary_client if codec.binary else self)
+            slot_groups = self._group_by_slot(miss_names)  # 集群模式下MGET的key必须在同一个槽
+            with self.catch_error():
+                with client.pipeline(transaction=False) as pipe:
+                    for slot_names in slot_groups:
+                        pipe.execute_command("MGET", *slot_names)  # 集群的pipeline不允许调用mget
+                    if reader is None:
+                        for name in miss_names:
+                            pipe.expire(name, ex)
+                    slot_data = (pipe.execute())[:len(slot_groups)]
+                miss_names = [name for slot_names in slot_groups for name in slot_names]
+                miss_data = [data for values in slot_data for data in values]
+                if reader is not None:
+                    self._refresh_expire(ex, *(name for name, data in zip(miss_names, miss_data) if data is not None))
+            for name, data in zip(miss_names, miss_data):
+                self._cache_set(name, data, ex=ex, binary=codec.binary)
+                raw_data[name] = data
+
+        return {name: codec.loads(data) if data else data for name, data in raw_data.items()}
+
+    @instrument
+    def get_or_set(self, name: str, loader: Callable[[], Any], ex: int = EXPIRED, lock_timeout: float = 10,
+                   wait_timeout: float = 5, stale_ex: int = 0, early_beta: float = 0,
+                   codec: Optional[Union[str, Codec]] = None) -> Any:
+        """
+        获取name对应的值, 不存在时调用loader计算并保存
+
+        进程内同一个key的并发调用只会有一个调用loader, 跨进程通过redis锁(SET NX PX)限制只有一个进程重新计算,
+        其他进程等待计算结果, 开启stale_ex时直接返回旧值
+        Args:
+            name: redis key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            lock_timeout: redis锁的过期时间, 单位秒, 应该大于loader的执行时间
+            wait_timeout: 没有获取到锁时等待其他进程计算结果的时间, 单位秒, 超时后自己计算
+            stale_ex: 旧值的过期时间, 单位秒, 大于0时额外保存一份旧值, 其他进程计算时直接返回旧值;
+                开启early_beta时值在redis中多保留stale_ex秒, 逻辑过期后返回旧值并在后台重新计算
+            early_beta: 大于0时开启提前重新计算(XFetch), 值和计算耗时、逻辑过期时间一起保存,
+                临近过期时按概率在后台提前重新计算, 越大越提前, 一般为1
+            codec: 本次调用使用的codec, 默认使用客户端的codec
+        Returns:
+            反序列化对象
+        """
+        value = self._read_cached(name, loader, ex, lock_timeout, stale_ex, early_beta, codec)
+        if value is not CACHE_MISS:
+            return value
+        # 进程内同一个key的调用合并到一个loader
+        with self._flight_locks.hold(name):
+            value = self._read_cached(name, loader, ex, lock_timeout, stale_ex, early_beta, codec)
+            if value is not CACHE_MISS:
+                return value
+
+            lock_name = f"{name}:lock"
+            token = self._acquire_lock(lock_name, lock_timeout)
+            if token is None:
+                if stale_ex > 0 and early_beta <= 0:
+                    value = self._read_stale(name, codec)
+                    if value is not CACHE_MISS:
+                        return value
+                # 等待获取到锁的进程计算完成
+                deadline = time.monotonic() + wait_timeout
+                while time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    value = self._read_cached(name, loader, ex, lock_timeout, stale_ex, early_beta, codec)
+                    if value is not CACHE_MISS:
+                        return value
+            try:
+                value = self._load_and_save(name, loader, ex, stale_ex, early_beta, codec)
+            finally:
+                if token is not None:
+                    self._release_lock(lock_name, token)
+        return value
+
+    def _read_cached(self, name: str, loader: Callable[[], Any], ex: int, lock_timeout: float, stale_ex: int,
+                     early_beta: float, codec: Optional[Union[str, Codec]]) -> Any:
+        """
+        get_or_set读取缓存的值, 开启early_beta时同时读取元数据并按需在后台提前重新计算
+        Args:
+            name: redis key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            lock_timeout: redis锁的过期时间, 单位秒
+            stale_ex: 旧值的过期时间, 单位秒
+            early_beta: 提前计算的系数
+            codec: 本次调用使用的codec
+        Returns:
+            反序列化对象, key不存在时返回CACHE_MISS
+        """
+        codec = self._get_codec(codec)
+        if early_beta <= 0:
+            return self._loads_cached(codec, self._get_usual_raw(name, ex, codec))
+        client = self.binary_client if codec.binary else self
+        with self.catch_error():
+            # 集群模式下值和元数据可能不在同一个槽, 不能使用MGET, 通过pipeline在一次往返中读取
+            with client.pipeline(transaction=False) as pipe:
+                pipe.get(name)
+                pipe.get(f"{name}:meta")
+                data, meta = pipe.execute()
+        if data is None or not meta:
+            return CACHE_MISS
+        if self._should_refresh(meta, early_beta) and self._mark_refreshing(name):
+            threading.Thread(target=self._refresh_cached, daemon=True,
+                             args=(name, loader, ex, lock_timeout, stale_ex, early_beta, codec)).start()
+        return self._loads_cached(codec, data)
+
+    def _read_stale(self, name: str, codec: Optional[Union[str, Codec]]) -> Any:
+        """
+        读取get_or_set保存的旧值, 旧值按照保存时的stale_ex过期, 读取时不刷新过期时间
+        Args:
+            name: redis key的名称
+            codec: 本次调用使用的codec
+        Returns:
+            反序列化对象, 旧值不存在时返回CACHE_MISS
+        """
+        codec = self._get_codec(codec)
+        client = self.binary_client if codec.binary else self
+        with self.catch_error():
+            data = client.get(f"{name}:stale")
+        return self._loads_cached(codec, data)
+
+    def _refresh_cached(self, name: str, loader: Callable[[], Any], ex: int, lock_timeout: float, stale_ex: int,
+                        early_beta: float, codec: Codec) -> None:
+        """
+        后台重新计算, 获取不到redis锁说明其他进程正在计算
+        Args:
+            name: redis key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            lock_timeout: redis锁的过期时间, 单位秒
+            stale_ex: 旧值的过期时间, 单位秒
+            early_beta: 提前计算的系数
+            codec: 本次调用使用的codec
+        Returns:
+
+        """
+        lock_name = f"{name}:lock"
+        try:
+            token = self._acquire_lock(lock_name, lock_timeout)
+            if token is not None:
+                try:
+                    self._load_and_save(name, loader, ex, stale_ex, early_beta, codec)
+                finally:
+                    self._release_lock(lock_name, token)
+        except Exception:  # 后台刷新的错误不影响已经返回的结果
+            _logger.exception("fescache refresh %s failed", name)
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(name)
+
+    def _mark_refreshing(self, name: str) -> bool:
+        """
+        把key记录为正在后台重新计算, 判断和记录在锁内完成, 同一个key只会启动一个后台线程
+        Args:
+            name: redis key的名称
+        Returns:
+            key已经在后台重新计算时返回False
+        """
+        with self._refreshing_lock:
+            if name in self._refreshing:
+                return False
+            self._refreshing.add(name)
+            return True
+
+    def _load_and_save(self, name: str, loader: Callable[[], Any], ex: int, stale_ex: int, early_beta: float,
+                       codec: Optional[Union[str, Codec]]) -> Any:
+        """
+        调用loader计算并保存
+        Args:
+            name: redis key的名称
+            loader: 计算值的函数
+            ex: 过期时间，单位秒
+            stale_ex: 旧值的过期时间, 单位秒
+            early_beta: 提前计算的系数
+            codec: 本次调用使用的codec
+        Returns:
+
+        """
+        start_time = time.monotonic()
+        value = loader()
+        if early_beta > 0:
+            # 值和元数据在一个pipeline中保存, 值在redis中多保留stale_ex秒
+            delta, codec = time.monotonic() - start_time, self._get_codec(codec)
+            with self.catch_error():
+                with self.pipeline(transaction=False) as pipe:
+                    pipe.set(name, codec.dumps(value), ex + stale_ex)
+                    pipe.set(f"{name}:meta", self._dumps_meta(delta, ex), ex + stale_ex)
+                    pipe.execute()
+            self._cache_invalidate(name)
+        else:
+            self.save_usual_data(name, value, ex, codec)
+            if stale_ex > 0:
+                self.save_usual_data(f"{name}:stale", value, stale_ex, codec)
+        return value
+
+    def _acquire_lock(self, lock_name: str, lock_timeout: float) -> Optional[str]:
+        """
+        获取redis锁(SET NX PX)
+        Args:
+            lock_name: 锁的名称
+            lock_timeout: 锁的过期时间, 单位秒
+        Returns:
+            获取到锁时返回锁的token, 否则返回None
+        """
+        token = secrets.token_hex(8)
+        with self.catch_error():
+            locked = self.set(lock_name, token, px=int(lock_timeout * 1000), nx=True)
+        return token if locked else None
+
+    def _release_lock(self, lock_name: str, token: str) -> None:
+        """
+        释放redis锁, 只有token一致时才删除
+        Args:
+            lock_name: 锁的名称
+            token: 获取锁时返回的token
+        Returns:
+
+        """
+        with ignore_error(), self.catch_error():
+            self.eval_script(RELEASE_LOCK_SCRIPT, [lock_name], [token])
+
+    @instrument
     def incrbynumber(self, name: str, amount: int = 1, ex: int = EXPIRED) -> None:
         """
         通过给定的值对已有的值进行递增
@@ -357,19 +1241,23 @@ class RdbClient(BaseStrictRedis, Redis):
                 self.incrbyfloat(name, amount)
             # 增加过期时间
             self.expire(name, ex)
+        self._cache_invalidate(name)
 
-    def is_exists(self, name: str) -> bool:
+    @instrument
+    def is_exists(self, name: str, read_from: Optional[str] = None) -> bool:
         """
         判断redis key是否存在
         Args:
             name: redis key的名称
+            read_from: 本次调用读取的节点, primary或者replica, 默认使用客户端的read_from
         Returns:
 
         """
         with self.catch_error():
-            rs = self.exists(name)
+            rs = (self._read_client(read_from) or self).exists(name)
         return True if rs else False
 
+    @instrument
     def delete_keys(self, names: Sequence[str]) -> None:
         """
         删除一个或多个redis key
@@ -380,16 +1268,84 @@ class RdbClient(BaseStrictRedis, Redis):
         """
         names = (names,) if isinstance(names, str) else names
         with self.catch_error():
-            self.delete(*names)
+            for slot_names in self._group_by_slot(names):  # 集群模式下多key命令的key必须在同一个槽
+                self.delete(*slot_names)
+        self._cache_invalidate(*names)
 
-    def get_keys(self, pattern_name: str) -> List[str]:
+    @instrument
+    def delete_pattern(self, pattern_name: str, batch: int = 500, dry_run: bool = False, rate_limit: int = 0
+                       ) -> int:
+        """
+        根据正则表达式删除redis的keys, 使用SCAN迭代并按批UNLINK, 内存在redis后台释放
+        Args:
+            pattern_name: 正则表达式的名称
+            batch: 每批UNLINK的key数量, 也作为SCAN遍历的key数量提示
+            dry_run: 只统计匹配的key数量不删除, SCAN的语义下统计值可能偏大
+            rate_limit: 每秒最多删除的key数量, 为0时不限制
+        Returns:
+            删除的key数量, dry_run时为匹配的key数量
+        """
+        deleted_count = 0
+        start_time = time.monotonic()
+        batch_keys: List[str] = []
+
+        def unlink_batch() -> None:
+            nonlocal deleted_count
+            if dry_run:
+                deleted_count += len(batch_keys)
+                batch_keys.clear()
+                return
+            with self.catch_error():
+                # 集群模式下按槽分组, 同一批的UNLINK在一个pipeline中发送, 集群的pipeline中unlink会拆分为单个key
+                with self.pipeline(transaction=False) as pipe:
+                    for slot_keys in self._group_by_slot(batch_keys):
+                        pipe.execute_command("UNLINK", *slot_keys)
+                    deleted_count += sum(pipe.execute())
+            self._cache_invalidate(*batch_keys)
+            batch_keys.clear()
+            if rate_limit > 0:  # 按照速率限制等待
+                wait_time = deleted_count / rate_limit - (time.monotonic() - start_time)
+                if wait_time > 0:
+                    time.sleep(wait_time)
+
+        for key in self.iter_keys(pattern_name, count=batch):
+            batch_keys.append(key)
+            if len(batch_keys) >= batch:
+                unlink_batch()
+        if batch_keys:
+            unlink_batch()
+        return deleted_count
+
+    def iter_keys(self, pattern_name: str, count: int = 1000) -> Iterator[str]:
+        """
+        使用SCAN游标迭代匹配的redis keys, 每次调用服务端只遍历count个key, 不会像KEYS一样阻塞redis
+        Args:
+            pattern_name: 正则表达式的名称
+            count: 每次SCAN遍历的key数量提示
+        Returns:
+            匹配的key, SCAN的语义下同一个key可能返回多次
+        """
+        with self.catch_error():
+            if self.cluster_client is None:
+                yield from self.scan_iter(match=pattern_name, count=count)
+            else:  # 集群模式下分别遍历每个主节点
+                for node in self.cluster_client.get_primaries():
+                    yield from self.cluster_client.get_redis_connection(node).scan_iter(
+                        match=pattern_name, count=count)
+
+    @instrument
+    def get_keys(self, pattern_name: str, use_scan: bool = False, count: int = 1000) -> List[str]:
         """
         根据正则表达式获取redis的keys
         Args:
             pattern_name:正则表达式的名称
+            use_scan: 是否使用SCAN代替KEYS获取, 大数据量时避免阻塞redis
+            count: 使用SCAN时每次遍历的key数量提示
         Returns:
 
         """
+        if use_scan:
+            return list(dict.fromkeys(list(self.iter_keys(pattern_name, count=count))))
         with self.catch_error():
             rs = self.keys(pattern_name)
         return rs
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:00
+"""
+from collections.abc import Mapping as AbcMapping
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional, Tuple, Union
+
+import orjson
+
+from .codec import Codec, get_codec
+
+__all__ = ("FieldSchema", "FIELD_TYPES", "LazyHashData")
+
+
+def _dump_str(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _load_str(value: Union[str, bytes]) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _dump_int(value: Optional[int]) -> str:
+    return "null" if value is None else str(int(value))
+
+
+def _load_int(value: Union[str, bytes]) -> Optional[int]:
+    value = _load_str(value)
+    # 和之前的存储格式保持一致, None序列化为null, 更早的版本保存为None或者空字符串
+    return None if value in ("null", "None", "") else int(value)
+
+
+def _dump_float(value: Optional[float]) -> str:
+    return "null" if value is None else repr(float(value))
+
+
+def _load_float(value: Union[str, bytes]) -> Optional[float]:
+    value = _load_str(value)
+    return None if value in ("null", "None", "") else float(value)
+
+
+def _dump_json(value: Any) -> str:
+    # 不能序列化的值(datetime之外的自定义对象、Decimal等)直接抛出TypeError, 不保存为读取时无法还原的字符串
+    return orjson.dumps(value).decode()
+
+
+# 字段类型对应的序列化和反序列化方法
+_FIELD_CODECS: Dict[str, Tuple[Callable[[Any], str], Callable[[Union[str, bytes]], Any]]] = {
+    "str": (_dump_str, _load_str),
+    "int": (_dump_int, _load_int),
+    "float": (_dump_float, _load_float),
+    "json": (_dump_json, orjson.loads),
+}
+# 支持的字段类型
+FIELD_TYPES: Tuple[str, ...] = tuple(_FIELD_CODECS)
+
+
+class FieldSchema(object):
+    """
+    hash对象各个字段的类型, 按照字段的类型直接序列化和反序列化, 不需要先尝试json解析再回退为字符串
+
+    str字段原样保存, int、float字段保存为数字的字符串, None保存为null, json字段使用orjson序列化,
+    保存的格式和默认的json codec一致, 之前保存的数据可以直接读取; json字段中有orjson不能序列化的值时抛出TypeError
+    """
+
+    def __init__(self, field_types: Mapping[str, str], extra_codec: Optional[Union[str, Codec]] = "json"):
+        """
+        hash对象各个字段的类型
+        Args:
+            field_types: 字段名称和类型的映射, 类型为str、int、float或者json
+            extra_codec: schema中没有的字段使用的codec, 为None时写入这些字段报错, 读取时忽略
+        """
+        for field_name, field_type in field_types.items():
+            if field_type not in _FIELD_CODECS:
+                raise ValueError(f"field type of {field_name} error, must be one of {FIELD_TYPES}.")
+        self.field_types: Dict[str, str] = dict(field_types)
+        self.extra_codec: Optional[Codec] = None if extra_codec is None else get_codec(extra_codec)
+        self._dumpers: Dict[str, Callable[[Any], str]] = {
+            field_name: _FIELD_CODECS[field_type][0] for field_name, field_type in self.field_types.items()}
+        self._loaders: Dict[str, Callable[[Union[str, bytes]], Any]] = {
+            field_name: _FIELD_CODECS[field_type][1] for field_name, field_type in self.field_types.items()}
+
+    def dumps(self, hash_data: Dict[str, Any]) -> Dict[str, Union[str, bytes]]:
+        """
+        按照字段的类型序列化
+        Args:
+            hash_data: hash data
+        Returns:
+
+        """
+        dumpers, extra_codec = self._dumpers, self.extra_codec
+        result = {}
+        for field_name, value in hash_data.items():
+            dumper = dumpers.get(field_name)
+            if dumper is not None:
+                result[field_name] = dumper(value)
+            elif extra_codec is not None:
+                result[field_name] = extra_codec.dumps(value)
+            else:
+                raise ValueError(f"field {field_name} is not defined in the schema.")
+        return result
+
+    def loads(self, hash_data: Mapping[Union[str, bytes], Union[str, bytes]], *, skip_extra: bool = False
+              ) -> Dict[str, Any]:
+        """
+        按照字段的类型反序列化
+        Args:
+            hash_data: HGETALL的原始返回值
+            skip_extra: 是否忽略schema中没有的字段, extra_codec为None时总是忽略
+        Returns:
+
+        """
+        loaders = self._loaders
+        extra_codec = None if skip_extra else self.extra_codec
+        result = {}
+        for field_name, value in hash_data.items():
+            if isinstance(field_name, bytes):
+                field_name = field_name.decode()
+            loader = loaders.get(field_name)
+            if loader is not None:
+                result[field_name] = loader(value)
+            elif extra_codec is not None:
+                result[field_name] = extra_codec.loads(value)
+        return result
+
+
+class LazyHashData(AbcMapping):
+    """
+    惰性反序列化的hash对象, 保存HGETALL的原始返回值, 第一次访问某个字段时才反序列化并缓存结果
+
+    字段很多但是只使用其中几个字段时避免反序列化全部的字段, 需要全部字段时使用to_dict
+    """
+
+    __slots__ = ("_raw_data", "_codec", "_loaded")
+
+    def __init__(self, raw_data: Mapping[Union[str, bytes], Union[str, bytes]], codec: Codec):
+        """
+        惰性反序列化的hash对象
+        Args:
+            raw_data: HGETALL的原始返回值, 二进制codec时hash的field为bytes
+            codec: 反序列化使用的codec
+        """
+        if codec.binary:
+            raw_data = {field_name.decode() if isinstance(field_name, bytes) else field_name: value
+                        for field_name, value in raw_data.items()}
+        self._raw_data: Dict[str, Union[str, bytes]] = raw_data
+        self._codec: Codec = codec
+        self._loaded: Dict[str, Any] = {}  # 已经反序列化的字段
+
+    def __getitem__(self, field_name: str) -> Any:
+        loaded = self._loaded
+        if field_name in loaded:
+            return loaded[field_name]
+        value = loaded[field_name] = self._codec.loads(self._raw_data[field_name])
+        return value
+
+    def __contains__(self, field_name: object) -> bool:
+        return field_name in self._raw_data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._raw_data)
+
+    def __len__(self) -> int:
+        return len(self._raw_data)
+
+    def __repr__(self) -> str:
+        return f"<{self.__class__.__name__} fields={len(self._raw_data)} loaded={len(self._loaded)}>"
+
+    def to_dict(self, ) -> Dict[str, Any]:
+        """
+        反序列化全部的字段
+        Args:
+
+        Returns:
+
+        """
+        return {field_name: self[field_name] for field_name in self._raw_data}
@@ -6,13 +6,18 @@
 @software: PyCharm
 @time: 18-12-26 下午3:32
 """
+import re
 from contextlib import contextmanager
-from typing import Any, Generator, Union
+from typing import Any, FrozenSet, Generator, Pattern, Union
 
 import orjson
 
 __all__ = ("ignore_error", "ordumps", "orloads")
 
+# 对象、数组和字符串开头的字符, 其他的json值只能是完整的true、false、null或者数字
+_JSON_CONTAINER_STARTS: FrozenSet[str] = frozenset('{["')
+_JSON_SCALAR: Pattern = re.compile(r"(?:true|false|null|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)")
+
 
 @contextmanager
 def ignore_error(error=Exception) -> Generator[None, None, None]:
@@ -53,6 +58,11 @@ def orloads(any_value: Union[bytes, bytearray, memoryview, str]) -> Any:
     Returns:
 
     """
+    if isinstance(any_value, str):
+        # 不可能是json的字符串直接返回, 不再抛出和捕获异常
+        value = any_value.strip(" \t\r\n")
+        if not value or (value[0] not in _JSON_CONTAINER_STARTS and _JSON_SCALAR.fullmatch(value) is None):
+            return any_value
     # noinspection PyBroadException
     try:
         return orjson.loads(any_value)
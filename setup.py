@@ -42,8 +42,12 @@ setup(name='fescache',
       extras_require={
           "async": ['aredis>=1.1.3,<=1.1.8', 'hiredis<=2.0.0', ],
           "sync": ['redis>=3.5.3,<=4.1.4', ],
+          "cluster": ['redis>=4.1.0,<=4.1.4', ],
+          "msgpack": ['msgpack>=1.0.0', ],
+          "lz4": ['lz4>=3.1.0', ],
+          "zstd": ['zstandard>=0.15.0', ],
       },
-      python_requires=">=3.6",
+      python_requires=">=3.7",
       keywords="redis, asyncio, crud, session, easier",
       license='MIT',
       classifiers=[
@@ -57,7 +61,6 @@ setup(name='fescache',
           'Topic :: Software Development :: Libraries :: Python Modules',
           'Topic :: Utilities',
           'Programming Language :: Python',
-          'Programming Language :: Python :: 3.6',
           'Programming Language :: Python :: 3.7',
           'Programming Language :: Python :: 3.8']
       )
@@ -6,4 +6,3 @@
 @software: PyCharm
 @time: 2020/9/3 下午5:05
 """
-
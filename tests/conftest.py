@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import os
+import shutil
+import socket
+import subprocess
+import time
+
+import pytest
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_port(port: int, timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+class FakeClock(object):
+    """
+    代替time模块, 测试过期时间时不需要真正等待
+    """
+
+    def __init__(self, ):
+        self.now = 1000.0
+
+    def monotonic(self, ) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    本地缓存使用的时钟, 通过clock.now前进
+    """
+    clock = FakeClock()
+    monkeypatch.setattr("fescache.memory.time", clock)
+    monkeypatch.setattr("fescache.localcache.time", clock)
+    return clock
+
+
+@pytest.fixture(scope="session")
+def redis_port(tmp_path_factory):
+    """
+    测试使用的redis端口, FESCACHE_TEST_REDIS_PORT指定已经启动的redis, 否则启动PATH中的redis-server,
+    没有redis-server时跳过需要redis的测试
+    """
+    port = os.environ.get("FESCACHE_TEST_REDIS_PORT")
+    if port:
+        yield int(port)
+        return
+    server = os.environ.get("FESCACHE_TEST_REDIS_SERVER") or shutil.which("redis-server")
+    if not server:
+        pytest.skip("redis-server is not available, set FESCACHE_TEST_REDIS_SERVER or FESCACHE_TEST_REDIS_PORT.")
+    port = _free_port()
+    process = subprocess.Popen([server, "--port", str(port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no",
+                                "--dir", str(tmp_path_factory.mktemp("redis"))],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_port(port):
+            pytest.skip("redis-server failed to start.")
+        yield port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@pytest.fixture
+def redis_options(redis_port):
+    """
+    连接测试redis的参数, 每个测试之前清空数据库
+    """
+    import redis
+
+    client = redis.Redis(host="127.0.0.1", port=redis_port)
+    client.flushdb()
+    client.close()
+    return {"host": "127.0.0.1", "port": redis_port}
+
+
+@pytest.fixture
+def rdb_factory(redis_options):
+    """
+    创建连接测试redis的RdbClient, 测试结束后关闭连接
+    """
+    from fescache.rdbclient import RdbClient
+
+    clients = []
+
+    def factory(**kwargs):
+        client = RdbClient()
+        client.init_engine(**redis_options, **kwargs)
+        clients.append(client)
+        return client
+
+    yield factory
+    for client in clients:
+        client.close_connection()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+
+
+def test_auto_pipeline(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options, auto_pipeline=True)
+        await asyncio.gather(*(client.save_usual_data(f"k{index}", index) for index in range(20)))
+        # 同一个事件循环周期内的命令合并发送, 每个调用方得到自己命令的结果
+        results = await asyncio.gather(*(client.get_usual_data(f"k{index}") for index in range(20)))
+        assert results == list(range(20))
+        assert await asyncio.gather(client.is_exists("k0"), client.is_exists("missing")) == [True, False]
+        # 命令错误只影响自己的调用方
+        await client.save_hash_data("h", {"a": 1})
+        results = await asyncio.gather(client.get("h"), client.get_usual_data("k1"), return_exceptions=True)
+        assert isinstance(results[0], Exception)
+        assert results[1] == 1
+        client._close_connection()
+
+    asyncio.run(run())
+
+
+def test_auto_pipeline_attribution(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options, auto_pipeline=True)
+        await client.save_usual_data("a", 1)
+        records = []
+        client.add_hook(records.append)
+        # 同一个事件循环周期内的命令合并发送, 每个调用方只记录自己的命令
+        results = await asyncio.gather(*(client.is_exists(name) for name in ("a", "b") * 5))
+        assert results == [True, False] * 5
+        assert len(records) == 10
+        for record in records:
+            assert (record.name, record.commands, record.round_trips) == ("is_exists", 1, 1)
+            assert record.bytes_out == len(b"*2\r\n$6\r\nEXISTS\r\n$1\r\na\r\n")
+        client._close_connection()
+
+    asyncio.run(run())
+
+
+def test_auto_pipeline_pool_exhausted(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options, auto_pipeline=True, pool_size=1)
+        await client.save_usual_data("a", 1)
+
+        async def call(index):
+            for _ in range(index % 5):  # 分散到多个事件循环周期, 同时有多个批次在发送
+                await asyncio.sleep(0)
+            return await client.is_exists("a")
+
+        # 并发的批次超过最大连接数时调用方得到错误而不是一直等待
+        results = await asyncio.wait_for(asyncio.gather(*(call(index) for index in range(50)),
+                                                        return_exceptions=True), 5)
+        assert any(isinstance(result, Exception) for result in results)
+        assert all(result is True or isinstance(result, Exception) for result in results)
+        assert await client.is_exists("a")
+        client._close_connection()
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import threading
+import time
+
+import pytest
+
+from fescache import Session, key_slot
+from fescache._base import KeyLocks
+
+
+@pytest.mark.parametrize("key,slot", (
+        ("foo", 12182), ("bar", 5061), ("123456789", 12739), ("", 0), (b"foo", 12182),
+        ("{user1000}.following", 3443), ("foo{}{bar}", 8363), ("foo{{bar}}zap", 4015), ("foo{bar}{zap}", 5061)))
+def test_key_slot(key, slot):
+    assert key_slot(key) == slot
+
+
+def test_key_slot_hashtag():
+    assert key_slot("{user1000}.following") == key_slot("{user1000}.followers") == key_slot("user1000")
+
+
+def test_session_from_dict():
+    session = Session("account-1", org_level="2", extra=1)
+    assert session.org_level == 2
+    assert session.kwargs == {"extra": 1}
+    assert session.extra == 1
+    loaded = Session.from_dict(session.to_dict())
+    # 重建时不再生成各个ID
+    assert loaded.to_dict() == session.to_dict()
+    assert loaded.role_id == session.role_id
+    with pytest.raises(AttributeError):
+        getattr(loaded, "missing")
+    with pytest.raises(AttributeError):
+        loaded.missing = 1
+
+
+def test_key_locks():
+    locks = KeyLocks()
+    started, order = threading.Event(), []
+
+    def slow():
+        with locks.hold("a"):
+            started.set()
+            time.sleep(0.2)
+            order.append("slow")
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    started.wait()
+    # 不同的key不会等待
+    with locks.hold("b"):
+        order.append("other")
+    # 同一个key等待持有锁的调用方
+    with locks.hold("a"):
+        order.append("same")
+    thread.join()
+    assert order == ["other", "slow", "same"]
+    assert locks._locks == {}
+
+
+def test_session_dirty_tracking():
+    session = Session("account-1", user_name="tom", extra=1)
+    assert session.to_dirty_dict() is None  # 新建的session需要保存全部字段
+    session.mark_clean()
+    assert session.to_dirty_dict() == {}
+    session.user_name = "jerry"
+    session.gather_orgnos["1"] = "a"  # 原地修改通过和快照比较发现
+    assert session.to_dirty_dict() == {"user_name": "jerry", "gather_orgnos": {"1": "a"}}
+
+    loaded = Session.from_dict(session.to_dict())
+    assert loaded.to_dirty_dict() == {}
+    assert loaded.extra == 1
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import zlib
+
+import pytest
+
+from fescache import CompressedCodec, JsonCodec, RawCodec, get_codec
+
+VALUES = ("text", "", 0, 1.5, None, True, [1, "a"], {"a": {"b": [1, 2]}})
+
+
+@pytest.mark.parametrize("name", ("json", "orjson", "msgpack"))
+@pytest.mark.parametrize("value", VALUES)
+def test_codec_roundtrip(name, value):
+    codec = get_codec(name)
+    assert codec.loads(codec.dumps(value)) == value
+
+
+def test_get_codec():
+    assert get_codec("json") is get_codec("json")
+    codec = JsonCodec()
+    assert get_codec(codec) is codec
+    compressed = CompressedCodec()
+    assert get_codec(compressed) is compressed
+    with pytest.raises(ValueError):
+        get_codec("pickle")
+
+
+def test_json_codec_compatible():
+    codec = JsonCodec()
+    # 字符串原样保存, 读取时不是json的字符串原样返回
+    assert codec.dumps("text") == "text"
+    assert codec.loads("text") == "text"
+    assert codec.loads("{not json") == "{not json"
+    assert codec.loads("[1, 2]") == [1, 2]
+
+
+def test_raw_codec():
+    codec = RawCodec()
+    assert codec.dumps(b"data") == b"data"
+    assert codec.loads("data") == "data"
+    with pytest.raises(ValueError):
+        codec.dumps({"a": 1})
+
+
+@pytest.mark.parametrize("inner", ("json", "msgpack"))
+def test_compressed_codec(inner):
+    codec = CompressedCodec(inner, threshold=64)
+    small = {"a": 1}
+    large = {"items": ["x" * 10] * 100}
+    # 没有超过阈值时和被包装的codec保存的一致
+    assert codec.dumps(small) == get_codec(inner).dumps(small)
+    packed = codec.dumps(large)
+    assert packed.startswith(CompressedCodec.header + b"z")
+    assert len(packed) < len(get_codec(inner).dumps(large))
+    assert codec.loads(packed) == large
+    # 之前没有压缩保存的值也可以读取
+    raw = get_codec(inner).dumps(small)
+    assert codec.loads(raw if isinstance(raw, bytes) else raw.encode()) == small
+
+
+def test_compressed_codec_header():
+    codec = CompressedCodec("json", threshold=0)
+    packed = codec.dumps([1, 2, 3])
+    assert packed[:3] == b"\x00FC"
+    assert packed[3:4] == b"z"
+    assert zlib.decompress(packed[4:]) == b"[1,2,3]"
+    with pytest.raises(ValueError):
+        codec.loads(CompressedCodec.header + b"?" + b"data")
+    with pytest.raises(ValueError):
+        CompressedCodec(compressor="bz2")
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fescache import cached
+from fescache.err import FuncArgsError
+from fescache.memory import AIOMemoryRdbClient, MemoryRdbClient
+
+
+class SlowLoader(object):
+    """
+    记录调用次数的loader
+    """
+
+    def __init__(self, value, delay: float = 0.2):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, ):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.value
+
+
+def _concurrent(func, count: int = 8):
+    with ThreadPoolExecutor(count) as executor:
+        return list(executor.map(lambda _: func(), range(count)))
+
+
+def _check_single_flight(client):
+    loader = SlowLoader({"a": 1})
+    assert _concurrent(lambda: client.get_or_set("single", loader, ex=60)) == [{"a": 1}] * 8
+    assert loader.calls == 1
+    assert client.get_or_set("single", loader, ex=60) == {"a": 1}
+    assert loader.calls == 1
+    # 不同的key不会因为其他key的loader而等待
+    slow, fast = SlowLoader(1, delay=1), SlowLoader(2, delay=0)
+    thread = threading.Thread(target=client.get_or_set, args=("slow", slow))
+    thread.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    assert client.get_or_set("fast", fast) == 2
+    assert time.monotonic() - start < 0.5
+    thread.join()
+    assert client._flight_locks._locks == {}
+
+
+def test_get_or_set_single_flight(rdb_factory):
+    _check_single_flight(rdb_factory())
+
+
+def test_memory_get_or_set_single_flight():
+    _check_single_flight(MemoryRdbClient())
+
+
+def test_get_or_set_across_clients(rdb_factory):
+    # 不同的客户端(进程)之间通过redis锁限制只有一个计算
+    clients = [rdb_factory() for _ in range(4)]
+    loader = SlowLoader("value")
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda client: client.get_or_set("shared", loader, ex=60), clients))
+    assert results == ["value"] * 4
+    assert loader.calls == 1
+
+
+def test_get_or_set_stale(rdb_factory):
+    client = rdb_factory()
+    assert client.get_or_set("stale", lambda: 1, ex=60, stale_ex=120) == 1
+    assert client.get_usual_data("stale:stale") == 1
+    # 其他进程持有锁时直接返回旧值
+    client.delete_keys(["stale"])
+    client.set("stale:lock", "other", ex=10)
+    assert client.get_or_set("stale", lambda: 2, ex=60, stale_ex=120) == 1
+    # 读取旧值不刷新过期时间, 旧值按照保存时的stale_ex过期
+    client.expire("stale:stale", 30)
+    assert client.get_or_set("stale", lambda: 2, ex=60, stale_ex=120) == 1
+    assert client.ttl("stale:stale") <= 30
+
+
+def _check_cached_none(client):
+    loader = SlowLoader(None, delay=0)
+    assert client.get_or_set("none", loader, ex=60) is None
+    assert client.get_or_set("none", loader, ex=60) is None
+    assert loader.calls == 1
+
+
+def test_get_or_set_none(rdb_factory):
+    client = rdb_factory()
+    _check_cached_none(client)
+    # 缓存的None不是缺失, 其他进程持有锁时不等待也不重新计算
+    client.set("none:lock", "other", ex=10)
+    start = time.monotonic()
+    assert client.get_or_set("none", lambda: 1, ex=60, wait_timeout=2) is None
+    assert time.monotonic() - start < 1
+    assert client.get_or_set("early-none", lambda: None, ex=60, early_beta=1) is None
+    assert client.get_or_set("early-none", lambda: 1, ex=60, early_beta=1) is None
+
+
+def test_memory_get_or_set_none():
+    _check_cached_none(MemoryRdbClient())
+
+    async def run():
+        client = AIOMemoryRdbClient()
+        assert await client.get_or_set("none", lambda: None) is None
+        assert await client.get_or_set("none", lambda: 1) is None
+
+    asyncio.run(run())
+
+
+def test_get_or_set_early_refresh(rdb_factory):
+    client = rdb_factory()
+    assert client.get_or_set("early", lambda: 1, ex=60, early_beta=1, stale_ex=120) == 1
+    assert client.ttl("early:meta") > 0
+    assert client.get_or_set("early", lambda: 2, ex=60, early_beta=1) == 1
+    # 写入:meta和:stale之后普通的读取方式不受影响
+    assert client.get_usual_data("early") == 1
+    assert client.get_usual_data_many(["early"]) == {"early": 1}
+
+
+def test_get_or_set_early_refresh_error(rdb_factory, caplog):
+    client = rdb_factory()
+    assert client.get_or_set("early-error", SlowLoader(1, delay=0.01), ex=60, early_beta=1e9) == 1
+
+    def failing_loader():
+        raise ValueError("refresh error")
+
+    # 后台刷新的错误只记录日志, 不影响返回的旧值
+    with caplog.at_level(logging.ERROR, logger="fescache"):
+        assert client.get_or_set("early-error", failing_loader, ex=60, early_beta=1e9) == 1
+        for _ in range(50):
+            if "refresh error" in caplog.text:
+                break
+            time.sleep(0.02)
+    assert "refresh error" in caplog.text
+    assert client.get_usual_data("early-error") == 1
+
+
+def test_cached(rdb_factory):
+    client = rdb_factory()
+    calls = []
+
+    @cached(client, ex=60, stale_ex=120, prefix="user")
+    def get_user(user_id):
+        calls.append(user_id)
+        return {"id": user_id, "calls": len(calls)}
+
+    assert get_user(1) == {"id": 1, "calls": 1}
+    assert get_user(1) == {"id": 1, "calls": 1}
+    key = get_user.cache_key(1)
+    assert key.startswith("user:")
+    # 刷新时和get_or_set一样更新旧值
+    assert get_user.refresh(1) == {"id": 1, "calls": 2}
+    assert client.get_usual_data(f"{key}:stale") == {"id": 1, "calls": 2}
+    # 删除时同时删除旧值, 否则删除后还会返回旧值
+    get_user.invalidate(1)
+    assert not client.is_exists(f"{key}:stale")
+    assert get_user(1) == {"id": 1, "calls": 3}
+
+
+def test_cached_early_refresh(rdb_factory):
+    client = rdb_factory()
+
+    @cached(client, ex=60, early_beta=1, prefix="early")
+    def get_value():
+        return time.monotonic()
+
+    value = get_value()
+    key = get_value.cache_key()
+    refreshed = get_value.refresh()
+    assert refreshed != value
+    assert get_value() == refreshed
+    get_value.invalidate()
+    assert not client.is_exists(f"{key}:meta")
+
+
+def test_cached_client_type(rdb_factory):
+    client = rdb_factory()
+    with pytest.raises(FuncArgsError):
+        @cached(client)
+        async def get_value():
+            return 1
+
+
+def test_aio_cached(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options)
+        calls = []
+
+        @cached(client, ex=60)
+        async def get_value(value):
+            calls.append(value)
+            await asyncio.sleep(0.05)
+            return value
+
+        assert await asyncio.gather(*(get_value(1) for _ in range(5))) == [1] * 5
+        assert calls == [1]
+        assert await get_value.refresh(1) == 1
+        assert calls == [1, 1]
+        await get_value.invalidate(1)
+        assert await get_value(1) == 1
+        assert calls == [1, 1, 1]
+        # 缓存的None不会重新计算
+        loader = SlowLoader(None, delay=0)
+        assert await client.get_or_set("none", loader, ex=60) is None
+        assert await client.get_or_set("none", loader, ex=60) is None
+        assert loader.calls == 1
+        await client.set("stale:stale", "1", ex=30)
+        await client.set("stale:lock", "other", ex=10)
+        assert await client.get_or_set("stale", lambda: 2, ex=60, stale_ex=120) == 1
+        assert await client.ttl("stale:stale") <= 30
+        client._close_connection()
+
+    asyncio.run(run())
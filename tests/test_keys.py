@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+import time
+
+
+def test_iter_keys(rdb_factory):
+    client = rdb_factory()
+    client.save_usual_data_many({f"user:{index}": index for index in range(25)})
+    client.save_usual_data("other", 1)
+    expected = sorted(f"user:{index}" for index in range(25))
+    assert sorted(client.iter_keys("user:*", count=10)) == expected
+    assert sorted(client.get_keys("user:*", use_scan=True, count=10)) == expected
+    assert sorted(client.get_keys("user:*")) == expected
+
+
+def test_delete_pattern(rdb_factory):
+    client = rdb_factory()
+    client.save_usual_data_many({f"user:{index}": index for index in range(25)})
+    client.save_usual_data("other", 1)
+    # 只统计数量不删除
+    assert client.delete_pattern("user:*", batch=10, dry_run=True) == 25
+    assert len(client.get_keys("user:*")) == 25
+    # 只统计数量时不按照速率限制等待
+    start = time.monotonic()
+    assert client.delete_pattern("user:*", batch=10, dry_run=True, rate_limit=1) == 25
+    assert time.monotonic() - start < 1
+    assert client.delete_pattern("user:*", batch=10) == 25
+    assert client.get_keys("user:*") == []
+    assert client.get_usual_data("other") == 1
+
+
+def test_aio_delete_pattern(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options)
+        await client.save_usual_data_many({f"user:{index}": index for index in range(25)})
+        await client.save_usual_data("other", 1)
+        start = time.monotonic()
+        assert await client.delete_pattern("user:*", batch=10, dry_run=True, rate_limit=1) == 25
+        assert time.monotonic() - start < 1
+        assert await client.delete_pattern("user:*", batch=10) == 25
+        assert await client.get_keys("user:*") == []
+        assert await client.get_usual_data("other") == 1
+        client._close_connection()
+
+    asyncio.run(run())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import redis
+
+from fescache import LocalCache
+
+
+def test_local_cache(clock):
+    cache = LocalCache(maxsize=2, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2, field_name="f", ttl=10)  # 过期时间不能超过实例的ttl
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # 淘汰最近最少使用的b
+    assert cache.get("b", "f") is None
+    assert cache.get("c") == 3
+    clock.now += 5
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_local_cache_invalidate():
+    cache = LocalCache()
+    cache.set("h", 1, field_name="a")
+    cache.set("h", 2, field_name="b")
+    cache.set("x", 3)
+    cache.invalidate("h")
+    assert cache.get("h", "a") is None
+    assert cache.get("h", "b") is None
+    assert cache.get("x") == 3
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_client_local_cache(rdb_factory, redis_options):
+    client = rdb_factory(local_cache_size=100, local_cache_ttl=60)
+    raw_client = redis.Redis(**redis_options, decode_responses=True)
+    client.save_usual_data("a", {"x": 1})
+    assert client.get_usual_data("a") == {"x": 1}
+    # 其他客户端的修改在本地缓存过期之前不可见, 同一个客户端写入时失效
+    raw_client.set("a", '{"x":2}')
+    assert client.get_usual_data("a") == {"x": 1}
+    client.save_usual_data("a", {"x": 3})
+    assert client.get_usual_data("a") == {"x": 3}
+    assert client.local_cache.stats()["hits"] == 1
+    raw_client.close()
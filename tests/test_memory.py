@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+
+import pytest
+
+from fescache import EXPIRED
+from fescache.err import RedisClientError
+from fescache.memory import AIOMemoryRdbClient, MemoryRdbClient, MemoryStore
+
+
+def test_store_expire(clock):
+    store = MemoryStore()
+    store.set("a", "1", ex=10)
+    store.set("b", "2")
+    assert store.ttl("a") == 10
+    assert store.ttl("b") == -1
+    assert store.ttl("c") == -2
+    clock.now += 5
+    assert store.getex("a", 10) == "1"  # 刷新过期时间
+    clock.now += 9
+    assert store.get("a") == "1"
+    clock.now += 1
+    assert store.get("a") is None
+    assert not store.exists("a")
+    assert store.get("b") == "2"
+    assert store.expire("b", 1)
+    assert not store.expire("c", 1)
+
+
+def test_store_evict(clock):
+    store = MemoryStore()
+    for index in range(100):
+        store.set(f"key{index}", "v", ex=1)
+    store.set("keep", "v", ex=100)
+    clock.now += 2
+    # 写入时从堆顶清理少量已经过期的key
+    store.set("new", "v")
+    assert len(store) == 102 - MemoryStore.evict_batch
+    assert store.purge_expired() == 100 - MemoryStore.evict_batch
+    assert sorted(store.keys()) == ["keep", "new"]
+
+
+def test_store_refresh_rebuild_heap(clock):
+    store = MemoryStore()
+    store.set("a", "1", ex=1)
+    # 刷新过期时间留下的旧条目过多时重建堆
+    for _ in range(3000):
+        store.expire("a", 1)
+    assert len(store._heap) < 2100
+    clock.now += 2
+    assert store.purge_expired() == 1
+    assert not store._expires
+
+
+def test_store_types():
+    store = MemoryStore()
+    store.hset("h", {"a": "1"})
+    assert store.hgetall("h") == {"a": "1"}
+    assert store.kind("h") == "hash"
+    assert store.hmget("h", ["a", "b"]) == ["1", None]
+    with pytest.raises(RedisClientError):
+        store.get("h")
+    assert store.push("l", [1, 2]) == 2
+    assert store.push("l", [3], left=False) == 3
+    assert store.lrange("l", 0, -1) == ["2", "1", "3"]
+    assert store.kind("l") == "list"
+    assert store.kind("x") == "none"
+    assert store.incr("n", 2) == 2
+    assert store.incr("n", 0.5) == 2.5
+    assert not store.set("n", "1", nx=True)
+    assert store.delete("h", "l", "x") == 2
+    assert sorted(store.keys("*")) == ["n"]
+
+
+def test_memory_client_data(clock):
+    client = MemoryRdbClient(codec="msgpack")
+    client.save_usual_data("a", {"x": 1}, ex=10)
+    assert client.get_usual_data("a") == {"x": 1}
+    client.save_hash_data("h", {"a": [1], "b": "text"}, ex=10)
+    assert client.get_hash_data("h") == {"a": [1], "b": "text"}
+    assert client.get_hash_data("h", field_name="a") == [1]
+    assert client.get_hash_fields("h", ["b", "c"]) == {"b": "text", "c": None}
+    # 读取时刷新为默认的过期时间
+    assert 10 < client.store.ttl("a") <= EXPIRED
+    clock.now += EXPIRED + 1
+    assert client.get_usual_data("a") is None
+    assert client.get_hash_data("h") == {}
+
+
+def test_aio_memory_client():
+    async def run():
+        client = AIOMemoryRdbClient()
+        await client.save_usual_data("a", [1, 2])
+        assert await client.get_usual_data("a") == [1, 2]
+        assert await client.is_exists("a")
+        await client.delete_keys(["a"])
+        assert not await client.is_exists("a")
+
+    asyncio.run(run())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import logging
+
+import pytest
+
+from fescache import HistogramCollector, OperationRecord, Session, prometheus_text
+from fescache.memory import MemoryRdbClient
+
+
+def _record(name, elapsed, error=False, commands=1):
+    record = OperationRecord(name)
+    record.elapsed, record.error, record.commands = elapsed, error, commands
+    return record
+
+
+def test_histogram_snapshot():
+    collector = HistogramCollector(buckets=(0.001, 0.01, 0.1))
+    for _ in range(90):
+        collector(_record("get_session", 0.0005))
+    for _ in range(10):
+        collector(_record("get_session", 0.05, error=True, commands=3))
+    snapshot = collector.snapshot()["get_session"]
+    assert snapshot["count"] == 100
+    assert snapshot["errors"] == 10
+    assert snapshot["commands"] == pytest.approx(1.2)
+    assert snapshot["max"] == 0.05
+    assert snapshot["p50"] <= 0.001
+    assert 0.01 < snapshot["p99"] <= 0.05
+    collector.reset()
+    assert collector.snapshot() == {}
+
+
+def test_prometheus_text():
+    collector = HistogramCollector(buckets=(0.001, 0.01))
+    collector(_record("verify", 0.0005))
+    collector(_record("verify", 0.5))
+    text = prometheus_text(collector, namespace="app")
+    assert '# TYPE app_operation_duration_seconds histogram' in text
+    assert 'app_operation_duration_seconds_bucket{operation="verify",le="0.001"} 1' in text
+    assert 'app_operation_duration_seconds_bucket{operation="verify",le="0.01"} 1' in text
+    assert 'app_operation_duration_seconds_bucket{operation="verify",le="+Inf"} 2' in text
+    assert 'app_operation_duration_seconds_count{operation="verify"} 2' in text
+    assert 'app_operation_commands_total{operation="verify"} 2' in text
+    assert text.endswith("\n")
+
+
+def test_hooks_only_top_level(caplog):
+    client = MemoryRdbClient()
+    records = []
+    client.add_hook(records.append)
+    session = Session("account-1")
+    client.save_session(session)
+    records.clear()
+    # verify内部调用get_session, hook只收到最外层的操作
+    client.verify(session.session_id)
+    assert [record.name for record in records] == ["verify"]
+    assert records[0].parent is None
+
+    def failing_hook(record):
+        raise ValueError("hook error")
+
+    client.add_hook(failing_hook)
+    with caplog.at_level(logging.ERROR, logger="fescache"):
+        assert client.get_session(session.session_id) is not None  # hook的错误不影响缓存操作
+    assert "hook error" in caplog.text
+    client.remove_hook(failing_hook)
+    client.remove_hook(records.append)
+    records.clear()
+    client.get_session(session.session_id)
+    assert records == []
+
+
+def test_redis_operation_record(rdb_factory):
+    client = rdb_factory()
+    session = Session("account-1")
+    client.save_session(session)
+    records = []
+    client.add_hook(records.append)
+    client.verify(session.session_id)
+    record, = records
+    assert record.name == "verify"
+    assert record.round_trips == 2  # HGETALL和GETEX的pipeline, 刷新账户令牌的过期时间
+    assert record.commands == 3
+    assert record.bytes_out > 0 and record.bytes_in > 0
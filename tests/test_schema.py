@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+from decimal import Decimal
+
+import pytest
+
+from fescache import FieldSchema, LazyHashData, Session, get_codec
+from fescache.utils import orloads
+
+SCHEMA = FieldSchema({"name": "str", "age": "int", "score": "float", "tags": "json"})
+
+
+def test_field_schema_roundtrip():
+    data = {"name": "tom", "age": 3, "score": 1.5, "tags": ["a", {"b": 1}], "other": {"x": 1}}
+    dumped = SCHEMA.dumps(data)
+    assert dumped == {"name": "tom", "age": "3", "score": "1.5", "tags": '["a",{"b":1}]', "other": '{"x":1}'}
+    assert SCHEMA.loads(dumped) == data
+    # HGETALL的返回值没有解码时field为bytes
+    assert SCHEMA.loads({key.encode(): value.encode() for key, value in dumped.items()}) == data
+
+
+def test_field_schema_types():
+    # str字段不会先尝试json解析, 数字一样的字符串保持为字符串
+    loaded = SCHEMA.loads({"name": "123", "age": "null", "score": "None"})
+    assert loaded == {"name": "123", "age": None, "score": None}
+    assert SCHEMA.dumps({"age": None, "score": None}) == {"age": "null", "score": "null"}
+    assert SCHEMA.loads({"other": "1"}, skip_extra=True) == {}
+    with pytest.raises(ValueError):
+        FieldSchema({"name": "date"})
+
+
+@pytest.mark.parametrize("value,loaded", (
+        ("tom", "tom"), ("name", "name"), ("123abc", "123abc"), ("nullable", "nullable"), ("-", "-"), ("01", "01"),
+        ("", ""), ("true", True), ("null", None), ("12", 12), ("-1.5e3", -1500.0), (" 1 ", 1), ('{"a":1}', {"a": 1}),
+        ('"text"', "text"), ("[1", "[1")))
+def test_orloads(value, loaded):
+    assert orloads(value) == loaded
+
+
+def test_orloads_skip_non_json(monkeypatch):
+    # 不可能是json的字符串不调用orjson.loads, 不再抛出和捕获异常
+    calls = []
+
+    def loads(value):
+        calls.append(value)
+        raise ValueError(value)
+
+    monkeypatch.setattr("fescache.utils.orjson.loads", loads)
+    for value in ("tom", "name", "123abc", "truex", "1.", "-"):
+        assert orloads(value) == value
+    assert calls == []
+
+
+def test_field_schema_unserializable():
+    with pytest.raises(TypeError):
+        SCHEMA.dumps({"tags": [Decimal("1")]})
+    strict = FieldSchema({"name": "str"}, extra_codec=None)
+    with pytest.raises(ValueError):
+        strict.dumps({"other": 1})
+    assert strict.loads({"name": "tom", "other": "1"}) == {"name": "tom"}
+
+
+def test_session_schema_compatible():
+    # Session的hash格式和之前使用json codec保存的格式一致
+    session = Session("account-1", org_level=2, gather_orgnos={"1": "a"}, extra=[1])
+    codec = get_codec("json")
+    assert Session.schema.dumps(session.to_dict()) == {key: codec.dumps(value)
+                                                       for key, value in session.to_dict().items()}
+
+
+@pytest.mark.parametrize("codec_name", ("json", "msgpack"))
+def test_lazy_hash_data(codec_name):
+    codec = get_codec(codec_name)
+    data = {"a": [1, 2], "b": {"c": "d"}, "e": "text"}
+    raw = {key: codec.dumps(value) for key, value in data.items()}
+    if codec.binary:
+        raw = {key.encode(): value for key, value in raw.items()}
+    lazy = LazyHashData(raw, codec)
+    assert len(lazy) == 3
+    assert "a" in lazy and "x" not in lazy
+    assert lazy["a"] == [1, 2]
+    assert lazy["a"] is lazy["a"]
+    assert "loaded=1" in repr(lazy)
+    assert lazy.get("x") is None
+    assert lazy.to_dict() == data
+    assert dict(lazy) == data
+    with pytest.raises(KeyError):
+        lazy["x"]
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+import itertools
+from decimal import Decimal
+
+import pytest
+import redis
+
+from fescache import CompressedCodec, Session, key_slot
+from fescache.err import RedisClientError
+from fescache.memory import AIOMemoryRdbClient, MemoryRdbClient
+
+CODECS = ("json", "msgpack", "compressed")
+FORMATS = ("hash", "blob")
+
+
+def _codec(name):
+    return CompressedCodec("json", threshold=16) if name == "compressed" else name
+
+
+def _new_session(**kwargs):
+    return Session("account-1", user_name="tom", org_level=2, gather_orgnos={"1": "a"}, extra={"k": [1, 2]},
+                   **kwargs)
+
+
+def _check_lifecycle(client, raw):
+    """
+    保存、重复登录、更新和删除session, raw为读取原始数据的函数(key -> 字符串或None)
+    """
+    first = _new_session()
+    client.save_session(first)
+    loaded = client.get_session(first.session_id)
+    assert loaded.to_dict() == first.to_dict()
+    assert loaded.extra == {"k": [1, 2]}
+    assert raw(first.account_id) == first.session_id
+
+    # 同一个账户再次登录时删除老的session, 令牌原样保存
+    second = _new_session()
+    client.save_session(second)
+    assert client.get_session(first.session_id) is None
+    assert raw(first.account_id) == second.session_id
+    # 重复保存同一个session不能删除自己
+    client.save_session(second)
+    assert client.get_session(second.session_id) is not None
+
+    loaded = client.get_session(second.session_id)
+    loaded.user_name = "jerry"
+    loaded.kwargs["extra"]["k"].append(3)
+    loaded.mark_dirty("kwargs")
+    client.update_session(loaded)
+    updated = client.get_session(second.session_id)
+    assert updated.user_name == "jerry"
+    assert updated.extra == {"k": [1, 2, 3]}
+    assert updated.org_level == 2
+    assert raw(second.account_id) == second.session_id
+
+    # session已经过期时只写入修改过的字段会保存不完整的session, 需要写入全部字段
+    client.delete_keys([second.session_id])
+    updated.full_name = "Jerry"
+    client.update_session(updated)
+    restored = client.get_session(second.session_id)
+    assert restored.to_dict() == updated.to_dict()
+
+    client.delete_session(second.session_id)
+    assert client.get_session(second.session_id) is None
+    assert raw(second.account_id) is None
+    with pytest.raises(RedisClientError):
+        client.verify(second.session_id)
+
+
+@pytest.mark.parametrize("use_script", (False, True))
+def test_get_session(rdb_factory, use_script):
+    saver = rdb_factory()
+    client = rdb_factory(use_script=use_script)
+    session = _new_session()
+    saver.save_session(session, ex=100)
+    loaded = client.get_session(session.session_id, ex=1000)
+    assert loaded.to_dict() == session.to_dict()
+    # 读取时刷新session和令牌的过期时间
+    assert client.ttl(session.session_id) > 100
+    assert client.ttl(session.account_id) > 100
+    assert client.get_session("missing") is None
+
+
+@pytest.mark.parametrize("use_script,session_format,codec", itertools.product((False, True), FORMATS, CODECS))
+def test_session_lifecycle(rdb_factory, redis_options, use_script, session_format, codec):
+    client = rdb_factory(use_script=use_script, session_format=session_format, codec=_codec(codec))
+    raw_client = redis.Redis(**redis_options, decode_responses=True)
+    _check_lifecycle(client, raw_client.get)
+    raw_client.close()
+
+
+@pytest.mark.parametrize("session_format,codec", itertools.product(FORMATS, CODECS))
+def test_memory_session_lifecycle(session_format, codec):
+    client = MemoryRdbClient(session_format=session_format, codec=_codec(codec))
+    _check_lifecycle(client, client.store.get)
+
+
+@pytest.mark.parametrize("use_script", (False, True))
+@pytest.mark.parametrize("saved_format,updated_format", (("hash", "blob"), ("blob", "hash")))
+def test_session_cross_format(rdb_factory, use_script, saved_format, updated_format):
+    saver = rdb_factory(use_script=use_script, session_format=saved_format)
+    updater = rdb_factory(use_script=use_script, session_format=updated_format)
+    session = _new_session()
+    saver.save_session(session)
+
+    # 两种格式保存的session都可以读取, 另一种格式更新时转换为自己的格式
+    loaded = updater.get_session(session.session_id)
+    assert loaded.to_dict() == session.to_dict()
+    loaded.user_name = "jerry"
+    updater.update_session(loaded)
+    assert saver.get_session(session.session_id).to_dict() == loaded.to_dict()
+    assert updater.get_sessions([session.session_id])[session.session_id].user_name == "jerry"
+
+    # 另一种格式保存的同一个账户的session在重新登录时删除
+    relogin = _new_session()
+    saver.save_session(relogin)
+    assert updater.get_session(session.session_id) is None
+    updater.delete_session(relogin.session_id)
+    assert saver.get_session(relogin.session_id) is None
+
+
+@pytest.mark.parametrize("saved_format,updated_format", (("hash", "blob"), ("blob", "hash")))
+def test_memory_session_cross_format(saved_format, updated_format):
+    saver = MemoryRdbClient(session_format=saved_format)
+    updater = MemoryRdbClient(session_format=updated_format)
+    updater.store = saver.store
+    session = _new_session()
+    saver.save_session(session)
+    loaded = updater.get_session(session.session_id)
+    loaded.user_name = "jerry"
+    updater.update_session(loaded)
+    assert saver.get_session(session.session_id).to_dict() == loaded.to_dict()
+
+
+def _check_raw_token(client, raw):
+    session = _new_session()
+    client.save_session(session)
+    # 令牌不经过codec原样保存, 不同codec的客户端都可以读取
+    assert raw(session.account_id) == session.session_id
+    assert client.verify(session.session_id).to_dict() == session.to_dict()
+    assert set(client.verify_many([session.session_id])) == {session.session_id}
+    client.delete_session(session.session_id)
+    assert raw(session.account_id) is None
+
+
+@pytest.mark.parametrize("use_script,codec", itertools.product((False, True), CODECS))
+def test_raw_account_token(rdb_factory, redis_options, use_script, codec):
+    client = rdb_factory(use_script=use_script, codec=_codec(codec))
+    raw_client = redis.Redis(**redis_options, decode_responses=True)
+    _check_raw_token(client, raw_client.get)
+    raw_client.close()
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_memory_raw_account_token(codec):
+    client = MemoryRdbClient(codec=_codec(codec))
+    _check_raw_token(client, client.store.get)
+
+
+def test_hashtag_key_layout(rdb_factory):
+    client = rdb_factory(key_layout="hashtag")
+    session = _new_session()
+    client.save_session(session)
+    # 同一个账户的session和令牌分到集群的同一个槽
+    assert key_slot(session.session_id) == key_slot(session.account_id)
+    assert client.verify(session.session_id).to_dict() == session.to_dict()
+    client.delete_session(session.session_id)
+    assert client.get_session(session.session_id) is None
+
+
+def test_get_sessions(rdb_factory):
+    client = rdb_factory()
+    sessions = [Session(f"account-{index}", user_name=f"user{index}") for index in range(5)]
+    for session in sessions:
+        client.save_session(session, ex=100)
+    session_ids = [session.session_id for session in sessions]
+    loaded = client.get_sessions(session_ids + ["missing"], ex=1000, chunk_size=2)
+    assert [loaded[session_id].user_name for session_id in session_ids] == [f"user{index}" for index in range(5)]
+    assert loaded["missing"] is None
+    # 批量读取时同样刷新session和令牌的过期时间
+    assert client.ttl(session_ids[-1]) > 100
+    assert client.ttl(sessions[-1].account_id) > 100
+    assert set(client.verify_many(session_ids)) == set(session_ids)
+    with pytest.raises(RedisClientError):
+        client.verify_many(session_ids + ["missing"])
+
+
+def test_legacy_kwargs(rdb_factory, redis_options):
+    client = rdb_factory()
+    raw_client = redis.Redis(**redis_options, decode_responses=True)
+    # 之前的版本把不能序列化的kwargs保存为str(kwargs), 这时按照平铺保存的其他信息读取
+    raw_client.hset("legacy", mapping={"account_id": "account-2", "session_id": "legacy", "org_level": "None",
+                                       "gather_orgnos": "{}", "kwargs": "{'d': Decimal('1')}", "d": "1", "e": "abc"})
+    raw_client.close()
+    session = client.get_session("legacy")
+    assert session.org_level is None
+    assert session.kwargs == {"d": 1, "e": "abc"}
+
+
+@pytest.mark.parametrize("session_format", FORMATS)
+def test_unserializable_kwargs(session_format):
+    client = MemoryRdbClient(session_format=session_format)
+    with pytest.raises(TypeError):
+        client.save_session(Session("account-1", amount=Decimal("1")))
+
+
+@pytest.mark.parametrize("use_script,session_format", itertools.product((False, True), FORMATS))
+def test_aio_session_lifecycle(redis_options, use_script, session_format):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options, use_script=use_script, session_format=session_format)
+        first = _new_session()
+        await client.save_session(first)
+        second = _new_session()
+        await client.save_session(second)
+        assert await client.get_session(first.session_id) is None
+        assert await client.get(second.account_id) == second.session_id
+
+        loaded = await client.get_session(second.session_id)
+        loaded.user_name = "jerry"
+        await client.update_session(loaded)
+        assert (await client.get_session(second.session_id)).to_dict() == loaded.to_dict()
+        assert (await client.get_sessions([second.session_id]))[second.session_id].to_dict() == loaded.to_dict()
+
+        await client.delete_session(second.session_id)
+        assert await client.get_session(second.session_id) is None
+        assert await client.get(second.account_id) is None
+        client._close_connection()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("session_format", FORMATS)
+def test_aio_memory_session_lifecycle(session_format):
+    async def run():
+        client = AIOMemoryRdbClient(session_format=session_format)
+        session = _new_session()
+        await client.save_session(session)
+        loaded = await client.verify(session.session_id)
+        loaded.user_name = "jerry"
+        await client.update_session(loaded)
+        assert (await client.get_session(session.session_id)).user_name == "jerry"
+        await client.delete_session(session.session_id)
+        assert await client.get_session(session.session_id) is None
+
+    asyncio.run(run())
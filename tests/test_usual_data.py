@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# coding=utf-8
+
+"""
+@author: guoyanfeng
+@software: PyCharm
+@time: 2026/10/17 下午11:30
+"""
+import asyncio
+
+import pytest
+import redis
+
+from fescache import CompressedCodec, LazyHashData
+
+
+def test_usual_data_many(rdb_factory):
+    client = rdb_factory()
+    client.save_usual_data_many({"a": {"x": 1}, "b": [1, 2], "c": "text"}, ex=100)
+    assert client.get_usual_data("b") == [1, 2]
+    result = client.get_usual_data_many(["a", "missing", "c", "a"], ex=1000)
+    assert result == {"a": {"x": 1}, "missing": None, "c": "text"}
+    # 读取时刷新存在的key的过期时间
+    assert client.ttl("a") > 100
+    assert client.get_usual_data_many([]) == {}
+
+
+@pytest.mark.parametrize("use_async", (False, True))
+def test_usual_data_many_round_trip(rdb_factory, redis_options, use_async):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    mapping = {f"k{index}": index for index in range(10)}
+    names = list(mapping) + ["missing"]
+    records = []
+    if use_async:
+        async def run():
+            client = AIORdbClient()
+            client.init_engine(**redis_options)
+            await client.save_usual_data_many(mapping, ex=100)
+            client.add_hook(records.append)
+            result = await client.get_usual_data_many(names, ex=1000)
+            client._close_connection()
+            return result
+
+        result = asyncio.run(run())
+    else:
+        client = rdb_factory()
+        client.save_usual_data_many(mapping, ex=100)
+        client.add_hook(records.append)
+        result = client.get_usual_data_many(names, ex=1000)
+    assert result == {**mapping, "missing": None}
+    # 一个MGET和刷新过期时间的EXPIRE在同一个pipeline中发送
+    record, = records
+    assert (record.round_trips, record.commands) == (1, 1 + len(names))
+    assert rdb_factory().ttl("k9") > 100
+
+
+def test_client_codec(rdb_factory):
+    client = rdb_factory(codec="msgpack")
+    client.save_usual_data("a", {"x": [1, b"bytes"]})
+    assert client.get_usual_data("a") == {"x": [1, b"bytes"]}
+    client.save_hash_data("h", {"a": {"x": 1}, "b": "text"})
+    assert client.get_hash_data("h") == {"a": {"x": 1}, "b": "text"}
+    assert client.get_hash_data("h", field_name="a") == {"x": 1}
+    # 单次调用指定codec
+    client.save_usual_data("j", [1, 2], codec="json")
+    assert client.get("j") == "[1,2]"
+    assert client.get_usual_data("j", codec="json") == [1, 2]
+    assert client.get_usual_data_many(["a"]) == {"a": {"x": [1, b"bytes"]}}
+
+
+def test_client_compressed_codec(rdb_factory):
+    client = rdb_factory(codec=CompressedCodec("json", threshold=64))
+    large = {"items": ["x" * 10] * 100}
+    client.save_usual_data("large", large)
+    client.save_usual_data("small", [1])
+    assert client.binary_client.get("large").startswith(CompressedCodec.header)
+    assert client.get_usual_data_many(["large", "small"]) == {"large": large, "small": [1]}
+
+
+@pytest.mark.parametrize("codec", ("json", "msgpack"))
+def test_hash_fields(rdb_factory, codec):
+    client = rdb_factory(codec=codec)
+    client.save_hash_data("h", {"a": [1, 2], "b": {"c": "d"}, "e": "text"})
+    # 只读取需要的字段, 不存在的字段为None
+    assert client.get_hash_fields("h", ["a", "e", "x"]) == {"a": [1, 2], "e": "text", "x": None}
+    assert client.get_hash_fields("missing", ["a"]) == {"a": None}
+    lazy = client.get_hash_data("h", lazy=True)
+    assert isinstance(lazy, LazyHashData)
+    assert lazy["b"] == {"c": "d"}
+    assert lazy.to_dict() == client.get_hash_data("h")
+
+
+def test_sliding_expire(rdb_factory):
+    client = rdb_factory()
+    client.save_usual_data("a", 1, ex=100)
+    client.save_hash_data("h", {"a": 1}, ex=100)
+    client.save_list_data("l", [1], ex=100)
+    # 读取时刷新过期时间
+    assert client.get_usual_data("a", ex=1000) == 1
+    assert client.get_hash_data("h", ex=1000) == {"a": 1}
+    assert client.get_list_data("l", ex=1000) == ["1"]  # list的值没有经过codec
+    assert all(client.ttl(name) > 100 for name in ("a", "h", "l"))
+    assert client.supports_getex() == (client.server_version >= (6, 2))
+
+
+def test_server_version_probe_failed(rdb_factory):
+    client = rdb_factory()
+    calls = []
+
+    def info(*args):
+        calls.append(args)
+        raise redis.ResponseError("unknown command 'INFO'")
+
+    client.info = info
+    client.save_usual_data("a", 1, ex=100)
+    # INFO不可用时只检测一次, 之后使用GET和EXPIRE的pipeline
+    assert client.get_usual_data("a", ex=1000) == 1
+    assert client.get_usual_data("a", ex=2000) == 1
+    assert len(calls) == 1
+    assert client.server_version == ()
+    assert client.ttl("a") > 1000
+
+
+def test_aio_server_version_probe(redis_options):
+    from fescache.aio_rdbclient import AIORdbClient
+
+    async def run():
+        client = AIORdbClient()
+        client.init_engine(**redis_options)
+        calls = []
+        info = client.info
+
+        async def slow_info(*args):
+            calls.append(args)
+            await asyncio.sleep(0.05)
+            return await info(*args)
+
+        client.info = slow_info
+        # 并发的第一次调用只发送一个INFO, 都等待检测的结果
+        results = await asyncio.gather(*(client.supports_getex() for _ in range(5)))
+        assert len(calls) == 1
+        assert results == [client.server_version >= (6, 2)] * 5
+        client._close_connection()
+
+    asyncio.run(run())